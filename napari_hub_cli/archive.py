@@ -0,0 +1,147 @@
+"""Clone-free retrieval of the files read by the analysis.
+
+The tarball of a GitHub repository is streamed from codeload and only the members
+matching the sparse-checkout patterns of the analysis are extracted, without running git.
+"""
+import re
+import tarfile
+import tempfile
+from contextlib import closing, nullcontext
+from fnmatch import fnmatch
+from pathlib import PurePosixPath
+
+import requests
+
+from .network import http_get
+
+ARCHIVE_URL = "https://codeload.github.com/{owner}/{name}/tar.gz/{ref}"
+GITHUB_URL = re.compile(
+    r"https?://github\.com/(?P<owner>[^/]+)/(?P<name>[^/]+?)(\.git)?/?$"
+)
+
+
+def github_repository(url):
+    """Returns the owner and the name of a GitHub repository, None if the url is not a GitHub repository url"""
+    match = GITHUB_URL.match(url or "")
+    if not match:
+        return None
+    return match.group("owner"), match.group("name")
+
+
+def matches_patterns(path, patterns):
+    """Checks if a path matches gitignore-like patterns (as used for sparse checkouts).
+
+    Parameters
+    ----------
+    path: str
+        The path relative to the repository root, with "/" as separator
+    patterns: Iterable[str]
+        The patterns, a leading "/" anchors a pattern at the root, a trailing "/" matches a directory content
+
+    Returns
+    -------
+    bool
+        True if one of the patterns matches the path
+    """
+    name = path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        anchored = pattern.startswith("/")
+        pattern = pattern.lstrip("/")
+        if pattern.endswith("/"):
+            if anchored and path.startswith(pattern):
+                return True
+            if not anchored and f"/{pattern}" in f"/{path}":
+                return True
+        elif anchored or "/" in pattern:
+            if fnmatch(path, pattern):
+                return True
+        elif fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _member_path(member):
+    # the members are all in a "<name>-<ref>/" top directory
+    parts = PurePosixPath(member.name).parts[1:]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+class _TeeReader(object):
+    # a file-like reader that keeps a copy of everything that is read
+    def __init__(self, source, copy):
+        self.source = source
+        self.copy = copy
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        self.copy.write(data)
+        return data
+
+    def drain(self, chunk_size=64 * 1024):
+        while self.read(chunk_size):
+            ...
+
+
+def _extract_members(fileobj, destination, patterns):
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            path = _member_path(member)
+            if path is None or not matches_patterns(path, patterns):
+                continue
+            target = destination.joinpath(*path.split("/"))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with archive.extractfile(member) as source:  # type: ignore
+                target.write_bytes(source.read())
+
+
+def download_archive(url, destination, patterns, ref="HEAD", referenced=None):
+    """Extracts the files of a GitHub repository that match patterns, from its streamed tarball.
+
+    Parameters
+    ----------
+    url: str
+        The url of the GitHub repository
+    destination: Path
+        The directory where the files are extracted
+    patterns: Iterable[str]
+        The patterns of the files to extract (see `matches_patterns`)
+    ref: str = "HEAD"
+        The commit, branch or tag to download
+    referenced: Optional[Callable[[Path], Iterable[str]]] = None
+        Gives the patterns of additional files once the matching files are extracted
+        (e.g: the files read by the extracted configuration).
+        The tarball is downloaded once, a local copy is read again for the additional files.
+
+    Returns
+    -------
+    bool
+        True if the archive has been extracted, False if it cannot be downloaded
+    """
+    repository = github_repository(url)
+    if repository is None:
+        return False
+    owner, name = repository
+    archive_url = ARCHIVE_URL.format(owner=owner, name=name, ref=ref)
+    try:
+        response = http_get(archive_url, stream=True)
+    except requests.RequestException:
+        return False
+    copy = tempfile.TemporaryFile() if referenced else nullcontext()
+    with closing(response), copy:
+        if response.status_code != 200:
+            return False
+        source = _TeeReader(response.raw, copy) if referenced else response.raw
+        try:
+            _extract_members(source, destination, patterns)
+            additional = tuple(referenced(destination)) if referenced else ()
+            if additional:
+                source.drain()
+                copy.seek(0)
+                _extract_members(copy, destination, additional)
+        except (tarfile.TarError, OSError, requests.RequestException):
+            return False
+    return True
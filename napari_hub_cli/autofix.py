@@ -12,7 +12,12 @@ from rich.console import Console
 from rich.markdown import Markdown
 from xdg import xdg_config_home
 
-from .checklist import AnalysisStatus, analyse_local_plugin, analyse_remote_plugin_url
+from .checklist import (
+    AnalysisStatus,
+    FetchMode,
+    analyse_local_plugin,
+    analyse_remote_plugin_url,
+)
 from .checklist.projectmetadata import CITATION, CITATION_VALID, project_metadata_suite
 from .citation import create_cff_citation
 from .utils import NonExistingNapariPluginError, delete_file_tree, get_repository_url
@@ -263,7 +268,13 @@ def analyse_then_create_PR(
 ):
     # analysis
     result = analyse_remote_plugin_url(
-        plugin_name, plugin_url, directory=directory, cleanup=False, display_info=True
+        plugin_name,
+        plugin_url,
+        directory=directory,
+        cleanup=False,
+        display_info=True,
+        # the clone is used to open a PR, all the files are needed
+        fetch_mode=FetchMode.FULL,
     )
     if result.status is not AnalysisStatus.SUCCESS:
         print(f"There is an issue with {plugin_name}: {result.status.value}")
@@ -0,0 +1,171 @@
+"""Persistent caches shared by the analyses.
+
+Each cache is a small SQLite key/value store located in the napari-hub-cli cache directory.
+By default, this directory is in the XDG cache home, it can be relocated using
+the NAPARI_HUB_CLI_CACHE_DIR environment variable.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from xdg import xdg_cache_home
+
+CACHE_DIR_ENV = "NAPARI_HUB_CLI_CACHE_DIR"
+
+
+def cache_dir():
+    """Returns the directory where all the persistent caches of the tool are stored.
+
+    Returns
+    -------
+    Path
+        the cache directory, $NAPARI_HUB_CLI_CACHE_DIR if set, $XDG_CACHE_HOME/napari-hub-cli otherwise
+    """
+    location = os.environ.get(CACHE_DIR_ENV)
+    if location:
+        return Path(location)
+    return xdg_cache_home() / "napari-hub-cli"
+
+
+def hash_key(*parts):
+    """Computes a stable key from json serializable parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PersistentCache(object):
+    """A persistent key/value store with TTL based invalidation and LRU eviction.
+
+    Values are stored as JSON. The cache can be used from multiple threads and multiple processes.
+    Any error from the storage is considered as a cache miss, the cache never makes an analysis fail.
+
+    Parameters
+    ----------
+    name: str
+        The name of the cache, used as name for the database file.
+    ttl: Optional[float] = None
+        The number of seconds an entry stays valid, entries never expire if None.
+    max_entries: Optional[int] = None
+        The maximum number of entries, the least recently used entries are evicted first.
+    max_size: Optional[int] = None
+        The maximum size in bytes of the stored values, the least recently used entries are evicted first.
+    location: Optional[Path] = None
+        The directory where the database is stored, `cache_dir()` if None.
+    """
+
+    def __init__(self, name, ttl=None, max_entries=None, max_size=None, location=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.location = location
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+
+    @property
+    def path(self):
+        location = Path(self.location) if self.location else cache_dir()
+        return location / f"{self.name}.sqlite"
+
+    def _connect(self):
+        # a connection cannot be shared with a forked process
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            f"{path}", timeout=30, check_same_thread=False, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, accessed REAL)"
+        )
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT value, created FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return default
+                value, created = row
+                if self.ttl is not None and now - created > self.ttl:
+                    connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return default
+                connection.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+                return json.loads(value)
+            except (sqlite3.Error, OSError, ValueError):
+                return default
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data), now, now),
+                )
+                self._evict(connection)
+            except (sqlite3.Error, OSError):
+                ...
+
+    def __contains__(self, key):
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self):
+        with self._lock:
+            try:
+                connection = self._connect()
+                return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            except (sqlite3.Error, OSError):
+                return 0
+
+    def _evict(self, connection):
+        if self.ttl is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,)
+            )
+        if self.max_entries is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_size is not None:
+            total = connection.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+            total = total or 0
+            if total <= self.max_size:
+                return
+            evicted = []
+            for key, size in connection.execute(
+                "SELECT key, size FROM entries ORDER BY accessed ASC"
+            ).fetchall():
+                if total <= self.max_size:
+                    break
+                evicted.append((key,))
+                total -= size
+            connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._connect().execute("DELETE FROM entries")
+            except (sqlite3.Error, OSError):
+                ...
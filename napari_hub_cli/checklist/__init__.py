@@ -1,4 +1,5 @@
 from .analysis import (
+    FetchMode,
     analyse_remote_plugin,
     analyse_remote_plugin_url,
     build_csv_dict,
@@ -8,6 +9,7 @@ from .analysis import (
 from .metadata import AnalysisStatus, analyse_local_plugin, display_checklist
 
 __all__ = [
+    "FetchMode",
     "analyse_remote_plugin",
     "display_remote_analysis",
     "analyse_remote_plugin_url",
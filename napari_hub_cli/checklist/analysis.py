@@ -1,18 +1,33 @@
 # https://api.napari-hub.org/plugins
 
 import csv
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
+from enum import Enum
 from pathlib import Path
 from textwrap import dedent
 from rich import print
 
-import requests
 from git import GitCommandError
-from git.repo import Repo
 from rich.progress import Progress, TaskID
 
-from ..constants import NAPARI_HUB_API_URL
+from ..archive import download_archive, github_repository
+from ..constants import NAPARI_HUB_API_URL, PYPI_API_URL
+from ..distribution import download_distribution
+from ..fs import NapariPlugin
+from ..fs.archivefs import ArchiveFileSystem
+from ..gitremote import is_accessible, remote_head_sha
+from ..reference import reference_data, use_reference_snapshot
+from ..repocache import (
+    clone_repository,
+    extend_sparse_checkout,
+    local_head_sha,
+    repository_cache,
+)
 from ..utils import (
     LocalDirectory,
+    delete_file_tree,
     NonExistingNapariPluginError,
     TemporaryDirectory,
     get_all_napari_plugin_names,
@@ -23,10 +38,66 @@ from .metadata import (
     PluginAnalysisResult,
     analyse_local_plugin,
     display_checklist,
+    display_truncated_files,
 )
 from .projectmetadata import project_metadata_suite
 
 DEFAULT_SUITE = project_metadata_suite
+PROBE_WORKERS = 16
+FETCH_MODE_ENV = "NAPARI_HUB_CLI_FETCH_MODE"
+PYPI_FALLBACK_ENV = "NAPARI_HUB_CLI_PYPI_FALLBACK"
+# the repository cannot be analysed, but the distribution of the plugin can be
+FALLBACK_STATUS = (AnalysisStatus.MISSING_URL, AnalysisStatus.BAD_URL)
+
+
+class FetchMode(Enum):
+    FULL = "full"  # shallow clone of the whole tip tree
+    SPARSE = "sparse"  # blobless clone, only the files read by the analysis are checked out
+    ARCHIVE = "archive"  # no clone, the files read by the analysis are extracted from the GitHub tarball
+
+
+def read_fetch_mode():
+    # the way repositories are fetched can be changed using var env
+    try:
+        return FetchMode(os.environ.get(FETCH_MODE_ENV, FetchMode.SPARSE.value))
+    except ValueError:
+        return FetchMode.SPARSE
+
+
+def read_pypi_fallback():
+    # the analysis of the PyPI distributions can be enabled using var env
+    return os.environ.get(PYPI_FALLBACK_ENV, "").lower() in ("1", "true", "yes")
+
+
+def sparse_patterns(requirements_suite):
+    """Returns the sparse-checkout patterns of the files read by a suite
+
+    Parameters
+    ----------
+    requirements_suite: Tuple[str, Callable]
+        The suite that will be evaluated
+
+    Returns
+    -------
+    Tuple[str]
+        gitignore-like patterns
+    """
+    patterns = NapariPlugin.SPARSE_PATTERNS
+    if requirements_suite is not project_metadata_suite:
+        # the other suites lint the Python sources
+        patterns += NapariPlugin.PYTHON_SOURCES_PATTERNS
+    return patterns
+
+
+def missing_referenced_files(test_repo):
+    """Returns the patterns of the files read by the configuration of a partial checkout
+    (see `NapariPlugin.referenced_files`) that have not been fetched.
+    """
+    return tuple(
+        f"/{path}"
+        for path in NapariPlugin(test_repo).referenced_files
+        if not (test_repo / path).exists()
+    )
 
 
 class FakeProgress(object):
@@ -46,6 +117,131 @@ class FakeProgress(object):
         ...
 
 
+@contextmanager
+def _repository_checkout(
+    plugin_name,
+    plugin_url,
+    patterns,
+    directory,
+    cleanup,
+    progress,
+    head_sha=None,
+    fetch_mode=FetchMode.SPARSE,
+):
+    """Clones a plugin repository, using the repository cache if the clone is not kept after the analysis.
+    In archive mode, the files of GitHub repositories are extracted from their tarball instead.
+
+    Yields
+    ------
+    Path
+        the path of the clone, None if the repository cannot be cloned
+    """
+    use_archive = fetch_mode is FetchMode.ARCHIVE and github_repository(plugin_url)
+    cache = None if directory or not cleanup or use_archive else repository_cache()
+    if cache is not None:
+        with cache.checkout(
+            plugin_url,
+            patterns,
+            progress=progress,
+            name=plugin_name,
+            head_sha=head_sha,
+        ) as test_repo:
+            if test_repo is not None and patterns is not None:
+                _checkout_referenced_files(test_repo)
+            yield test_repo
+        return
+
+    directory = (
+        LocalDirectory(Path(directory), cleanup)
+        if directory
+        else TemporaryDirectory(delete=cleanup)
+    )
+    with directory as tmpdirname:
+        test_repo = Path(tmpdirname) / plugin_name
+        if use_archive:
+            ref = head_sha or "HEAD"
+            # the files read by the configuration are extracted from the same download
+            if download_archive(
+                plugin_url,
+                test_repo,
+                patterns,
+                ref=ref,
+                referenced=missing_referenced_files,
+            ):
+                yield test_repo
+                return
+            # the archive cannot be downloaded, the repository is cloned instead
+            if test_repo.exists():
+                delete_file_tree(test_repo)
+        try:
+            clone_repository(plugin_url, test_repo, patterns, progress=progress)
+            if patterns is not None:
+                _checkout_referenced_files(test_repo)
+        except GitCommandError:
+            if not test_repo.exists():
+                test_repo = None
+        yield test_repo
+
+
+def _checkout_referenced_files(test_repo):
+    # the sparse checkout is extended with the files read by the configuration
+    missing = missing_referenced_files(test_repo)
+    if missing:
+        with suppress(GitCommandError):
+            extend_sparse_checkout(test_repo, missing)
+
+
+def probe_remote_plugin(plugin_name, api_url=NAPARI_HUB_API_URL):
+    """Resolves the repository url of a plugin and reads the SHA of its HEAD.
+
+    Parameters
+    ----------
+    plugin_name: str
+        The plugin name
+
+    api_url: Optional[str] = NAPARI_HUB_API_LINK
+        The Napari HUB api url
+
+    Returns
+    -------
+    Tuple[str, Optional[str]]
+        the repository url and the SHA of its HEAD (None if it cannot be read)
+
+    Raises
+    ------
+    NonExistingNapariPluginError
+        If the plugin does not exist in the Naparai HUB api
+    """
+    plugin_url = get_repository_url(plugin_name, api_url=api_url)
+    return plugin_url, remote_head_sha(plugin_url) if plugin_url else None
+
+
+def probe_remote_plugins(
+    plugins_name, api_url=NAPARI_HUB_API_URL, max_workers=PROBE_WORKERS
+):
+    """Probes concurrently the repositories of plugins (see `probe_remote_plugin`).
+
+    Returns
+    -------
+    Dict[str, Tuple[str, Optional[str]]]
+        the repository url and HEAD SHA by plugin name, plugins that cannot be probed are not included
+    """
+
+    def probe(plugin_name):
+        try:
+            return probe_remote_plugin(plugin_name, api_url=api_url)
+        except NonExistingNapariPluginError:
+            # reported when the plugin is analysed
+            return None
+        except Exception:
+            # e.g: the hub api cannot be reached, the plugin is probed again when it is analysed
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remotes = dict(zip(plugins_name, executor.map(probe, plugins_name)))
+    return {name: remote for name, remote in remotes.items() if remote is not None}
+
+
 def analyse_remote_plugin(
     plugin_name,
     requirements_suite=DEFAULT_SUITE,
@@ -54,6 +250,8 @@ def analyse_remote_plugin(
     cleanup=True,
     directory=None,
     progress_bar=None,
+    remote=None,
+    pypi_fallback=None,
     **kwargs,
 ):
     """Launch the analysis of a remote plugin using the plugin name.
@@ -77,17 +275,59 @@ def analyse_remote_plugin(
     directory: Optional[Path|str] = None
         In which directory the repository should be cloned. If not set, a tmp directory is automatically created in the
         tmp folder of the system.
+
+    remote: Optional[Tuple[str, Optional[str]]] = None
+        The repository url and HEAD SHA of the plugin if already probed (see `probe_remote_plugins`)
+
+    pypi_fallback: Optional[bool] = None
+        Should the PyPI distribution of the plugin be analysed if its repository url is missing or wrong.
+        If None, the NAPARI_HUB_CLI_PYPI_FALLBACK environment variable is read.
     """
+    result = _analyse_remote_plugin(
+        plugin_name,
+        requirements_suite=requirements_suite,
+        api_url=api_url,
+        display_info=display_info,
+        cleanup=cleanup,
+        directory=directory,
+        progress_bar=progress_bar,
+        remote=remote,
+        **kwargs,
+    )
+    if pypi_fallback is None:
+        pypi_fallback = read_pypi_fallback()
+    if pypi_fallback and result.status in FALLBACK_STATUS:
+        kwargs.pop("fetch_mode", None)
+        fallback = analyse_pypi_distribution(
+            plugin_name, requirements_suite=requirements_suite, **kwargs
+        )
+        return fallback or result
+    return result
+
+
+def _analyse_remote_plugin(
+    plugin_name,
+    requirements_suite,
+    api_url,
+    display_info,
+    cleanup,
+    directory,
+    progress_bar,
+    remote,
+    **kwargs,
+):
     title, _ = requirements_suite
     try:
-        plugin_url = get_repository_url(plugin_name, api_url=api_url)
+        if remote is None:
+            remote = probe_remote_plugin(plugin_name, api_url=api_url)
+        plugin_url, head_sha = remote
         if not plugin_url:
             return PluginAnalysisResult.with_status(
                 AnalysisStatus.MISSING_URL, title=title
             )
 
-        access = requests.get(plugin_url)
-        if access.status_code != 200:
+        # if the HEAD cannot be read, the clone will tell if the url is a git repository
+        if head_sha is None and not is_accessible(plugin_url):
             return PluginAnalysisResult.with_status(
                 AnalysisStatus.UNACCESSIBLE_REPOSITORY,
                 url=plugin_url,
@@ -101,6 +341,7 @@ def analyse_remote_plugin(
             cleanup=cleanup,
             directory=directory,
             progress_bar=progress_bar,
+            head_sha=head_sha,
             **kwargs,
         )
     except NonExistingNapariPluginError as e:
@@ -110,6 +351,45 @@ def analyse_remote_plugin(
         )
 
 
+def analyse_pypi_distribution(
+    plugin_name, requirements_suite=DEFAULT_SUITE, pypi_url=PYPI_API_URL, **kwargs
+):
+    """Analyses the latest distribution of a plugin published on PyPI, without unpacking it.
+    The sdist is preferred as it contains the configuration files of the repository.
+
+    Parameters
+    ----------
+    plugin_name: str
+        The name of the plugin on PyPI
+
+    requirements_suite: Tuple[str, Callable] = DEFAULT_SUITE
+        The suite to check the plugin against
+
+    pypi_url: str = PYPI_API_URL
+        The url of the PyPI JSON API
+
+    Returns
+    -------
+    Optional[PluginAnalysisResult]
+        the result of the analysis with the FROM_DISTRIBUTION status,
+        None if the plugin has no distribution that can be downloaded
+    """
+    with TemporaryDirectory() as tmpdirname:
+        downloaded = download_distribution(
+            plugin_name, Path(tmpdirname), pypi_url=pypi_url
+        )
+        if downloaded is None:
+            return None
+        archive, distribution_url = downloaded
+        with ArchiveFileSystem(archive) as filesystem:
+            result = analyse_local_plugin(
+                filesystem.root, requirements_suite, **kwargs
+            )
+    result.status = AnalysisStatus.FROM_DISTRIBUTION
+    result.url = distribution_url
+    return result
+
+
 def analyse_remote_plugin_url(
     plugin_name,
     plugin_url,
@@ -118,52 +398,79 @@ def analyse_remote_plugin_url(
     cleanup=True,
     directory=None,
     progress_bar=None,
+    fetch_mode=None,
+    head_sha=None,
     **kwargs,
 ):
-    directory = (
-        LocalDirectory(Path(directory), cleanup)
-        if directory
-        else TemporaryDirectory(delete=cleanup)
+    """Launch the analysis of a remote plugin using the plugin repository url.
+
+    Parameters
+    ----------
+    cleanup: Optional[bool] = True
+        If False, the clone is left to the caller. Otherwise, if no directory is given,
+        the repository cache is used: the clone is kept and updated by the next analyses.
+    fetch_mode: Optional[FetchMode] = None
+        How the repository is cloned, $NAPARI_HUB_CLI_FETCH_MODE (sparse by default) if None.
+        In archive mode, repositories that are not hosted on GitHub are cloned.
+    head_sha: Optional[str] = None
+        The SHA of the remote HEAD if known, a cached clone at this commit is analysed without fetching
+    """
+    fetch_mode = fetch_mode or read_fetch_mode()
+    patterns = (
+        sparse_patterns(requirements_suite) if fetch_mode is not FetchMode.FULL else None
     )
     title, suite_gen = requirements_suite
 
-    with directory as tmpdirname:
-        tmp_dir = Path(tmpdirname)
-        test_repo = tmp_dir / plugin_name
-        if progress_bar:
-            p = progress_bar
-            display_info = True
-        else:
-            p = Progress(transient=True) if display_info else FakeProgress()
-            p.start()
-        started = False
-        task = None
-
-        def update_task(_, step, total, *__):
-            nonlocal started, task
-            if not started:
-                started = True
-                task = p.add_task(
-                    f"Cloning repository [bold green]{plugin_name}[/bold green] - [green]{plugin_url}[/green] in [red]{test_repo}[/red]",
-                    visible=display_info,
-                    total=total,
-                )
-                p.start_task(task)
-            p.update(
-                task,  # type: ignore
+    if progress_bar:
+        p = progress_bar
+        display_info = True
+    else:
+        p = Progress(transient=True) if display_info else FakeProgress()
+        p.start()
+    started = False
+    task = None
+
+    def update_task(_, step, total, *__):
+        nonlocal started, task
+        if not started:
+            started = True
+            task = p.add_task(
+                f"Cloning repository [bold green]{plugin_name}[/bold green] - [green]{plugin_url}[/green]",
+                visible=display_info,
                 total=total,
-                advance=step,
             )
+            p.start_task(task)
+        p.update(
+            task,  # type: ignore
+            total=total,
+            advance=step,
+        )
 
-        try:
-            Repo.clone_from(plugin_url, test_repo, depth=1, progress=update_task)
-        except GitCommandError:
-            if not test_repo.exists():
-                return PluginAnalysisResult.with_status(
-                    AnalysisStatus.BAD_URL, url=plugin_url, title=title
-                )
-        result = analyse_local_plugin(test_repo, suite_gen, progress_task=p, **kwargs)
+    with _repository_checkout(
+        plugin_name,
+        plugin_url,
+        patterns,
+        directory,
+        cleanup,
+        update_task,
+        head_sha=head_sha,
+        fetch_mode=fetch_mode,
+    ) as test_repo:
+        if test_repo is None:
+            return PluginAnalysisResult.with_status(
+                AnalysisStatus.BAD_URL, url=plugin_url, title=title
+            )
+        local_head = local_head_sha(test_repo)
+        # extracted archives are not git repositories, their url cannot be read from a git remote
+        result = analyse_local_plugin(
+            test_repo,
+            suite_gen,
+            progress_task=p,
+            url=None if local_head else plugin_url,
+            **kwargs,
+        )
         result.url = plugin_url  # update the plugin url
+        result.head_sha = local_head or head_sha
         if not progress_bar:
             p.stop()
         return result
@@ -187,8 +494,33 @@ def analyze_remote_plugins(
     api_url=NAPARI_HUB_API_URL,
     display_info=False,
     directory=None,
+    jobs=1,
     **kwargs,
 ):
+    """Launch the analysis of a set of remote plugins.
+
+    Parameters
+    ----------
+    all_plugins: Optional[bool] = False
+        If activated, all the public plugins of the Napari HUB are analysed, "plugins_name" is ignored.
+
+    plugins_name: Optional[List[str]] = None
+        The names of the plugins to analyse.
+
+    jobs: Optional[int] = 1
+        The number of plugins that are analysed concurrently.
+        If greater than 1, each plugin is analysed in a dedicated worker process that owns its own clone directory
+        and its own pip solver state. The results are sent back to the main process as they are produced.
+
+    directory: Optional[Path|str] = None
+        In which directory the repositories should be cloned.
+        When plugins are analysed concurrently, each worker uses its own sub-directory.
+
+    Returns
+    -------
+    Dict[str, PluginAnalysisResult]
+        The analysis results by plugin name, in the same order as the plugin names.
+    """
     all_results = {}
     if all_plugins:
         plugins_name = get_all_napari_plugin_names(api_url)
@@ -199,15 +531,37 @@ def analyze_remote_plugins(
     description = "Analysing plugins in napari hub repository..."
     with Progress(transient=True) as p:
         task = p.add_task(description, visible=display_info, total=total)
-        for name in plugins_name:
-            result = analyse_remote_plugin(
-                name,
+        p.update(task, description="Probing plugin repositories...")
+        remotes = probe_remote_plugins(plugins_name, api_url=api_url)
+        p.update(task, description=description)
+        if jobs > 1 and total > 1:
+            results = _analyse_in_worker_pool(
+                plugins_name,
                 requirements_suite,
-                display_info=False,
+                api_url=api_url,
                 directory=directory,
-                progress_bar=p,
+                jobs=jobs,
+                remotes=remotes,
                 **kwargs,
             )
+        else:
+            results = (
+                (
+                    name,
+                    analyse_remote_plugin(
+                        name,
+                        requirements_suite,
+                        api_url=api_url,
+                        display_info=False,
+                        directory=directory,
+                        progress_bar=p,
+                        remote=remotes.get(name),
+                        **kwargs,
+                    ),
+                )
+                for name in plugins_name
+            )
+        for name, result in results:
             all_results[name] = result
             p.update(
                 task,
@@ -217,8 +571,68 @@ def analyze_remote_plugins(
             if not display_info:
                 continue
             _display_error_message(name, result)
+            display_truncated_files(result)
 
-    return all_results
+    # results from workers are produced in completion order
+    return {name: all_results[name] for name in plugins_name}
+
+
+def _analyse_in_worker_pool(
+    plugins_name, requirements_suite, api_url, directory, jobs, remotes, **kwargs
+):
+    # the reference datasets are fetched once and sent to the workers
+    snapshot = reference_data().snapshot(api_urls=(api_url,))
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(plugins_name)),
+        initializer=use_reference_snapshot,
+        initargs=(snapshot,),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _analyse_remote_plugin_worker,
+                name,
+                requirements_suite,
+                api_url,
+                directory,
+                remotes.get(name),
+                kwargs,
+            ): name
+            for name in plugins_name
+        }
+        title, _ = requirements_suite
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # a failing plugin does not stop the analysis of the others
+                remote = remotes.get(name)
+                result = PluginAnalysisResult.with_status(
+                    AnalysisStatus.ANALYSIS_FAILED,
+                    title=title,
+                    url=remote[0] if remote else None,
+                )
+                result.error = f"{type(e).__name__}: {e}"
+            yield name, result
+
+
+def _analyse_remote_plugin_worker(
+    plugin_name, requirements_suite, api_url, directory, remote, kwargs
+):
+    # each worker process clones in its own directory
+    # so concurrent cleanups cannot remove a repository that is being analysed
+    if directory:
+        directory = Path(directory) / f"worker-{os.getpid()}"
+    result = analyse_remote_plugin(
+        plugin_name,
+        requirements_suite,
+        api_url=api_url,
+        display_info=False,
+        directory=directory,
+        remote=remote,
+        **kwargs,
+    )
+    return result.detached()
 
 
 def _display_error_message(plugin_name, result):
@@ -234,6 +648,14 @@ def _display_error_message(plugin_name, result):
         print(
             f"\N{BALLOT X} Repository URL for plugin {plugin_name!r} is not accessible (private repository?) (url: {result.url})"
         )
+    elif result.status is AnalysisStatus.FROM_DISTRIBUTION:
+        print(
+            f"\N{WARNING SIGN} Plugin {plugin_name!r} has been analysed from its PyPI distribution (url: {result.url})"
+        )
+    elif result.status is AnalysisStatus.ANALYSIS_FAILED:
+        print(
+            f"\N{BALLOT X} The analysis of plugin {plugin_name!r} failed ({result.error})"
+        )
 
 
 # Shamefully copied from stackoverflow
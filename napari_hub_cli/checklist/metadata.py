@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from enum import Enum, unique
 from pathlib import Path
 from typing import Any, List, Optional, Union
@@ -10,6 +11,9 @@ from collections import defaultdict
 from napari_hub_cli.utils import build_gh_header
 
 from ..fs import NapariPlugin, RepositoryFile
+from ..fs.archivefs import ArchivePath
+
+PREFETCH_WORKERS = 16
 
 CHECKLIST_STYLE = {
     True: ("\N{CHECK MARK}", "bold green"),
@@ -64,6 +68,8 @@ class AnalysisStatus(Enum):
     NON_EXISTING_PLUGIN = "Plugin is not existing in the napari hub platform"
     UNACCESSIBLE_REPOSITORY = "Repository URL is not accessible"
     BAD_URL = "Repository URL does not have right format"
+    FROM_DISTRIBUTION = "Analysed from the PyPI distribution of the plugin"
+    ANALYSIS_FAILED = "The analysis of the plugin raised an error"
 
 
 @dataclass
@@ -74,6 +80,10 @@ class PluginAnalysisResult(object):
     url: Optional[str]
     title: str
     additionals: List[BaseFeature]
+    head_sha: Optional[str] = None  # the analysed commit, if known
+    error: Optional[str] = None  # the error that stopped the analysis, if any
+    # the documents that are too big and have been truncated for the analysis
+    truncated_files: List[str] = field(default_factory=list)
 
     @classmethod
     def with_status(cls, status, title, url=None):
@@ -88,6 +98,48 @@ class PluginAnalysisResult(object):
     def only_in_fallbacks(self):
         return [feature for feature in self.features if feature.only_in_fallback]
 
+    def detached(self):
+        """Returns a copy of the result that does not reference the analysed repository anymore.
+        The copy only keeps plain values (e.g: what's needed to build the CSV report)
+        and can be safely pickled to be sent from a worker process to the main one.
+
+        Returns
+        -------
+        PluginAnalysisResult:
+            the detached copy of the result
+        """
+        features = [
+            replace(
+                feature,
+                result=_plain_value(feature.result),
+                found_in=None,
+                scanned_files=[],
+                main_files=[],
+                fallbacks=[],
+            )
+            for feature in self.features
+        ]
+        additionals = [
+            replace(feature, result=_plain_value(feature.result))
+            for feature in self.additionals
+        ]
+        return replace(
+            self, features=features, repository=None, additionals=additionals
+        )
+
+
+PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def _plain_value(value):
+    if isinstance(value, PLAIN_TYPES):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset)) and all(
+        isinstance(v, PLAIN_TYPES + (tuple,)) for v in value
+    ):
+        return value
+    return str(value)
+
 
 @dataclass
 class Requirement(object):
@@ -173,6 +225,38 @@ def check_feature(meta, main_files, fallbacks):
     )
 
 
+def prefetch_requirements(suite: RequirementSuite, max_workers=PREFETCH_WORKERS):
+    """Runs concurrently all the remote fetches required by the features of a suite.
+    The evaluation of the features afterwards only reads from warm caches.
+    Only the main files are prefetched, the fallbacks are read only if the main files miss a feature.
+    Errors are ignored during the prefetch, they are raised again during the evaluation of the features.
+
+    Parameters
+    ----------
+    suite: RequirementSuite
+        the suite whose features will be evaluated
+    max_workers: int = PREFETCH_WORKERS
+        the maximum number of concurrent fetches
+    """
+    attributes = {}
+    for requirement in (*suite.requirements, *suite.additionals):
+        if not requirement.main_files:
+            continue
+        for file in requirement.main_files:
+            _, file_attributes = attributes.setdefault(id(file), (file, set()))
+            file_attributes.update(f.attribute for f in requirement.features)
+    fetches = []
+    for file, file_attributes in attributes.values():
+        prefetch = getattr(file, "prefetch", None)
+        if prefetch:
+            fetches.extend(prefetch(file_attributes))
+    if not fetches:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(fetches))) as executor:
+        for future in [executor.submit(fetch) for fetch in fetches]:
+            future.exception()
+
+
 def analyse_requirements(
     plugin_repo: NapariPlugin, suite: RequirementSuite, progress_task=None
 ):
@@ -182,10 +266,11 @@ def analyse_requirements(
         len(c.features) for c in suite.additionals
     )
     task = (
-        progress_task.add_task(f"Analysing main features...", total=nb_features)
+        progress_task.add_task(f"Fetching remote information...", total=nb_features)
         if progress_task
         else None
     )
+    prefetch_requirements(suite)
     for requirement in requirements:
         for feature in requirement.features:
             if not requirement.main_files:
@@ -227,25 +312,64 @@ def analyse_requirements(
         url=None,
         title=suite.title,
         additionals=additional_results,
+        truncated_files=_truncated_files(reqs_result, plugin_repo.path),
     )
 
 
-def analyse_local_plugin(repo_path, requirement_suite, *, progress_task=None, **kwargs):
+def _truncated_files(features, root):
+    # the same document can be read by several features, or wrapped by several files
+    truncated = []
+    for feature in features:
+        for scanned in feature.scanned_files:
+            if not getattr(scanned, "truncated", False) or not scanned.file:
+                continue
+            try:
+                path = f"{scanned.file.relative_to(root)}"
+            except ValueError:
+                path = f"{scanned.file}"
+            if path not in truncated:
+                truncated.append(path)
+    return truncated
+
+
+def display_truncated_files(analysis_result, console=None):
+    """Displays a warning for each document that has been truncated during the analysis of a plugin
+
+    Parameters
+    ----------
+    analysis_result: PluginAnalysisResult
+        the result of the analysis
+    console: Optional[Console] = None
+        the console used for the display, a new one if None
+    """
+    console = console or Console()
+    for path in analysis_result.truncated_files:
+        console.print(
+            f"WARNING! {path} is too big, it is truncated for the analysis",
+            style="yellow",
+        )
+
+
+def analyse_local_plugin(
+    repo_path, requirement_suite, *, progress_task=None, url=None, **kwargs
+):
     """Create the documentation checklist and the subsequent suggestions by looking at metadata in multiple files
     Parameters
     ----------
-    repo_path : str
-        local path to the plugin
+    repo_path : str | Path | ArchivePath
+        local path to the plugin, or root of a distribution archive
     requirements_suite: Func[NapariPlugin] -> Requirement
         function that takes a NapariPlugin as input and generates the suite to test the repo against
+    url: Optional[str] = None
+        the url of the plugin repository, read from the git remote of the local repository if None
 
     Returns
     -------
     PluginAnalysisResult:
         the result of the analysis ran against the local repository
     """
-    repo = Path(repo_path)
-    plugin_repo = NapariPlugin(repo)
+    repo = repo_path if isinstance(repo_path, ArchivePath) else Path(repo_path)
+    plugin_repo = NapariPlugin(repo, url=url)
     if isinstance(requirement_suite, tuple):
         _, requirement_suite = requirement_suite
 
@@ -362,3 +486,4 @@ def display_checklist(analysis_result):
             previous_title = feature.meta.section.title
         console.print(f"  {feature.meta.name}: {feature.result}")
     console.print()
+    display_truncated_files(analysis_result, console)
@@ -77,7 +77,7 @@ LABELS = MetaFeature(
 
 
 def suite_generator(plugin_repo: NapariPlugin):
-    pyproject_toml, setup_cfg, setup_py = plugin_repo.pypi_files
+    pyproject_toml, setup_cfg, setup_py, pkg_info = plugin_repo.pypi_files
     napari_cfg = plugin_repo.config_yml
     description = plugin_repo.description
     npe2_yaml = plugin_repo.npe2_yaml
@@ -85,6 +85,7 @@ def suite_generator(plugin_repo: NapariPlugin):
     long_descr_setup_cfg = setup_cfg.long_description()
     long_descr_setup_py = setup_py.long_description()
     long_descr_pyproject_toml = pyproject_toml.long_description()
+    long_descr_pkg_info = pkg_info.long_description()
 
     return RequirementSuite(
         title=TITLE,
@@ -108,12 +109,12 @@ def suite_generator(plugin_repo: NapariPlugin):
             ),
             Requirement(
                 features=[SUMMARY, AUTHOR],
-                main_files=[pyproject_toml, setup_cfg, setup_py],
+                main_files=[pyproject_toml, setup_cfg, setup_py, pkg_info],
                 fallbacks=[napari_cfg],
             ),
             Requirement(
                 features=[SOURCECODE, BUGTRACKER, USER_SUPPORT],
-                main_files=[pyproject_toml, setup_cfg, setup_py],
+                main_files=[pyproject_toml, setup_cfg, setup_py, pkg_info],
                 fallbacks=[],
             ),
             Requirement(
@@ -122,6 +123,7 @@ def suite_generator(plugin_repo: NapariPlugin):
                     long_descr_setup_cfg,
                     long_descr_setup_py,
                     long_descr_pyproject_toml,
+                    long_descr_pkg_info,
                     description,
                 ],
                 fallbacks=[],
@@ -1,38 +1,66 @@
 from contextlib import suppress
 from pathlib import Path
 
-from git import InvalidGitRepositoryError
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
 from git.repo import Repo
 from rich.console import Console
 
+from .cache import PersistentCache, hash_key
 from .fs import NapariPlugin
 from .utils import scrap_git_infos
 
+# the authors of a commit never change, the contributors of a history are kept without expiry
+contributors_cache = PersistentCache("contributors", max_entries=10000)
+
 
 def fake_print(*args):
     ...
 
 
-def scrap_users(local_repo):
-    try:
-        repo = Repo(local_repo.absolute())
-    except InvalidGitRepositoryError:
-        return {}
+def iter_commit_authors(repo):
+    """Streams the (name, email) of the author of each commit from a single `git log` process.
 
-    # We cloned with depth = 1
-    # To get the full history, we try to "unshallow"
-    # the current remote
-    with suppress(Exception):
-        repo.remote().fetch(unshallow=True)
+    Parameters
+    ----------
+    repo: Repo
+        The repository
 
+    Yields
+    ------
+    Tuple[str, str]
+        the name and the email of the author of each commit reachable from HEAD
+    """
+    try:
+        process = repo.git.log("--format=%an%x00%ae", as_process=True)
+    except GitCommandError:
+        return
+    with suppress(GitCommandError):
+        for line in process.proc.stdout:
+            line = line.decode("utf-8", "replace").rstrip("\n")
+            name, _, email = line.partition("\0")
+            yield name, email
+        process.wait()
+
+
+def count_contributors(authors):
+    """Counts the commits of the contributors, the names used with a same email are grouped.
+
+    Parameters
+    ----------
+    authors: Iterable[Tuple[str, str]]
+        The name and the email of the author of each commit
+
+    Returns
+    -------
+    Dict[str, List]
+        the number of commits (+1) and the names by email, in order of first appearance
+    """
     # we group all contributors by emails
     # this allows us to detect same user with various names
     # that commits with same email
     contributors = {}
-    for commiter in repo.iter_commits():
-        email = commiter.author.email
+    for name, email in authors:
         email = email if email else ""
-        name = commiter.author.name
         name = name if name else ""
         # try to detect bots (simple detection)
         # simple hack here to order by nbre of commits
@@ -40,30 +68,90 @@ def scrap_users(local_repo):
             contributor = contributors.setdefault(email, [1, set()])
             contributor[0] += 1
             contributor[1].add(name)
+    return contributors
+
+
+def merge_aliases(contributors):
+    """Groups the emails of a same person, two emails used with a same name belong to the same person.
+    The groups are the connected components of the email/name graph, computed with a union-find.
+
+    Parameters
+    ----------
+    contributors: Dict[str, List]
+        The number of commits and the names by email
+
+    Returns
+    -------
+    List[List]
+        the number of commits and the names of each person, in order of first appearance
+    """
+    parents = {}
+
+    def find(node):
+        root = node
+        while parents[root] != root:
+            root = parents[root]
+        # path compression
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+        return root
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parents[b] = a
+
+    for email, (_, names) in contributors.items():
+        parents.setdefault(("email", email), ("email", email))
+        for name in names:
+            parents.setdefault(("name", name), ("name", name))
+            union(("email", email), ("name", name))
+
+    groups = {}
+    for email, (commit, names) in contributors.items():
+        group = groups.setdefault(find(("email", email)), [0, set()])
+        group[0] += commit
+        group[1].update(names)
+    return list(groups.values())
+
+
+def scrap_users(local_repo):
+    try:
+        repo = Repo(local_repo.absolute())
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return {}
+
+    try:
+        head = repo.head.commit.hexsha
+        remotes = [remote.url for remote in repo.remotes]
+    except (GitCommandError, ValueError):
+        head, remotes = None, []
+    key = hash_key(remotes or f"{local_repo.absolute()}", head)
+    if head:
+        cached = contributors_cache.get(key)
+        if cached is not None:
+            return cached
+
+    # We cloned with depth = 1
+    # To get the full history, we try to "unshallow"
+    # the current remote
+    shallow = Path(repo.git_dir, "shallow").exists()
+    if shallow:
+        with suppress(Exception):
+            repo.remote().fetch(unshallow=True)
+        shallow = Path(repo.git_dir, "shallow").exists()
 
     # Now that we have users by email,
     # we group user names that are in various emails
     # (e.g. "Jane Doe" commited under "jane.doe@email.com and "jave.doe+github@email.com")
     # We detect this is the same person
-    real_names = []
-    for commit, names in contributors.values():
-        found_idx = [i for i, (_, r) in enumerate(real_names) if names.intersection(r)]
-        for i in found_idx:
-            real_names[i][0] += commit
-            real_names[i][1].update(names)
-        if not found_idx:
-            real_names.append([commit, names])
-    real_names = [
-        (commit, list(names)) for commit, names in real_names
-    ]  # we pass from a list of set to a list of list
-
-    # we sort all identified names by their number of particules
-    [
-        (c, r.sort(key=lambda name: -(len(name) + len(name.split()))))
+    real_names = merge_aliases(count_contributors(iter_commit_authors(repo)))
+
+    # we get the names that have the more fragments
+    unique_names = [
+        (c, min(r, key=lambda name: (-(len(name) + len(name.split())), name)))
         for c, r in real_names
     ]
-    # we get the ones that have the more fragments
-    unique_names = [(c, r[0]) for c, r in real_names]
     unique_names.sort(key=lambda e: -e[0])
     authors = []
     for commit, name in unique_names:
@@ -81,7 +169,11 @@ def scrap_users(local_repo):
                     "given-names": f"{name}  # We cannot split your name automatically between 'given-names' and 'family-names', we apologize for that. Please do it manually",
                 }
             )
-    return {"authors": authors}
+    result = {"authors": authors}
+    # a partial history (the unshallow failed) is not cached
+    if head and not shallow:
+        contributors_cache.set(key, result)
+    return result
 
 
 def create_cff_citation(repo_path, save=True, display_info=True):
@@ -6,10 +6,12 @@ Exit code status are the following:
 * 2 = missing metadata
 * 3 = non-existing plugin in the Napari HUB platform
 * 4 = CFF citation file not created
+* 5 = reference datasets cannot be fetched
 """
 
 import argparse
 import os
+from pathlib import Path
 from rich.progress import Progress
 import sys
 
@@ -17,6 +19,7 @@ from .checklist import analyse_local_plugin, display_checklist
 from .checklist.analysis import DEFAULT_SUITE
 from .checklist.projectquality import project_quality_suite
 from .citation import create_cff_citation
+from .dependencies_solver.utils import FAST_METADATA_ENV, INDEX_URL_ENV
 
 
 def create_citation(plugin_path):
@@ -61,10 +64,17 @@ def documentation_checklist(plugin_path):
     return 0
 
 
-def code_quality_checklist(plugin_path, disable_pip_based_analysis):
+def code_quality_checklist(
+    plugin_path, disable_pip_based_analysis, index_url=None, fast_metadata=False
+):
     if not os.path.exists(plugin_path):
         print(f"Nothing found at path: {plugin_path}")
         return 1
+    if index_url:
+        # the var env is used so the option is also seen by the solver in worker processes
+        os.environ[INDEX_URL_ENV] = index_url
+    if fast_metadata:
+        os.environ[FAST_METADATA_ENV] = "1"
     with Progress(transient=True) as p:
         check_list = analyse_local_plugin(
             plugin_path,
@@ -76,6 +86,63 @@ def code_quality_checklist(plugin_path, disable_pip_based_analysis):
     return 0
 
 
+def snapshot_dependencies_index(output, plugin_paths, index_url=None):
+    """Snapshots the index pages and metadata required to resolve the dependencies of local plugins
+
+    Parameters
+    ----------
+    output: str
+        Local path of the snapshot directory
+    plugin_paths: List[str]
+        Local paths to the plugins
+    index_url: Optional[str]
+        The index used to resolve the dependencies, PyPI if None
+
+    Returns
+    -------
+    int
+        the status of the result, 0 = OK, 1 = unexisting path
+    """
+    from .dependencies_solver.mirror import snapshot_index
+    from .dependencies_solver.utils import DEFAULT_INDEX_URL
+    from .fs import NapariPlugin
+
+    for plugin_path in plugin_paths:
+        if not os.path.exists(plugin_path):
+            print(f"Nothing found at path: {plugin_path}")
+            return 1
+    plugins = (NapariPlugin(Path(plugin_path)) for plugin_path in plugin_paths)
+    simple_index = snapshot_index(
+        plugins, output, index_url=index_url or DEFAULT_INDEX_URL
+    )
+    print(f"Snapshot index available at: {simple_index}")
+    return 0
+
+
+def snapshot_reference_data(output):
+    """Snapshots the reference datasets shared by the plugin analyses (npe2 errors, OSI licenses, napari hub index)
+
+    Parameters
+    ----------
+    output: str
+        Local path of the snapshot file
+
+    Returns
+    -------
+    int
+        the status of the result, 0 = OK, 5 = reference datasets cannot be fetched
+    """
+    from .reference import SNAPSHOT_ENV, HubIndexUnavailableError, save_snapshot
+
+    try:
+        path = save_snapshot(output)
+    except HubIndexUnavailableError as e:
+        print(e.message)
+        return 5
+    print(f"Reference snapshot available at: {path} (use it with {SNAPSHOT_ENV})")
+    return 0
+
+
 def parse_args(args):
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers()
@@ -98,8 +165,41 @@ def parse_args(args):
         action="store_true",
         help="Disable the pip based analysis (installability, number of dependencies, ...)",
     )
+    subcommand.add_argument(
+        "--index-url",
+        default=None,
+        help="Index used by the pip based analysis, an URL or the path of a snapshot created with 'snapshot-index'",
+    )
+    subcommand.add_argument(
+        "--fast-metadata",
+        default=False,
+        action="store_true",
+        help="Resolve the dependencies using only published metadata, dependencies that would need to be built are reported instead",
+    )
     subcommand.set_defaults(func=code_quality_checklist)
 
+    ## snapshot of the dependencies index
+    subcommand = subparsers.add_parser(
+        "snapshot-index",
+        help="Snapshots the index data required to resolve the dependencies of local plugins offline",
+    )
+    subcommand.add_argument("output", help="Local path of the snapshot directory")
+    subcommand.add_argument(
+        "plugin_paths", nargs="+", help="Local paths to your plugins"
+    )
+    subcommand.add_argument(
+        "--index-url", default=None, help="Index to snapshot from (default: PyPI)"
+    )
+    subcommand.set_defaults(func=snapshot_dependencies_index)
+
+    ## snapshot of the reference datasets
+    subcommand = subparsers.add_parser(
+        "snapshot-reference",
+        help="Snapshots the reference datasets shared by the analyses of remote plugins",
+    )
+    subcommand.add_argument("output", help="Local path of the snapshot file")
+    subcommand.set_defaults(func=snapshot_reference_data)
+
     ## create-cff-citation
     subcommand = subparsers.add_parser(
         "create-citation", help="Creates a CITATION.cff file of a local plugin"
@@ -1 +1,5 @@
 NAPARI_HUB_API_URL = "https://api.napari-hub.org/plugins"
+NPE2_API_URL = "https://npe2api.vercel.app/"
+NPE2_ERRORS_URL = f"{NPE2_API_URL}/errors.json"
+OSI_LICENSES_URL = "https://api.opensource.org/licenses/"
+PYPI_API_URL = "https://pypi.org/pypi"
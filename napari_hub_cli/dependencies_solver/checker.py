@@ -1,6 +1,7 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from contextlib import suppress
 import sys
+import threading
 
 # This hack is here to remove a warning message that is yield by "_distutils_hack"
 with suppress(ImportError):
@@ -24,9 +25,11 @@ with suppress(ImportError):
 
 from .pip_patch import *  # This import needs to be imported just after the distutils hack and before any "pip" related import
 
-from functools import lru_cache
+from collections import namedtuple
 from itertools import product
 
+from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+from pip._vendor.packaging.utils import canonicalize_name
 from pip._internal.exceptions import (
     DistributionNotFound,
     InstallationSubprocessError,
@@ -34,8 +37,9 @@ from pip._internal.exceptions import (
     InstallationError,
 )
 
+from ..cache import PersistentCache, hash_key
 from ..fs import ConfigFile
-from .solver import DependencySolver
+from .solver import DependencySolver, NeedsBuild
 from .utils import build_options
 
 accepted_C_packages = {
@@ -59,24 +63,72 @@ DEPENDENCIES = 3
 
 NO_DEPENDENCIES = "Failed to resolve dependencies"
 
+# Resolutions are kept 3 days, a new release of a dependency can change them,
+# so they are not kept longer than a typical release cycle of the dependencies
+RESOLUTION_CACHE_TTL = 3 * 24 * 60 * 60
+RESOLUTION_CACHE_MAX_ENTRIES = 50000
+
+resolution_cache = PersistentCache(
+    "resolutions",
+    ttl=RESOLUTION_CACHE_TTL,
+    max_entries=RESOLUTION_CACHE_MAX_ENTRIES,
+)
+
+ResolvedPackage = namedtuple(
+    "ResolvedPackage", ["name", "version", "filename", "is_wheel", "url"]
+)
 
-def dirty_threadpool(f):
-    def inner(self):
-        self._analyse_with_all_options()
-        return f(self)
 
-    return inner
+def normalize_requirement(requirement):
+    """Returns the canonical form of a requirement (PEP 503 name, sorted extras and specifiers).
+
+    Parameters
+    ----------
+    requirement: str
+        The PEP 508 requirement, e.g: "Napari_Foo[Bar] >=1"
+
+    Returns
+    -------
+    str
+        the normalized requirement, e.g: "napari-foo[bar]>=1",
+        the requirement without whitespaces if it cannot be parsed
+    """
+    try:
+        parsed = Requirement(requirement)
+    except InvalidRequirement:
+        return "".join(requirement.split())
+    extras = ",".join(sorted(canonicalize_name(extra) for extra in parsed.extras))
+    normalized = canonicalize_name(parsed.name)
+    if extras:
+        normalized += f"[{extras}]"
+    if parsed.url:
+        normalized += f"@{parsed.url}"
+    normalized += f"{parsed.specifier}"
+    if parsed.marker:
+        normalized += f";{parsed.marker}"
+    return normalized
 
 
 class InstallationRequirements(ConfigFile):
+    # attributes that do not need a dependency resolution
+    DECLARATIVE_ATTRIBUTES = {
+        "has_windows_support",
+        "has_linux_support",
+        "has_macos_support",
+    }
+
     def __init__(
         self,
         path,
         requirements,
         python_versions=None,
         platforms=("win", "linux", "macos"),
+        index_url=None,
+        fast_metadata=None,
     ):
         super().__init__(path)
+        self.index_url = index_url
+        self.fast_metadata = fast_metadata
         self.solver = DependencySolver("solver", "")
         self.requirements = requirements
         self.python_versions = python_versions if python_versions else [None]
@@ -103,8 +155,12 @@ class InstallationRequirements(ConfigFile):
         #     ]
         # )
         self.options_list = self._build_options()
+        # the options of each platform, cached on the instance so it can be collected
+        self._platform_options = {}
         self.errors = {}
         self._installation_issues = {}
+        self._analyses_lock = threading.Lock()
+        self._analyses = None
 
     def _build_options(self, abis=None):
         # Read the classifiers to have python's versions and platforms
@@ -112,15 +168,38 @@ class InstallationRequirements(ConfigFile):
         platforms = self.platforms
         options_list = []
         for python_version, platform in product(python_versions, platforms):
-            options = build_options(python_version, platform, abis=abis)
+            options = build_options(
+                python_version,
+                platform,
+                abis=abis,
+                index_url=self.index_url,
+                fast_metadata=self.fast_metadata,
+            )
             options.named_platform = platform if platform else {"win", "linux", "macos"}
             options_list.append(options)
         return options_list
 
-    @lru_cache()
+    def _resolution_key(self, options):
+        requirements = sorted(
+            {normalize_requirement(r) for r in self.requirements if r and r.strip()}
+        )
+        platforms = options.platforms
+        return hash_key(
+            requirements,
+            options.python_version,
+            sorted(platforms) if platforms else platforms,
+            getattr(options, "index_url", None),
+            # the metadata-only mode can fail where a full resolution succeeds
+            bool(getattr(options, "fast_metadata", False)),
+        )
+
     def solve_dependencies(self, options):
+        key = self._resolution_key(options)
+        cached = resolution_cache.get(key)
+        if cached is not None:
+            return [ResolvedPackage(*package) for package in cached]
         try:
-            return self.solver.solve_dependencies(self.requirements, options)
+            result = self.solver.solve_dependencies(self.requirements, options)
         except DistributionNotFound as e:
             # print("Distribution not found", e, options.python_version, options.platforms)
             message = (
@@ -134,6 +213,9 @@ class InstallationRequirements(ConfigFile):
             message = f"An error occured in a sub-process: {e.args[0]}"
             kind = "sub-process/package build error"
             # print("SubProcessError", e, options.python_version, options.platforms)
+        except NeedsBuild as e:
+            message = f"A dependency has no wheel and its dependencies cannot be known without building it: {e.project}"
+            kind = "dependency needs build"
         except InstallationError as e:
             message = f"An error occured while installing this dependency (could be the need for dev tools to build it): {getattr(e, 'project', str(e))}"
             kind = "dependency need dev tools"
@@ -141,6 +223,22 @@ class InstallationRequirements(ConfigFile):
             # print("General Exception", e, options.python_version, options.platforms)
             self.errors[options] = e
             return None
+        else:
+            packages = [
+                ResolvedPackage(
+                    name,
+                    str(x.version),
+                    x.source_link.filename,
+                    x.source_link.is_wheel,
+                    x.source_link.url,
+                )
+                for name, x in result.mapping.items()
+                if x.source_link
+            ]
+            # Only successful resolutions are stored,
+            # failures can come from transient network issues
+            resolution_cache.set(key, packages)
+            return packages
 
         # Build the information message
         platform = options.platforms[0]
@@ -159,31 +257,53 @@ class InstallationRequirements(ConfigFile):
         self._installation_issues[(version, platform)] = (message, kind)
         return None
 
-    @lru_cache()
     def _get_platform_options(self, platform):
-        options_platform = []
-        for options in self.options_list:
-            if options.named_platform and platform in options.named_platform:
-                options_platform.append(options)
+        options_platform = self._platform_options.get(platform)
+        if options_platform is None:
+            options_platform = self._platform_options[platform] = [
+                options
+                for options in self.options_list
+                if options.named_platform and platform in options.named_platform
+            ]
         return options_platform
 
-    @lru_cache()
+    def _analysis_future(self, options):
+        with self._analyses_lock:
+            if self._analyses is None:
+                # the first access schedules the analysis for all the options
+                executor = ThreadPoolExecutor(max_workers=len(self.options_list))
+                self._analyses = {
+                    o: executor.submit(self._analyse_package, o)
+                    for o in self.options_list
+                }
+                executor.shutdown(wait=False)
+            future = self._analyses.get(options)
+            if future is not None:
+                return future
+            # options that are not part of the matrix are analysed by the caller
+            future = self._analyses[options] = Future()
+        try:
+            future.set_result(self._analyse_package(options))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
     def analysis_package(self, options):
-        result = self.solve_dependencies(options)
-        if result is None:
+        return self._analysis_future(options).result()
+
+    def _analyse_package(self, options):
+        packages = self.solve_dependencies(options)
+        if packages is None:
             return False, True, [], []
         all_wheels = True
         probable_C = []
         installed = []
-        for name, x in result.mapping.items():
-            link = x.source_link
-            if not link:
-                continue
-            all_wheels = all_wheels and link.is_wheel
-            has_C = "none-any." not in link.filename
+        for package in packages:
+            all_wheels = all_wheels and package.is_wheel
+            has_C = "none-any." not in package.filename
             if has_C:
-                probable_C.append(name)
-            installed.append((name, x.version))
+                probable_C.append(package.name)
+            installed.append((package.name, package.version))
         return True, all_wheels, probable_C, installed
 
     def num_installed_packages(self, options):
@@ -212,77 +332,64 @@ class InstallationRequirements(ConfigFile):
                 return False  # pragma: no cover
         return True
 
-    # lru cache here is a dirty trick to ensure that this function will be called only once
-    # but this only works if all the methods that will call it using the dirty decorator
-    # are called sequentially.
-    # if the methods with the dirty decorator are called in parallel, it's mandatory to
-    # use a lock on an instance variable to know if this function has been started already or not
-    @lru_cache()
     def _analyse_with_all_options(self):
-        with ThreadPoolExecutor(max_workers=len(self.options_list)) as executor:
-            executor.map(self.analysis_package, self.options_list)
-        for tmp_dir in global_tracker:
-            tmp_dir.cleanup()
+        """Analyses the requirements for all the options concurrently and waits for the results"""
+        futures = [self._analysis_future(options) for options in self.options_list]
+        wait(futures)
+
+    def prefetch(self, attributes):
+        if attributes - self.DECLARATIVE_ATTRIBUTES:
+            return [self._analyse_with_all_options]
+        return []
 
     @property
-    @dirty_threadpool
     def can_resolve_dependencies_linux(self):
         return self._isfor_platform("linux", DEPENDENCIES)
 
     @property
-    @dirty_threadpool
     def can_resolve_dependencies_windows(self):
         return self._isfor_platform("win", DEPENDENCIES)
 
     @property
-    @dirty_threadpool
     def can_resolve_dependencies_macos(self):
         return self._isfor_platform("macos", DEPENDENCIES)
 
     @property
-    @dirty_threadpool
     def number_of_dependencies(self):
         result = max(self.num_installed_packages(o) for o in self.options_list)
         return NO_DEPENDENCIES if not result else result
 
     @property
-    @dirty_threadpool
     def installable_windows(self):
         return self._isfor_platform("win", INSTALLABLE)
 
     @property
-    @dirty_threadpool
     def installable_linux(self):
         return self._isfor_platform("linux", INSTALLABLE)
 
     @property
-    @dirty_threadpool
     def installable_macos(self):
         return self._isfor_platform("macos", INSTALLABLE)
 
     @property
-    @dirty_threadpool
     def allwheel_windows(self):
         return self.can_resolve_dependencies_windows and self._isfor_platform(
             "win", ALL_WHEELS
         )
 
     @property
-    @dirty_threadpool
     def allwheel_linux(self):
         return self.can_resolve_dependencies_linux and self._isfor_platform(
             "linux", ALL_WHEELS
         )
 
     @property
-    @dirty_threadpool
     def allwheel_macos(self):
         return self.can_resolve_dependencies_macos and self._isfor_platform(
             "macos", ALL_WHEELS
         )
 
     @property
-    @dirty_threadpool
     def has_no_C_ext_windows(self):
         for options in self._get_platform_options("win"):
             res = self.has_no_C_extensions_dependencies(options)
@@ -291,7 +398,6 @@ class InstallationRequirements(ConfigFile):
         return self.can_resolve_dependencies_windows
 
     @property
-    @dirty_threadpool
     def has_no_C_ext_linux(self):
         for options in self._get_platform_options("linux"):
             res = self.has_no_C_extensions_dependencies(options)
@@ -300,7 +406,6 @@ class InstallationRequirements(ConfigFile):
         return self.can_resolve_dependencies_linux
 
     @property
-    @dirty_threadpool
     def has_no_C_ext_macos(self):
         for options in self._get_platform_options("macos"):
             res = self.has_no_C_extensions_dependencies(options)
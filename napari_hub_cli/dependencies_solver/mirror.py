@@ -0,0 +1,158 @@
+"""Snapshot of the index pages and metadata needed to resolve the dependencies of a set of plugins.
+
+The snapshot is a PEP 503 "simple" repository that only references the files selected during the resolution
+(for all the supported Python versions and platforms of the plugins).
+For wheels, only the core metadata (PEP 658) is stored when the index provides it, the wheel itself is stored otherwise.
+Using the snapshot as index (e.g: `napari-hub-cli check-quality --index-url <snapshot>`),
+the dependency solver resolves at local-disk speed, without any network access.
+"""
+import hashlib
+import html
+import json
+import re
+from pathlib import Path
+
+from ..network import http_get
+from .checker import InstallationRequirements
+from .utils import DEFAULT_INDEX_URL
+
+MANIFEST_NAME = "snapshot.json"
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+  <head><title>{title}</title></head>
+  <body>
+{links}
+  </body>
+</html>
+"""
+
+
+def normalize_name(name):
+    # see PEP 503
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _download(url, destination):
+    response = http_get(url, stream=True, timeout=60)
+    if response.status_code != 200:
+        return False
+    tmp = destination.with_suffix(f"{destination.suffix}.part")
+    with tmp.open(mode="wb") as f:
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            f.write(chunk)
+    tmp.replace(destination)
+    return True
+
+
+def _snapshot_file(package, files_dir):
+    """Stores the metadata or the distribution file of a resolved package.
+
+    Returns
+    -------
+    Dict[str, str]
+        the manifest entry of the file, None if nothing could be stored
+    """
+    url = package.url.split("#", 1)[0]
+    entry = {"filename": package.filename, "metadata": None}
+    if package.is_wheel:
+        metadata = files_dir / f"{package.filename}.metadata"
+        if metadata.exists() or _download(f"{url}.metadata", metadata):
+            entry["metadata"] = _sha256(metadata)
+            return entry
+    distribution = files_dir / package.filename
+    if distribution.exists() or _download(url, distribution):
+        entry["sha256"] = _sha256(distribution)
+        return entry
+    return None
+
+
+def _write_pages(output, manifest):
+    simple_dir = output / "simple"
+    projects = []
+    for project, files in sorted(manifest.items()):
+        links = []
+        for entry in sorted(files.values(), key=lambda e: e["filename"]):
+            href = f"../../files/{entry['filename']}"
+            attributes = ""
+            if entry.get("sha256"):
+                href += f"#sha256={entry['sha256']}"
+            if entry.get("metadata"):
+                metadata_hash = f"sha256={entry['metadata']}"
+                attributes = f' data-dist-info-metadata="{metadata_hash}" data-core-metadata="{metadata_hash}"'
+            links.append(
+                f'    <a href="{html.escape(href)}"{attributes}>{html.escape(entry["filename"])}</a><br/>'
+            )
+        project_dir = simple_dir / project
+        project_dir.mkdir(parents=True, exist_ok=True)
+        (project_dir / "index.html").write_text(
+            PAGE_TEMPLATE.format(title=f"Links for {project}", links="\n".join(links)),
+            encoding="utf-8",
+        )
+        projects.append(f'    <a href="{project}/">{project}</a><br/>')
+    simple_dir.mkdir(parents=True, exist_ok=True)
+    (simple_dir / "index.html").write_text(
+        PAGE_TEMPLATE.format(title="Simple index", links="\n".join(projects)),
+        encoding="utf-8",
+    )
+
+
+def snapshot_index(plugins, output, index_url=DEFAULT_INDEX_URL, print=print):
+    """Resolves the dependencies of plugins and snapshots what is needed to resolve them again offline.
+    Running the function on an existing snapshot directory completes the snapshot.
+
+    Parameters
+    ----------
+    plugins: Iterable[NapariPlugin]
+        The plugins to resolve the dependencies for
+    output: Path | str
+        The directory where the snapshot is stored
+    index_url: Optional[str] = DEFAULT_INDEX_URL
+        The index the dependencies are resolved against
+
+    Returns
+    -------
+    Path
+        the path towards the "simple" index that can be used as index url
+    """
+    output = Path(output)
+    files_dir = output / "files"
+    files_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = output / MANIFEST_NAME
+    manifest = (
+        json.loads(manifest_file.read_text(encoding="utf-8"))
+        if manifest_file.exists()
+        else {}
+    )
+
+    for plugin in plugins:
+        reqs = InstallationRequirements(
+            None,
+            plugin.requirements.requirements,
+            plugin.supported_python_version,
+            plugin.supported_platforms,
+            index_url=index_url,
+        )
+        for options in reqs.options_list:
+            packages = reqs.solve_dependencies(options)
+            if packages is None:
+                print(
+                    f"Dependencies of {plugin.name!r} cannot be resolved for Python {options.python_version} on {options.named_platform}"
+                )
+                continue
+            for package in packages:
+                files = manifest.setdefault(normalize_name(package.name), {})
+                if package.filename in files:
+                    continue
+                entry = _snapshot_file(package, files_dir)
+                if entry is None:
+                    print(f"{package.filename} cannot be downloaded from {package.url}")
+                    continue
+                files[package.filename] = entry
+
+    _write_pages(output, manifest)
+    manifest_file.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return output / "simple"
@@ -21,6 +21,8 @@ import platform
 import shutil
 import subprocess
 import sys
+import threading
+from contextlib import contextmanager
 
 
 NAPARI_HUB_PIP_TAG = "napari-hub-cli"
@@ -62,14 +64,37 @@ def load_pyproject_toml(self):
 InstallRequirement.load_pyproject_toml = load_pyproject_toml
 
 
-global_tracker = []
+# This hack is here to know which temporary directories are created by a resolution.
+# Each thread collects the directories it creates, so concurrent resolutions
+# only clean their own directories.
+_temp_dir_owners = threading.local()
 tempdir__init__ = TempDirectory.__init__
 
 
 def new__init__(self, *args, **kwargs):
+    owned = getattr(_temp_dir_owners, "owned", None)
+    if owned is not None and kwargs.get("globally_managed"):
+        # pip's global manager is a module global, it cannot be shared by concurrent resolutions.
+        # The directory is owned by the resolution instead.
+        kwargs["globally_managed"] = False
     tempdir__init__(self, *args, **kwargs)
-    global global_tracker
-    global_tracker.append(self)
+    if owned is not None:
+        owned.append(self)
+
+
+@contextmanager
+def owned_temp_directories():
+    """Collects the pip temporary directories created by the current thread in the context
+    and deletes them when leaving the context.
+    """
+    previous = getattr(_temp_dir_owners, "owned", None)
+    owned = _temp_dir_owners.owned = []
+    try:
+        yield owned
+    finally:
+        _temp_dir_owners.owned = previous
+        for tmp_dir in owned:
+            tmp_dir.cleanup()
 
 
 TempDirectory.__init__ = new__init__
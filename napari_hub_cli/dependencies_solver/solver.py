@@ -1,29 +1,206 @@
 import logging
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import Future
+from email.parser import BytesParser
 from functools import partial
 
 from .pip_patch import *  # need to be imported before any pip import
 
 from pip._internal.cli.cmdoptions import make_target_python
 from pip._internal.commands.install import InstallCommand
+from pip._internal.exceptions import InstallationError
+from pip._internal.index.collector import LinkCollector
 from pip._internal.index.package_finder import PackageFinder
 from pip._internal.operations.build.build_tracker import BuildTracker, get_build_tracker
-from pip._internal.operations.prepare import RequirementPreparer
+from pip._internal.metadata import get_metadata_distribution
+from pip._internal.operations.prepare import RequirementPreparer, get_http_url
 from pip._internal.req.constructors import install_req_from_req_string
 from pip._internal.req.req_set import RequirementSet
 from pip._internal.resolution.resolvelib.provider import PipProvider
 from pip._internal.resolution.resolvelib.reporter import PipReporter
 from pip._internal.resolution.resolvelib.resolver import Resolver
-from pip._internal.utils.temp_dir import (
-    TempDirectory,
-    global_tempdir_manager,
-    tempdir_registry,
-)
+from pip._internal.utils.temp_dir import TempDirectory, tempdir_registry
 from pip._vendor.resolvelib import ResolutionImpossible
 from pip._vendor.resolvelib import Resolver as RLResolver
 
 from pip._internal.utils.logging import subprocess_logger
 from pip._internal.resolution.resolvelib.factory import logger as factory_logger
 
+from ..cache import PersistentCache, hash_key
+
+# Distributions on an index are immutable, the extracted metadata never expire
+sdist_metadata_cache = PersistentCache("sdist-metadata", max_entries=50000)
+
+
+class NeedsBuild(InstallationError):
+    """Raised when the dependencies of a distribution cannot be known without building it"""
+
+    def __init__(self, project):
+        super().__init__(f"{project} needs to be built to know its dependencies")
+        self.project = project
+
+
+def _is_pkg_info(name):
+    # the PKG-INFO of a source distribution is in its top directory
+    return name.count("/") == 1 and name.endswith("/PKG-INFO")
+
+
+def read_sdist_metadata(path):
+    """Reads the PKG-INFO of a source distribution if its dependencies can be trusted (see PEP 643).
+
+    Parameters
+    ----------
+    path: str | Path
+        The path towards the source distribution archive (.tar.gz, .zip, ...)
+
+    Returns
+    -------
+    str
+        the content of the PKG-INFO file, None if the dependencies can only be known by building the distribution
+    """
+    path = f"{path}"
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                name = next((n for n in archive.namelist() if _is_pkg_info(n)), None)
+                if name is None:
+                    return None
+                content = archive.read(name)
+        else:
+            with tarfile.open(path) as archive:
+                member = next((m for m in archive if _is_pkg_info(m.name)), None)
+                if member is None or not member.isfile():
+                    return None
+                content = archive.extractfile(member).read()
+    except (tarfile.TarError, zipfile.BadZipFile, OSError):
+        return None
+    headers = BytesParser().parsebytes(content, headersonly=True)
+    try:
+        version = headers.get("Metadata-Version", "")
+        version = tuple(int(x) for x in version.split("."))
+    except ValueError:
+        return None
+    if version < (2, 2):
+        return None
+    dynamic = {field.lower() for field in headers.get_all("Dynamic", [])}
+    if "requires-dist" in dynamic or "requires-python" in dynamic:
+        return None
+    return content.decode("utf-8", errors="replace")
+
+
+class SharedResolutionState(object):
+    """Work shared by all the resolutions of a solver (e.g: the python version x platform option matrix).
+
+    Index pages and distributions metadata do not depend on the target python version or platform,
+    they are fetched once, whatever the number of concurrent resolutions that need them.
+    Only the tag-dependent candidate selection is done by each resolution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index_pages = {}
+        self.metadata = {}
+
+    def compute_once(self, store, key, compute):
+        """Returns the value of key in store, computing it if no other thread is already computing it.
+        Failures are not kept, the next call computes the value again.
+        """
+        with self._lock:
+            future = store.get(key)
+            owner = future is None
+            if owner:
+                future = store[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del store[key]
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+
+class SharedLinkCollector(LinkCollector):
+    """Link collector that fetches each index page only once for all the resolutions of a solver"""
+
+    shared_state = None
+
+    def fetch_response(self, location):
+        return self.shared_state.compute_once(
+            self.shared_state.index_pages,
+            location.url,
+            lambda: super(SharedLinkCollector, self).fetch_response(location),
+        )
+
+
+class SharedPreparer(RequirementPreparer):
+    """Preparer that fetches the metadata of each distribution only once for all the resolutions of a solver"""
+
+    shared_state = None
+
+    def prepare_linked_requirement(self, req, parallel_builds=False):
+        link = req.link
+        if self.shared_state is None or link.is_vcs or link.is_existing_dir():
+            return super().prepare_linked_requirement(req, parallel_builds)
+
+        prepared = []
+
+        def prepare():
+            dist = super(SharedPreparer, self).prepare_linked_requirement(
+                req, parallel_builds
+            )
+            prepared.append(dist)
+            return dist.metadata.as_bytes()
+
+        metadata = self.shared_state.compute_once(
+            self.shared_state.metadata, link.url_without_fragment, prepare
+        )
+        if prepared:
+            return prepared[0]
+        # the distribution has been prepared by another resolution
+        req.needs_more_preparation = True
+        return get_metadata_distribution(metadata, link.filename, req.req.name)
+
+
+class MetadataOnlyPreparer(SharedPreparer):
+    """Preparer that never builds a distribution.
+
+    Wheels are handled as usual (PEP 658 metadata, then range requests on the wheel, then full download).
+    For source distributions, the PKG-INFO is used when it is reliable,
+    otherwise a NeedsBuild error is raised instead of running the build backend.
+    """
+
+    def _fetch_metadata_only(self, req):
+        link = req.link
+        if link.is_wheel:
+            return super()._fetch_metadata_only(req)
+        metadata = None
+        if not link.is_vcs and not link.is_existing_dir():
+            metadata = self._sdist_metadata(link)
+        if metadata is None:
+            raise NeedsBuild(f"{req.req or req}")
+        return get_metadata_distribution(
+            metadata.encode("utf-8"), link.filename, req.req.name
+        )
+
+    def _sdist_metadata(self, link):
+        key = hash_key(link.url_without_fragment)
+        cached = sdist_metadata_cache.get(key)
+        if cached is not None:
+            return cached["metadata"]
+        if link.is_file:
+            path = link.file_path
+        else:
+            path = get_http_url(link, self._download, hashes=link.as_hashes()).path
+        metadata = read_sdist_metadata(path)
+        sdist_metadata_cache.set(key, {"metadata": metadata})
+        return metadata
+
 
 class MyResolver(Resolver):
     def resolve(self, root_reqs, check_supported_wheels):
@@ -64,6 +241,17 @@ class DependencySolver(InstallCommand):
     def __init__(self, name, summary):
         super().__init__(name, summary)
         self.verbosity = 0
+        self.shared_state = SharedResolutionState()
+
+    @classmethod
+    def make_requirement_preparer(cls, *args, **kwargs):
+        preparer = super().make_requirement_preparer(*args, **kwargs)
+        options = kwargs["options"]
+        if options.get("fast_metadata"):
+            preparer.__class__ = MetadataOnlyPreparer
+        else:
+            preparer.__class__ = SharedPreparer
+        return preparer
 
     @classmethod
     def make_resolver(
@@ -101,7 +289,6 @@ class DependencySolver(InstallCommand):
 
     def resolve(self, packages, options):
         self.tempdir_registry = self.enter_context(tempdir_registry())  ## Useful?
-        self.enter_context(global_tempdir_manager())
         # from pip._internal.utils.logging import setup_logging
         # level_number = setup_logging(
         #     verbosity=2,
@@ -126,6 +313,9 @@ class DependencySolver(InstallCommand):
             target_python=target_python,
             ignore_requires_python=options.ignore_requires_python,
         )
+        link_collector = finder._link_collector
+        link_collector.__class__ = SharedLinkCollector
+        link_collector.shared_state = self.shared_state
 
         # build_tracker = self.enter_context(get_build_tracker())
         build_tracker_tmp_dir = TempDirectory(
@@ -150,6 +340,7 @@ class DependencySolver(InstallCommand):
             use_user_site=options.use_user_site,
             verbosity=self.verbosity,
         )
+        preparer.shared_state = self.shared_state
         resolver = self.make_resolver(
             preparer=preparer,
             finder=finder,
@@ -175,4 +366,7 @@ class DependencySolver(InstallCommand):
         # are not made to be run in parallel
         # with self.main_context():
         self._in_main_context = True
-        return self.resolve(*args, **kwargs)
+        # the pip temporary directories of the resolution are owned by the current thread,
+        # pip's global tempdir manager is never used
+        with owned_temp_directories():
+            return self.resolve(*args, **kwargs)
@@ -1,4 +1,5 @@
 import itertools
+import os
 from pathlib import Path
 from tempfile import gettempdir
 from unittest import result
@@ -6,6 +7,10 @@ from unittest import result
 TEMPDIR = Path(gettempdir()) / "pipcache"
 TARGET_TEMP_DIR = Path(gettempdir()) / "target_install"
 
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+INDEX_URL_ENV = "NAPARI_HUB_CLI_INDEX_URL"
+FAST_METADATA_ENV = "NAPARI_HUB_CLI_FAST_METADATA"
+
 
 WIN64 = ["win_amd64"]
 WIN32 = ["win32"]
@@ -47,13 +52,51 @@ class Options(dict):
         return hash((self.python_version, platforms))
 
 
-def build_options(python_version, platform, abis=None):
+def read_index_url():
+    # the index can be changed using var env
+    return os.environ.get(INDEX_URL_ENV, DEFAULT_INDEX_URL)
+
+
+def read_fast_metadata():
+    # the fast metadata mode can be activated using var env
+    return os.environ.get(FAST_METADATA_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def as_index_url(location):
+    """Returns the url of an index from its location.
+    The location can be the url of the index or the path towards a local PEP 503 directory
+    (or a snapshot directory created by 'snapshot_index').
+
+    Parameters
+    ----------
+    location: str
+        The url or the path of the index
+
+    Returns
+    -------
+    str
+        The url of the index
+    """
+    if "://" in location:
+        return location
+    path = Path(location).absolute()
+    if (path / "simple").is_dir():
+        path = path / "simple"
+    return path.as_uri()
+
+
+def build_options(
+    python_version, platform, abis=None, index_url=None, fast_metadata=None
+):
     # abis = ["none", "abi3"] if abis is None else abis
     abis = None
     platforms = _platform_specs.get(platform, platform) if platform else None
     return Options(
         {
-            "index_url": "https://pypi.org/simple",
+            "index_url": as_index_url(index_url or read_index_url()),
+            "fast_metadata": read_fast_metadata()
+            if fast_metadata is None
+            else fast_metadata,
             "extra_index_urls": [],
             "no_index": False,
             "find_links": [],
@@ -0,0 +1,93 @@
+"""Retrieval of the distributions of a plugin published on PyPI.
+
+The distributions are used as a fallback source for the analysis when the repository of a plugin
+is unknown or cannot be read (see `napari_hub_cli.fs.archivefs`).
+"""
+from contextlib import closing
+
+import requests
+
+from .constants import PYPI_API_URL
+from .network import http_get
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# the sdist has the configuration files of the repository, wheels only have the metadata
+DISTRIBUTION_PREFERENCE = ("sdist", "bdist_wheel")
+
+
+def latest_distributions(plugin_name, pypi_url=PYPI_API_URL):
+    """Returns the files of the latest release of a project, by preference order.
+
+    Parameters
+    ----------
+    plugin_name: str
+        The name of the project on PyPI
+    pypi_url: str = PYPI_API_URL
+        The url of the PyPI JSON API
+
+    Returns
+    -------
+    List[Dict]
+        the files of the release (filename, url, packagetype, ...), sdists first then wheels
+    """
+    try:
+        response = http_get(f"{pypi_url}/{plugin_name}/json")
+    except requests.RequestException:
+        return []
+    if response.status_code != 200:
+        return []
+    try:
+        files = response.json().get("urls", [])
+    except ValueError:
+        return []
+    files = [f for f in files if f.get("packagetype") in DISTRIBUTION_PREFERENCE]
+    return sorted(files, key=lambda f: DISTRIBUTION_PREFERENCE.index(f["packagetype"]))
+
+
+def download_file(url, destination):
+    """Streams a file to the disk.
+
+    Returns
+    -------
+    bool
+        True if the file has been downloaded
+    """
+    try:
+        response = http_get(url, stream=True)
+    except requests.RequestException:
+        return False
+    with closing(response):
+        if response.status_code != 200:
+            return False
+        try:
+            with open(destination, "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        except (OSError, requests.RequestException):
+            return False
+    return True
+
+
+def download_distribution(plugin_name, destination, pypi_url=PYPI_API_URL):
+    """Downloads the latest distribution of a plugin, the sdist is preferred to the wheel.
+
+    Parameters
+    ----------
+    plugin_name: str
+        The name of the plugin on PyPI
+    destination: Path
+        The directory where the distribution is downloaded
+    pypi_url: str = PYPI_API_URL
+        The url of the PyPI JSON API
+
+    Returns
+    -------
+    Optional[Tuple[Path, str]]
+        the path of the downloaded archive and its url, None if no distribution can be downloaded
+    """
+    for distribution in latest_distributions(plugin_name, pypi_url=pypi_url):
+        # the filename comes from the index, only its last component is kept
+        path = destination / distribution["filename"].rsplit("/", 1)[-1]
+        if download_file(distribution["url"], path):
+            return path, distribution["url"]
+    return None
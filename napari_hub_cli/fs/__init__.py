@@ -1,5 +1,7 @@
-from configparser import ConfigParser
-from functools import lru_cache
+import posixpath
+from configparser import ConfigParser, Error as ConfigParserError
+from functools import cached_property, lru_cache
+from pathlib import Path
 
 try:
     try:
@@ -15,7 +17,7 @@ import tomli
 import tomli_w
 import yaml
 
-from ..utils import delete_file_tree, parse_setup, scrap_git_infos
+from ..utils import delete_file_tree, exec_setup, parse_setup, scrap_git_infos
 
 format_parsers = {}
 format_unparsers = {}
@@ -42,6 +44,12 @@ def register_unparser(extensions):
 @register_parser([".cfg", ".CFG"])
 def parse_cfg(cfg_file):
     config = ConfigParser()
+    if not isinstance(cfg_file, Path):
+        # file from an archive (see `ArchivePath`), the "file:" and "attr:" directives cannot be resolved
+        config.read_string(cfg_file.read_text(encoding="utf-8"))
+        content = {section: dict(config[section]) for section in config.sections()}
+        content["__detailed__"] = {}
+        return content
     config.read(f"{cfg_file}")
     content = {}
     for section in config.sections():
@@ -66,6 +74,9 @@ def parse_toml(toml_file):
 
 @register_parser([".py"])
 def parse_py(py_file):
+    if not isinstance(py_file, Path):
+        # file from an archive (see `ArchivePath`)
+        return exec_setup(py_file.read_text(encoding="utf-8"), f"{py_file}")
     return parse_setup(f"{py_file.absolute()}")
 
 
@@ -133,6 +144,21 @@ class RepositoryFile(object):
     def exists(self):
         return self.file is not None and self.file.exists()
 
+    def prefetch(self, attributes):
+        """Gives the remote fetches needed to compute some attributes.
+
+        Parameters
+        ----------
+        attributes: Set[str]
+            The name of the attributes that will be evaluated
+
+        Returns
+        -------
+        List[Callable[[], Any]]
+            Functions warming the caches used by the attributes, they can run concurrently
+        """
+        return []
+
     def __eq__(self, other):
         return isinstance(other, self.__class__) and self.file == other.file
 
@@ -141,18 +167,27 @@ class RepositoryFile(object):
 
 
 class ConfigFile(RepositoryFile):
-    def __init__(self, file):
-        super().__init__(file)
-        if self.exists:
-            try:
-                self.data = format_parsers[file.suffix](file)
-                self.is_valid = True
-            except Exception:
-                self.data = {}
-                self.is_valid = False
-        else:
-            self.data = {}
-            self.is_valid = False
+    # the file is parsed on the first access to "data" or "is_valid"
+
+    @cached_property
+    def _parsed(self):
+        if not self.exists:
+            return {}, False
+        try:
+            return self.parse(self.file), True
+        except Exception:
+            return {}, False
+
+    @cached_property
+    def data(self):
+        return self._parsed[0]
+
+    @cached_property
+    def is_valid(self):
+        return self._parsed[1]
+
+    def parse(self, file):
+        return format_parsers[file.suffix](file)
 
     def save(self):
         self.file.parent.mkdir(parents=True, exist_ok=True)
@@ -166,62 +201,227 @@ class VirtualJsonFile(RepositoryFile):
         super().__init__(virtualpath)
 
 
+def _module_files(module, package_dir):
+    # the candidate files of a module, following the "package_dir" mapping of setuptools
+    parts = [part for part in module.split(".") if part]
+    if not parts:
+        return []
+    for i in range(len(parts), -1, -1):
+        prefix = ".".join(parts[:i])
+        if prefix in package_dir:
+            root, parts = package_dir[prefix], parts[i:]
+            break
+    else:
+        root = ""
+    base = posixpath.join(root, *parts)
+    files = [f"{base}.py", posixpath.join(base, "__init__.py")]
+    # the parent packages are imported first
+    for i in range(1, len(parts)):
+        files.append(posixpath.join(root, *parts[:i], "__init__.py"))
+    return files
+
+
 class NapariPlugin(object):
-    def __init__(self, path, url=None, forced_gen=0):
-        from ..dependencies_solver import InstallationRequirements
-        from .additional_info import AdditionalInfo
-        from .condainfo import CondaInfo
-        from .configfiles import (
-            CitationFile,
-            NapariConfig,
-            PyProjectToml,
-            SetupCfg,
-            SetupPy,
-        )
-        from .descriptions import MarkdownDescription
-        from .ghactions import GhActionWorkflowFolder
-        from .license import License
-        from .pythonlint import PythonSrcDir
+    # files read by the analyses, as gitignore-like patterns (used for sparse checkouts)
+    SPARSE_PATTERNS = (
+        "/setup.py",
+        "/setup.cfg",
+        "/pyproject.toml",
+        "/requirements*.txt",
+        "/CITATION.cff",
+        "/README*",
+        "/LICENSE*",
+        "/LICENCE*",
+        "/COPYING*",
+        "/.napari/",
+        "/.napari-hub/",
+        "/.github/workflows/",
+        "*.yaml",  # npe2 manifests are located in the packages
+    )
+    # sources read by the linter, the modules read by the "attr:" directives
+    # of the configuration are fetched separately (see `referenced_files`)
+    PYTHON_SOURCES_PATTERNS = ("*.py",)
 
+    def __init__(self, path, url=None, forced_gen=0):
+        # the components are built on first access, so an analysis only pays for the files its checks read
         self.path = path
         self.url = url
-        self.setup_py = SetupPy(path / "setup.py")
-        self.setup_cfg = SetupCfg(path / "setup.cfg")
-        if (path / ".napari").exists():
-            napari_dir = path / ".napari"
-        else:
-            napari_dir = path / ".napari-hub"
-        self.config_yml = NapariConfig(napari_dir / "config.yml")
-        self.description = MarkdownDescription.from_file(napari_dir / "DESCRIPTION.md")
-        self.pyproject_toml = PyProjectToml(path / "pyproject.toml")
-        self.citation_file = CitationFile(path / "CITATION.cff")
-        self.readme = MarkdownDescription.from_file(path / "README.md")
+        self.forced_gen = forced_gen
+
+    @cached_property
+    def setup_py(self):
+        from .configfiles import SetupPy
+
+        return SetupPy(self.path / "setup.py")
+
+    @cached_property
+    def setup_cfg(self):
+        from .configfiles import SetupCfg
+
+        return SetupCfg(self.path / "setup.cfg")
+
+    @cached_property
+    def referenced_files(self):
+        """The files that the configuration reads with "file:" and "attr:" directives.
+        They are not matched by the sparse patterns, e.g: "long_description = file: docs/intro.md".
+        An "attr:" directive gives the module it reads, both the module file and the package
+        "__init__.py" are returned, with the "__init__.py" of the parent packages.
+
+        Returns
+        -------
+        List[str]
+            the paths relative to the repository root, with "/" as separator
+        """
+        paths, modules = [], []
+        package_dir = {}
+        config = ConfigParser(interpolation=None)
+        try:
+            config.read_string((self.path / "setup.cfg").read_text(encoding="utf-8"))
+        except (OSError, UnicodeDecodeError, ConfigParserError):
+            config = ConfigParser(interpolation=None)
+        for section in config.sections():
+            for value in config[section].values():
+                value = value.strip()
+                if value.startswith("file:"):
+                    paths.extend(value[len("file:") :].split(","))
+                elif value.startswith("attr:"):
+                    modules.append(value[len("attr:") :].strip().rpartition(".")[0])
+        if config.has_option("options", "package_dir"):
+            for line in config["options"]["package_dir"].splitlines():
+                package, _, directory = line.partition("=")
+                if directory.strip():
+                    package_dir[package.strip()] = directory.strip()
+        try:
+            with (self.path / "pyproject.toml").open(mode="rb") as f:
+                pyproject = tomli.load(f)
+        except (OSError, tomli.TOMLDecodeError):
+            pyproject = {}
+        setuptools = pyproject.get("tool", {}).get("setuptools", {})
+        dynamic = setuptools.get("dynamic", {})
+        for value in dynamic.values() if isinstance(dynamic, dict) else ():
+            if not isinstance(value, dict):
+                continue
+            files = value.get("file", [])
+            paths.extend([files] if isinstance(files, str) else files)
+            if isinstance(value.get("attr"), str):
+                modules.append(value["attr"].strip().rpartition(".")[0])
+        if isinstance(setuptools.get("package-dir"), dict):
+            package_dir.update(setuptools["package-dir"])
+        for module in modules:
+            paths.extend(_module_files(module, package_dir))
+        referenced = []
+        for path in paths:
+            path = posixpath.normpath(f"{path}".strip())
+            # paths outside of the repository cannot be fetched
+            if path in ("", ".") or path.startswith(("/", "..")):
+                continue
+            if path not in referenced:
+                referenced.append(path)
+        return referenced
+
+    @cached_property
+    def file_index(self):
+        from .fileindex import FileIndex
+
+        return FileIndex(self.path)
+
+    @cached_property
+    def napari_dir(self):
+        if self.file_index.is_dir(self.path / ".napari"):
+            return self.path / ".napari"
+        return self.path / ".napari-hub"
+
+    @cached_property
+    def config_yml(self):
+        from .configfiles import NapariConfig
+
+        return NapariConfig(self.napari_dir / "config.yml")
+
+    @cached_property
+    def description(self):
+        from .descriptions import MarkdownDescription
+
+        return MarkdownDescription.from_file(self.napari_dir / "DESCRIPTION.md")
+
+    @cached_property
+    def pyproject_toml(self):
+        from .configfiles import PyProjectToml
+
+        return PyProjectToml(self.path / "pyproject.toml")
+
+    @cached_property
+    def pkg_info(self):
+        from .configfiles import PkgInfo
+
+        return PkgInfo(PkgInfo.find(self.path))
+
+    @cached_property
+    def citation_file(self):
+        from .configfiles import CitationFile
+
+        return CitationFile(self.path / "CITATION.cff")
+
+    @cached_property
+    def readme(self):
+        from .descriptions import MarkdownDescription
+
+        return MarkdownDescription.from_file(self.path / "README.md")
+
+    @cached_property
+    def requirements(self):
+        from ..dependencies_solver import InstallationRequirements
 
         req_file, reqs = self.extractfrom_config("requirements")
-        req_file = req_file.file if req_file else path / "requirements.txt"
-        self.requirements = InstallationRequirements(
+        req_file = req_file.file if req_file else self.path / "requirements.txt"
+        return InstallationRequirements(
             req_file,
             reqs,
             self.supported_python_version,
             self.supported_platforms,
         )
-        self.condainfo = CondaInfo(
-            path / "conda-infos.json",
+
+    @cached_property
+    def condainfo(self):
+        from .condainfo import CondaInfo
+
+        return CondaInfo(
+            self.path / "conda-infos.json",
             self.name,
             self.supported_python_version,
             self.supported_platforms,
         )
-        self.forced_gen = forced_gen
 
+    @cached_property
+    def plugin_url(self):
         pypi_config = self.first_pypi_config()
         source_code = pypi_config.sourcecode if pypi_config else None
-        plugin_url = self.url or source_code or scrap_git_infos(self.path).get("url")
-        self.license = License(path / "LICENSE", plugin_url)
-        self.additional_info = AdditionalInfo(path)
-        self.gh_workflow_folder = GhActionWorkflowFolder(
-            path / ".github" / "workflows", plugin_url
+        return self.url or source_code or scrap_git_infos(self.path).get("url")
+
+    @cached_property
+    def license(self):
+        from .license import License
+
+        return License(self.path / "LICENSE", self.plugin_url)
+
+    @cached_property
+    def additional_info(self):
+        from .additional_info import AdditionalInfo
+
+        return AdditionalInfo(self.path)
+
+    @cached_property
+    def gh_workflow_folder(self):
+        from .ghactions import GhActionWorkflowFolder
+
+        return GhActionWorkflowFolder(
+            self.path / ".github" / "workflows", self.plugin_url, self.file_index
         )
-        self.linter = PythonSrcDir(self.path, self.gen)
+
+    @cached_property
+    def linter(self):
+        from .pythonlint import PythonSrcDir
+
+        return PythonSrcDir(self.path, self.gen, index=self.file_index)
 
     @property
     def summary(self):
@@ -257,8 +457,7 @@ class NapariPlugin(object):
             return 2
         return 1
 
-    @property
-    @lru_cache(maxsize=1)
+    @cached_property
     def npe2_yaml(self):
         from .configfiles import Npe2Yaml
 
@@ -272,15 +471,15 @@ class NapariPlugin(object):
                 return f
         return None
 
-    @property
-    @lru_cache()
+    @cached_property
     def pypi_files(self):
         """Returns the PyPi files in preference order (from the most to the less prioritary)
 
         Returns:
-            ConfigFile: the PyPi files from the repository
+            ConfigFile: the PyPi files from the repository,
+            the core metadata file is only found in distributions (sdists and wheels)
         """
-        return self.pyproject_toml, self.setup_cfg, self.setup_py
+        return self.pyproject_toml, self.setup_cfg, self.setup_py, self.pkg_info
 
     @property
     def has_citation_file(self):
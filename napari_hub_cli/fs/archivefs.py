@@ -0,0 +1,291 @@
+"""Read-only file system backed by a distribution archive (sdist tarball or wheel zip).
+
+`ArchivePath` implements the subset of `pathlib.Path` used by the repository files,
+so a `NapariPlugin` can be analysed directly from a downloaded distribution, without unpacking it.
+Members are read lazily from the archive when they are accessed.
+Large members that are stored without compression are read without copy from a memory map of the archive.
+"""
+import io
+import mmap
+import posixpath
+import struct
+import tarfile
+import threading
+import zipfile
+from fnmatch import fnmatch
+from pathlib import Path, PurePosixPath
+
+# members bigger than this are read through the memory map when possible
+ZERO_COPY_THRESHOLD = 1024 * 1024  # in bytes
+ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+class ArchiveFileSystem(object):
+    """Index of the members of an archive.
+
+    Parameters
+    ----------
+    archive: Path | str
+        The path of the archive: a wheel or a zip file, or a (compressed) tarball.
+        The single top directory of tarballs (e.g: "name-version/" for sdists) is the root of the file system.
+    """
+
+    def __init__(self, archive):
+        self.archive = Path(archive)
+        self.is_zip = zipfile.is_zipfile(self.archive)
+        self._lock = threading.Lock()
+        self._handle = None
+        self._mmap = None
+        self._members = None
+        self._directories = None
+
+    def _open(self):
+        if self._handle is None:
+            if self.is_zip:
+                self._handle = zipfile.ZipFile(self.archive)
+            else:
+                self._handle = tarfile.open(self.archive)
+        return self._handle
+
+    def _index(self):
+        with self._lock:
+            if self._members is not None:
+                return self._members
+            handle = self._open()
+            if self.is_zip:
+                entries = [(i.filename, i) for i in handle.infolist() if not i.is_dir()]
+            else:
+                entries = [(m.name, m) for m in handle.getmembers() if m.isfile()]
+            names = [PurePosixPath(name).parts for name, _ in entries]
+            prefix = 0
+            tops = {parts[0] for parts in names if parts}
+            if not self.is_zip and len(tops) == 1 and all(len(p) > 1 for p in names):
+                prefix = 1
+            members = {}
+            directories = {""}
+            for parts, (_, member) in zip(names, entries):
+                parts = parts[prefix:]
+                if not parts or ".." in parts:
+                    continue
+                path = "/".join(parts)
+                members[path] = member
+                for i in range(1, len(parts)):
+                    directories.add("/".join(parts[:i]))
+            self._directories = directories
+            self._members = members
+            return members
+
+    @property
+    def root(self):
+        return ArchivePath(self, "")
+
+    def is_file(self, path):
+        return path in self._index()
+
+    def is_dir(self, path):
+        self._index()
+        return path in self._directories
+
+    def names(self):
+        """Returns the paths of all the files in the archive"""
+        return self._index().keys()
+
+    def read_bytes(self, path):
+        buffer = self.read_buffer(path)
+        return buffer.tobytes() if isinstance(buffer, memoryview) else buffer
+
+    def read_buffer(self, path):
+        """Returns the content of a member, without copy if possible.
+
+        Returns
+        -------
+        memoryview | bytes
+            a view on the memory map of the archive for large uncompressed members, the content otherwise
+
+        Raises
+        ------
+        FileNotFoundError
+            if there is no member at this path
+        """
+        member = self._index().get(path)
+        if member is None:
+            raise FileNotFoundError(f"{self.archive}/{path}")
+        with self._lock:
+            span = self._uncompressed_span(member)
+            if span is not None:
+                start, size = span
+                return memoryview(self._map())[start : start + size]
+            handle = self._open()
+            if self.is_zip:
+                return handle.read(member)
+            with handle.extractfile(member) as f:
+                return f.read()
+
+    def _uncompressed_span(self, member):
+        if self.is_zip:
+            if member.file_size < ZERO_COPY_THRESHOLD:
+                return None
+            if member.compress_type != zipfile.ZIP_STORED:
+                return None
+            header = self._map()[
+                member.header_offset : member.header_offset + ZIP_LOCAL_HEADER.size
+            ]
+            *_, name_length, extra_length = ZIP_LOCAL_HEADER.unpack(header)
+            start = (
+                member.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length
+            )
+            return start, member.file_size
+        if member.size < ZERO_COPY_THRESHOLD:
+            return None
+        # only plain tarballs can be mapped, compressed ones are streams
+        if not isinstance(self._handle.fileobj, io.BufferedReader):
+            return None
+        return member.offset_data, member.size
+
+    def _map(self):
+        if self._mmap is None:
+            with self.archive.open("rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, tb):
+        self.close()
+
+
+class ArchivePath(object):
+    """Read-only path towards a file or a directory of an archive, with the `pathlib.Path` interface"""
+
+    def __init__(self, filesystem, path=""):
+        self.filesystem = filesystem
+        self.path = path
+
+    def joinpath(self, *others):
+        path = posixpath.join(self.path, *(f"{o}" for o in others))
+        path = posixpath.normpath(path).lstrip("/")
+        return ArchivePath(self.filesystem, "" if path == "." else path)
+
+    def __truediv__(self, other):
+        return self.joinpath(other)
+
+    @property
+    def _pure(self):
+        return PurePosixPath(self.path)
+
+    @property
+    def name(self):
+        return self._pure.name
+
+    @property
+    def suffix(self):
+        return self._pure.suffix
+
+    @property
+    def stem(self):
+        return self._pure.stem
+
+    @property
+    def parts(self):
+        return self._pure.parts
+
+    @property
+    def parent(self):
+        parent = posixpath.dirname(self.path)
+        return ArchivePath(self.filesystem, parent)
+
+    def exists(self):
+        return self.is_file() or self.is_dir()
+
+    def is_file(self):
+        return self.filesystem.is_file(self.path)
+
+    def is_dir(self):
+        return self.filesystem.is_dir(self.path)
+
+    def read_bytes(self):
+        return self.filesystem.read_bytes(self.path)
+
+    def read_buffer(self):
+        return self.filesystem.read_buffer(self.path)
+
+    def read_text(self, encoding="utf-8", errors=None):
+        return self.read_bytes().decode(encoding, errors or "strict")
+
+    def open(self, mode="r", encoding=None, errors=None, **kwargs):
+        if set(mode) - {"r", "b", "t"}:
+            raise io.UnsupportedOperation(f"{self} is read-only")
+        raw = io.BytesIO(self.read_bytes())
+        if "b" in mode:
+            return raw
+        return io.TextIOWrapper(raw, encoding=encoding or "utf-8", errors=errors)
+
+    def mkdir(self, *args, **kwargs):
+        raise io.UnsupportedOperation(f"{self} is read-only")
+
+    def iterdir(self):
+        prefix = f"{self.path}/" if self.path else ""
+        children = set()
+        for name in self.filesystem.names():
+            if name.startswith(prefix):
+                children.add(name[len(prefix) :].split("/", 1)[0])
+        for child in sorted(children):
+            yield self / child
+
+    def glob(self, pattern):
+        """Yields the files matching a pattern relative to this directory ("**/" matches any sub-directory)"""
+        prefix = f"{self.path}/" if self.path else ""
+        recursive = pattern.startswith("**/")
+        pattern = pattern[3:] if recursive else pattern
+        depth = pattern.count("/")
+        for name in sorted(self.filesystem.names()):
+            if not name.startswith(prefix):
+                continue
+            relative = name[len(prefix) :]
+            parts = relative.split("/")
+            if recursive:
+                candidate = "/".join(parts[len(parts) - depth - 1 :])
+            elif len(parts) == depth + 1:
+                candidate = relative
+            else:
+                continue
+            if fnmatch(candidate, pattern):
+                yield ArchivePath(self.filesystem, name)
+
+    def rglob(self, pattern):
+        return self.glob(f"**/{pattern}")
+
+    def absolute(self):
+        return self
+
+    def resolve(self):
+        return self
+
+    def relative_to(self, other):
+        return self._pure.relative_to(other._pure)
+
+    def __str__(self):
+        return f"{self.filesystem.archive}/{self.path}".rstrip("/")
+
+    def __repr__(self):
+        return f"ArchivePath({str(self)!r})"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ArchivePath)
+            and self.filesystem is other.filesystem
+            and self.path == other.path
+        )
+
+    def __hash__(self):
+        return hash((id(self.filesystem), self.path))
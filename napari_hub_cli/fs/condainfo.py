@@ -1,15 +1,22 @@
 import functools
 from functools import lru_cache
 
-import requests
-
+from ..constants import NPE2_API_URL, NPE2_ERRORS_URL
 from ..fs import VirtualJsonFile
+from ..network import http_get
+from ..reference import reference_data
 
 
 class CondaInfo(VirtualJsonFile):
-    BASE_URL = "https://npe2api.vercel.app/"
+    BASE_URL = NPE2_API_URL
     CONDA_URL = f"{BASE_URL}/api/conda"
-    ERRORS_URL = f"{BASE_URL}/errors.json"
+    ERRORS_URL = NPE2_ERRORS_URL
+    PLATFORMS_ATTRIBUTES = {
+        "is_on_conda",
+        "is_windows_supported",
+        "is_linux_supported",
+        "is_macos_supported",
+    }
 
     def __init__(self, virtualpath, name, python_version, platforms):
         super().__init__(virtualpath)
@@ -19,7 +26,7 @@ class CondaInfo(VirtualJsonFile):
 
     @lru_cache()
     def _fetch_data(self, url):
-        infos = requests.get(url)
+        infos = http_get(url)
         if infos.status_code != 200:
             return {}
         return infos.json()
@@ -31,7 +38,15 @@ class CondaInfo(VirtualJsonFile):
         return data.get("conda_platforms", [])
 
     def _query_errors(self):
-        return self._fetch_data(self.ERRORS_URL)
+        return reference_data().npe2_errors
+
+    def prefetch(self, attributes):
+        fetches = []
+        if attributes & self.PLATFORMS_ATTRIBUTES:
+            fetches.append(self._query_platforms)
+        if "has_no_npe_parse_errors" in attributes:
+            fetches.append(self._query_errors)
+        return fetches
 
     @property
     def has_no_npe_parse_errors(self):
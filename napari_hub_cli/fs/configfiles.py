@@ -1,3 +1,5 @@
+from configparser import ConfigParser
+from email.parser import Parser
 from itertools import chain
 import re
 from functools import lru_cache
@@ -429,6 +431,114 @@ class PyProjectToml(Metadata, ConfigFile):
         return self._build_dep_list(deps) if isinstance(deps, dict) else deps
 
 
+class PkgInfo(Metadata, ConfigFile):
+    """Core metadata of a distribution ("PKG-INFO" in sdists, "*.dist-info/METADATA" in wheels)"""
+
+    @staticmethod
+    def find(path):
+        pkg_info = path / "PKG-INFO"
+        if pkg_info.exists():
+            return pkg_info
+        return next(path.glob("*.dist-info/METADATA"), None)
+
+    def parse(self, file):
+        message = Parser().parsestr(file.read_text(encoding="utf-8"))
+        urls = {}
+        for entry in message.get_all("Project-URL", []):
+            label, _, url = entry.partition(",")
+            urls[label.strip()] = url.strip()
+        return {
+            "name": message.get("Name"),
+            "version": message.get("Version"),
+            "summary": message.get("Summary"),
+            "author": message.get("Author") or message.get("Author-email"),
+            "home_page": message.get("Home-page"),
+            "project_urls": urls,
+            "classifiers": message.get_all("Classifier", []),
+            "requires_dist": message.get_all("Requires-Dist", []),
+            "description": message.get_payload() or message.get("Description", ""),
+        }
+
+    def _search_url(self, *labels):
+        urls = self.data.get("project_urls", {})
+        return next((urls[label] for label in labels if label in urls), None)
+
+    @property
+    def name(self):
+        return self.data.get("name")
+
+    @property
+    def version(self):
+        return self.data.get("version")
+
+    @property
+    def summary(self):
+        return self.data.get("summary")
+
+    @property
+    def author(self):
+        return self.data.get("author")
+
+    @property
+    def sourcecode(self):
+        return self._search_url("Source Code", "Source")
+
+    @property
+    def bugtracker(self):
+        return self._search_url("Bug Tracker", "Tracker")
+
+    @property
+    def usersupport(self):
+        return self._search_url("User Support", "Support")
+
+    @lru_cache(maxsize=1)
+    def long_description(self):
+        return MarkdownDescription(self.data.get("description", ""), self.file)
+
+    def find_npe2(self):
+        # only wheels have an entry points file next to their metadata
+        if not self.exists:
+            return None
+        entry_points = self.file.parent / "entry_points.txt"
+        if not self.file.parent.name.endswith(".dist-info") or not entry_points.exists():
+            return None
+        config = ConfigParser()
+        config.read_string(entry_points.read_text(encoding="utf-8"))
+        if not config.has_section("napari.manifest"):
+            return None
+        pattern = re.compile(r"(?P<modules>[^:]+\:)(?P<file>(.*?))\.yaml")
+        for manifest in config["napari.manifest"].values():
+            result = pattern.match(manifest.strip())
+            if result:
+                parsed = result.groupdict()
+                modules = [m for m in parsed["modules"].split(":") if m]
+                packages = [p for module in modules for p in module.split(".")]
+                root = self.file.parent.parent
+                return root.joinpath(*packages) / f"{parsed['file']}.yaml"
+        return None
+
+    def create_npe2_entry(self):
+        """Distributions are never modified, no entry is created.
+
+        Returns
+        -------
+        None
+            there is no location for a new npe2 manifest
+        """
+        return None
+
+    @property
+    def classifiers(self):
+        return self.data.get("classifiers", [])
+
+    @property
+    def requirements(self):
+        # requirements of the extras are not installed by default
+        return [
+            r for r in self.data.get("requires_dist", []) if "extra ==" not in r
+        ]
+
+
 class Npe2Yaml(Metadata, ConfigFile):
     def __init__(self, file, plugin=None):
         super().__init__(file)
@@ -451,6 +561,8 @@ class Npe2Yaml(Metadata, ConfigFile):
             return
         config = self.plugin.first_pypi_config()
         location = config.create_npe2_entry()
+        if location is None:
+            return
         self.file = location
         super().save()
 
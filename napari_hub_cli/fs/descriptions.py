@@ -1,26 +1,301 @@
 import re
-from functools import lru_cache
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 
 import bibtexparser
 import requests
 from bibtexparser.bparser import BibTexParser
 from bibtexparser.customization import convert_to_unicode
-from iguala import cond, match, regex
 from mistletoe import Document
 from mistletoe.block_token import Heading
 from mistletoe.span_token import RawText
 
+from ..cache import PersistentCache, hash_key
 from ..fs import RepositoryFile
+from ..network import http_get
 from .citations import APA_REGEXP, APACitation, BibtexCitation
 
 
+VIDEO_REGEX = re.compile(r"^http(s)?://.*?\.(mp4|avi|mpeg)$")
+INSTALLATION_REGEX = re.compile(r"^.*?(pip|conda)\s+install")
+USAGE_REGEX = re.compile(r"^.*?[Uu]sage")
+DOI_REGEX = re.compile(r"(http.*|doi\.org.*)?(10.(\d)+/([^(\s\>\"\<)])+)")
+IMG_REGEX = re.compile(
+    r"((?!http)|https://github\.com|https://user-images\.githubusercontent\.com)(?!.*(badge)).*?\.(gif|png|jpeg|jpg|svg)$"
+)
+# number of indexed documents kept in memory, a same README is often read through several files
+MARKDOWN_INDEX_CACHE_SIZE = 64
+# documents and lines are capped before parsing, the parser is slow on huge inputs
+MAX_MARKDOWN_SIZE = 1024 * 1024  # in characters
+MAX_LINE_LENGTH = 16 * 1024  # in characters
+# inline images are not read by the checks, their base64 payload is dropped
+BASE64_PAYLOAD = re.compile(r"(data:[\w/+.-]+;base64,)[A-Za-z0-9+/=]{256,}")
+CROSSCITE_URL = "https://citation.crosscite.org/format"
+# number of DOIs resolved at the same time, the HTTP client also limits the requests per host
+DOI_WORKERS = 4
+
+# DOI metadata are immutable, the resolved BibTeX never expire
+doi_cache = PersistentCache("doi-bibtex", max_entries=50000)
+
+MarkdownIndex = namedtuple(
+    "MarkdownIndex",
+    [
+        "title",
+        "has_usage",
+        "has_intro",
+        "has_videos",
+        "has_screenshots",
+        "has_installation",
+        "apa_citations",
+        "doi_urls",
+    ],
+)
+
+
+def strip_comments(text):
+    """Removes the HTML comments of a document in a single scan.
+    An unclosed comment is kept, as no later "-->" can close it.
+    """
+    parts = []
+    position = 0
+    while True:
+        start = text.find("<!--", position)
+        if start < 0:
+            break
+        end = text.find("-->", start + 4)
+        if end < 0:
+            break
+        parts.append(text[position:start])
+        position = end + 3
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def preprocess_markdown(raw_content):
+    """Prepares a markdown document for the parser, in linear time.
+    Base64 payloads of inline images are dropped, HTML comments are removed,
+    then overlong lines and overlong documents are truncated.
+
+    Parameters
+    ----------
+    raw_content: str
+        The markdown document
+
+    Returns
+    -------
+    Tuple[str, bool]
+        the document to parse and True if it has been truncated
+    """
+    text = BASE64_PAYLOAD.sub(r"\1", raw_content)
+    text = strip_comments(text)
+    truncated = False
+    if len(text) > MAX_MARKDOWN_SIZE:
+        # the last line is kept only if it is complete
+        end = text.rfind("\n", 0, MAX_MARKDOWN_SIZE)
+        text = text[: end if end > 0 else MAX_MARKDOWN_SIZE]
+        truncated = True
+    if len(text) > MAX_LINE_LENGTH:
+        lines = text.split("\n")
+        if any(len(line) > MAX_LINE_LENGTH for line in lines):
+            text = "\n".join(line[:MAX_LINE_LENGTH] for line in lines)
+            truncated = True
+    return text, truncated
+
+
+def resolve_doi(doi):
+    """Returns the BibTeX entry of a DOI, from the DOI cache if it has already been resolved.
+
+    Parameters
+    ----------
+    doi: str
+        The DOI, e.g: "10.1000/xyz123"
+
+    Returns
+    -------
+    str
+        the BibTeX entry, an empty string if the DOI cannot be resolved
+    """
+    # DOIs are case insensitive
+    key = hash_key(doi.lower())
+    bibtex = doi_cache.get(key)
+    if bibtex is not None:
+        return bibtex
+    url = f"{CROSSCITE_URL}?doi={doi}&style=bibtex&lang=en-US"
+    try:
+        response = http_get(url)
+    except requests.RequestException:
+        return ""
+    bibtex = response.text
+    # errors are not cached, the DOI is resolved again by the next analysis
+    if response.status_code != 200 or not bibtex.lstrip().startswith("@"):
+        return ""
+    doi_cache.set(key, bibtex)
+    return bibtex
+
+
+def resolve_dois(dois, max_workers=DOI_WORKERS):
+    """Resolves DOIs concurrently, each DOI is resolved once.
+
+    Parameters
+    ----------
+    dois: Iterable[str]
+        The DOIs to resolve
+    max_workers: int = DOI_WORKERS
+        The maximum number of DOIs resolved at the same time
+
+    Returns
+    -------
+    List[str]
+        the BibTeX entries of the unique DOIs, in order
+    """
+    dois = list(dict.fromkeys(dois))
+    if len(dois) <= 1:
+        return [resolve_doi(doi) for doi in dois]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(dois))) as executor:
+        return list(executor.map(resolve_doi, dois))
+
+
+def _descendants(token):
+    # the tokens under a token in document order, like the "children+" path of a pattern
+    stack = list(reversed(getattr(token, "children", None) or ()))
+    while stack:
+        token = stack.pop()
+        yield token
+        stack.extend(reversed(getattr(token, "children", None) or ()))
+
+
+def _contents(tokens):
+    for token in tokens:
+        content = getattr(token, "content", None)
+        if isinstance(content, str):
+            yield content
+
+
+def _is_img(content):
+    if "<img" not in content:
+        return False
+    for tag in content.split():
+        if not tag.startswith("src"):
+            continue
+        return IMG_REGEX.match(tag[5:-1]) is not None
+    return False
+
+
+def _is_txt(paragraph):
+    if not hasattr(
+        paragraph, "children"
+    ):  # pragma: no cover, weird behavior that only happens on one file for weird reasons
+        return False
+    for child in paragraph.children:
+        if not isinstance(child, RawText):
+            continue
+        if child.content.startswith("<") or child.content[-1] == ">":
+            continue
+        return True
+    return False
+
+
+def _has_intro(blocks):
+    # some text between the first level 1 heading and the following level 2 heading
+    headings = [(i, b.level) for i, b in enumerate(blocks) if isinstance(b, Heading)]
+    start = next((i for i, level in headings if level == 1), None)
+    if start is None:
+        return False
+    end = next((i for i, level in headings if i > start and level == 2), None)
+    if end is None:
+        return False
+    paragraphs = blocks[start + 1 : end]
+    return len(paragraphs) > 0 and any(_is_txt(p) for p in paragraphs)
+
+
+def _title(blocks):
+    for block in blocks:
+        if not isinstance(block, Heading) or block.level != 1:
+            continue
+        for child in block.children or ():
+            if hasattr(child, "content"):
+                return child.content
+    return None
+
+
+def _has_usage(blocks):
+    for block in blocks:
+        if isinstance(block, Heading) and 2 <= block.level <= 4:
+            tokens = [block, *_descendants(block)]
+            if any(USAGE_REGEX.match(c) for c in _contents(tokens)):
+                return True
+    return False
+
+
+@lru_cache(maxsize=MARKDOWN_INDEX_CACHE_SIZE)
+def index_markdown(raw_content):
+    """Parses a markdown document and collects everything the checks look for in a single traversal.
+    Documents are indexed once by content, whatever the file they are read from.
+
+    Parameters
+    ----------
+    raw_content: str
+        The markdown document, without HTML comments
+
+    Returns
+    -------
+    MarkdownIndex
+        the title, the sections flags, the media flags, the APA citations (as regex groups) and the DOI candidates
+    """
+    document = Document(raw_content)
+    blocks = document.children or []
+    has_videos = has_screenshots = has_installation = False
+    apa_citations = []
+    doi_urls = []
+    for token in _descendants(document):
+        src = getattr(token, "src", None)
+        if isinstance(src, str) and IMG_REGEX.match(src):
+            has_screenshots = True
+        content = getattr(token, "content", None)
+        if not isinstance(content, str):
+            continue
+        has_videos = has_videos or VIDEO_REGEX.match(content) is not None
+        has_installation = (
+            has_installation or INSTALLATION_REGEX.match(content) is not None
+        )
+        has_screenshots = has_screenshots or _is_img(content)
+        apa = APA_REGEXP.match(content)
+        if apa:
+            apa_citations.append(apa.groupdict())
+        if DOI_REGEX.match(content):
+            doi_urls.append(
+                content.replace("https://", "")
+                .replace("http://", "")
+                .replace("doi.org/", "")
+            )
+    return MarkdownIndex(
+        title=_title(blocks),
+        has_usage=_has_usage(blocks),
+        has_intro=_has_intro(blocks),
+        has_videos=has_videos,
+        has_screenshots=has_screenshots,
+        has_installation=has_installation,
+        apa_citations=tuple(apa_citations),
+        doi_urls=tuple(doi_urls),
+    )
+
+
 class MarkdownDescription(RepositoryFile):
-    IMG_REGEX = r"((?!http)|https://github\.com|https://user-images\.githubusercontent\.com)(?!.*(badge)).*?\.(gif|png|jpeg|jpg|svg)$"
+    IMG_REGEX = IMG_REGEX.pattern
 
     def __init__(self, raw_content, file):
         super().__init__(file)
-        self.raw_content = re.sub("(<!--.*?-->)", "", raw_content, flags=re.DOTALL)
-        self.content = Document(self.raw_content)
+        # the truncation is reported with the result of the analysis (see `display_checklist`)
+        self.raw_content, self.truncated = preprocess_markdown(raw_content)
+
+    @cached_property
+    def content(self):
+        return Document(self.raw_content)
+
+    @property
+    def index(self):
+        return index_markdown(self.raw_content)
 
     @classmethod
     def from_file(cls, file):
@@ -33,44 +308,15 @@ class MarkdownDescription(RepositoryFile):
 
     @property
     def title(self):
-        pattern = match(Document) % {
-            "children": match(Heading) % {"level": 1, "children>content": "@title"}
-        }
-        result = pattern.match(self.content)
-        if result.is_match:
-            return result.bindings[0]["title"]
-        return None
+        return self.index.title
 
     @property
     def has_videos(self):
-        pattern = match(Document) % {
-            "children+>content": regex(r"^http(s)?://.*?\.(mp4|avi|mpeg)$")
-        }
-        result = pattern.match(self.content)
-        return result.is_match
+        return self.index.has_videos
 
     @property
     def has_screenshots(self):
-        pattern = match(Document) % {"children+>src": regex(self.IMG_REGEX)}
-        result = pattern.match(self.content)
-        if result.is_match:
-            return True
-
-        def is_img(__self__):
-            e = __self__
-            if "<img" not in e:
-                return False
-            img_pattern = re.compile(self.IMG_REGEX)
-            tags = e.split()
-            for tag in tags:
-                if not tag.startswith("src"):
-                    continue
-                tag = tag[5:-1]
-                return img_pattern.match(tag) is not None
-
-        pattern = match(Document) % {"children+>content": cond(is_img)}
-        result = pattern.match(self.content)
-        return result.is_match
+        return self.index.has_screenshots
 
     @property
     def has_videos_or_screenshots(self):
@@ -78,58 +324,15 @@ class MarkdownDescription(RepositoryFile):
 
     @property
     def has_usage(self):
-        pattern = match(Document) % {
-            "children": match(Heading)
-            % {
-                "level": range(2, 5),  # Must be a heading of at least 2
-                "children*>content": regex(
-                    r"^.*?[Uu]sage"  # Must contain "usage" in the title
-                ),
-            }
-        }
-        result = pattern.match(self.content)
-        return result.is_match
+        return self.index.has_usage
 
     @property
     def has_installation(self):
-        pattern = match(Document) % {
-            "children+>content": regex(
-                r"^.*?(pip|conda)\s+install"  # Must contain "pip install"
-            ),
-        }
-        result = pattern.match(self.content)
-        return result.is_match
+        return self.index.has_installation
 
     @property
     def has_intro(self):
-        pattern = match(Document) % {
-            "children": [
-                ...,
-                match(Heading) % {"level": 1},
-                "*paragraphs",
-                match(Heading) % {"level": 2},
-                ...,
-            ]
-        }
-        result = pattern.match(self.content)
-        if result.is_match:
-            paragraphs = result.bindings[0]["paragraphs"]
-
-            def is_txt(p):
-                if not hasattr(
-                    p, "children"
-                ):  # pragma: no cover, weird behavior that only happens on one file for weird reasons
-                    return False
-                for child in p.children:
-                    if not isinstance(child, RawText):
-                        continue
-                    if child.content.startswith("<") or child.content[-1] == ">":
-                        continue
-                    return True
-                return False
-
-            return len(paragraphs) > 0 and any(is_txt(p) for p in paragraphs)
-        return False
+        return self.index.has_intro
 
     @lru_cache(maxsize=1)
     def extract_bibtex_citations(self):
@@ -139,63 +342,27 @@ class MarkdownDescription(RepositoryFile):
 
     @lru_cache(maxsize=1)
     def extract_apa_citations(self):
-        # Pattern about "how a markdown document with APA citation" should be:
-        pattern = match(Document) % {  # it should be an instance of Document
-            "children+>content": (  # where somewhere in the content of it's children
-                regex(APA_REGEXP)  # a line matches the general APA regex
-                >> "raw_apa_match"
-                # and we store the results of the regex matcher in the "raw_apa_match" variable
-            )
-        }
-        result = pattern.match(self.content)
-        if result.is_match:
-            return [
-                APACitation(m.groupdict())
-                for m in (r["raw_apa_match"] for r in result.bindings)
-            ]
-        return []
+        # the lines of the document matching the general APA regex
+        return [APACitation(dict(groups)) for groups in self.index.apa_citations]
 
     def detect_doi_citations(self):
-        pattern = match(Document) % {
-            "children+>content": regex(
-                r"(http.*|doi\.org.*)?(10.(\d)+/([^(\s\>\"\<)])+)"
-            )
-            @ "doi_url"
-        }
-        result = pattern.match(self.content)
-        if result.is_match:
-            urls = []
-            for doi_url in (r["doi_url"] for r in result.bindings):
-                doi_url = (
-                    doi_url.replace("https://", "")
-                    .replace("http://", "")
-                    .replace("doi.org/", "")
-                )
-                urls.append(doi_url)
-            return urls
-        return []
+        return list(self.index.doi_urls)
 
     @lru_cache(maxsize=1)
     def extract_citations_from_doi(self):
         doi_urls = self.detect_doi_citations()
         if not doi_urls:
             return []
-        bibtex_lib = ""
-        for doi_url in self.detect_doi_citations():
-            # url = f"https://doi.org/{doi_url}"
-            # header = {
-            #     "Accept": "application/x-bibtex",
-            # }
-            # response = requests.get(url, headers=header)
-            # bibtex = response.text
-            url = f"https://citation.crosscite.org/format?doi={doi_url}&style=bibtex&lang=en-US"
-            response = requests.get(url)
-            bibtex = response.text
-            bibtex_lib += f"\n{bibtex}"
+        bibtex_lib = "".join(f"\n{bibtex}" for bibtex in resolve_dois(doi_urls))
         parser = BibTexParser(customization=convert_to_unicode)
         bib_database = bibtexparser.loads(bibtex_lib, parser=parser)
         return [BibtexCitation(bib) for bib in bib_database.entries]
 
+    def prefetch(self, attributes):
+        if attributes & {"has_doi", "has_citations"}:
+            return [self.extract_citations_from_doi]
+        return []
+
     @property
     def has_bibtex_citations(self):
         return self.extract_bibtex_citations() != []
@@ -0,0 +1,209 @@
+"""Index of the files of a plugin repository, built by a single walk of the tree.
+
+The walk uses `os.scandir` and prunes the directories that never hold plugin files
+(VCS metadata, virtual environments, build outputs, caches, documentation)
+and the paths ignored by the `.gitignore` files of the repository.
+All the components of a `NapariPlugin` that crawl the repository query the same index.
+"""
+import os
+from fnmatch import fnmatch
+from functools import cached_property
+from pathlib import Path
+
+# names of the directories that are never walked
+PRUNED_DIRECTORIES = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".nox",
+        ".eggs",
+        ".venv",
+        "venv",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        "site-packages",
+        "node_modules",
+        "build",
+        "dist",
+        "docs",
+    }
+)
+# a directory holding this file is a virtual environment, whatever its name
+VIRTUALENV_MARKER = "pyvenv.cfg"
+
+
+class GitIgnore(object):
+    """Patterns of a `.gitignore` file (blank lines, comments, negations, anchors and directory patterns).
+
+    Parameters
+    ----------
+    lines: Iterable[str]
+        The lines of the file
+    base: str = ""
+        The directory of the file relative to the repository root, with "/" as separator
+    """
+
+    def __init__(self, lines, base=""):
+        self.base = base
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            line = line[1:] if negated else line
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self.rules.append((line, negated, directory_only, anchored))
+
+    @classmethod
+    def from_file(cls, path, base=""):
+        try:
+            lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return None
+        return cls(lines, base)
+
+    def ignores(self, path, is_dir):
+        """Checks if a path relative to the repository root is ignored, the last matching pattern wins"""
+        if self.base:
+            if not path.startswith(f"{self.base}/"):
+                return False
+            path = path[len(self.base) + 1 :]
+        name = path.rsplit("/", 1)[-1]
+        ignored = False
+        for pattern, negated, directory_only, anchored in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if anchored:
+                matched = fnmatch(path, pattern) or (
+                    pattern.startswith("**/") and fnmatch(path, pattern[3:])
+                )
+            else:
+                matched = fnmatch(name, pattern)
+            if matched:
+                ignored = not negated
+        return ignored
+
+
+class FileIndex(object):
+    """The files and directories of a repository, walked once on the first query.
+
+    Parameters
+    ----------
+    root: Path
+        The root of the repository
+    pruned: Iterable[str] = PRUNED_DIRECTORIES
+        The names of the directories that are not walked
+    """
+
+    def __init__(self, root, pruned=PRUNED_DIRECTORIES):
+        self.root = root
+        self.pruned = frozenset(pruned)
+
+    @cached_property
+    def _entries(self):
+        if not isinstance(self.root, Path):
+            return self._archive_entries()
+        files = []
+        directories = {""}
+        if not self.root.is_dir():
+            return files, directories
+        gitignores = []
+        stack = [("", os.fspath(self.root))]
+        while stack:
+            relative, directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            names = {entry.name for entry in entries}
+            if relative and VIRTUALENV_MARKER in names:
+                continue
+            if ".gitignore" in names:
+                base = relative
+                gitignore = GitIgnore.from_file(Path(directory) / ".gitignore", base)
+                if gitignore is not None:
+                    gitignores.append(gitignore)
+            subdirectories = []
+            for entry in entries:
+                path = f"{relative}/{entry.name}" if relative else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if any(g.ignores(path, is_dir) for g in gitignores):
+                    continue
+                if is_dir:
+                    if entry.name not in self.pruned:
+                        directories.add(path)
+                        subdirectories.append((path, entry.path))
+                elif entry.is_file():
+                    files.append(path)
+            # the directories are walked in order
+            stack.extend(reversed(subdirectories))
+        return files, directories
+
+    def _archive_entries(self):
+        # e.g: the root of a distribution archive, its members are already listed in memory
+        files = []
+        directories = {""}
+        for path in self.root.rglob("*"):
+            *parents, name = path.relative_to(self.root).parts
+            if any(parent in self.pruned for parent in parents):
+                continue
+            files.append("/".join((*parents, name)))
+            for i in range(1, len(parents) + 1):
+                directories.add("/".join(parents[:i]))
+        return files, directories
+
+    @property
+    def files(self):
+        """The paths of the indexed files relative to the root, with "/" as separator"""
+        return self._entries[0]
+
+    def _relative(self, path):
+        return "/".join(path.relative_to(self.root).parts)
+
+    def is_dir(self, path):
+        return self._relative(path) in self._entries[1]
+
+    def glob(self, pattern, directory=None):
+        """Yields the indexed files matching a pattern relative to a directory ("**/" matches any sub-directory).
+
+        Parameters
+        ----------
+        pattern: str
+            The pattern, e.g: "**/*.py"
+        directory: Optional[Path] = None
+            The directory the pattern is relative to, the root if None
+
+        Returns
+        -------
+        Iterator[Path]
+            the paths of the matching files
+        """
+        prefix = self._relative(directory) if directory is not None else ""
+        prefix = f"{prefix}/" if prefix else ""
+        recursive = pattern.startswith("**/")
+        pattern = pattern[3:] if recursive else pattern
+        depth = pattern.count("/")
+        for name in self.files:
+            if not name.startswith(prefix):
+                continue
+            parts = name[len(prefix) :].split("/")
+            if recursive:
+                candidate = "/".join(parts[len(parts) - depth - 1 :])
+            elif len(parts) == depth + 1:
+                candidate = "/".join(parts)
+            else:
+                continue
+            if fnmatch(candidate, pattern):
+                yield self.root.joinpath(*name.split("/"))
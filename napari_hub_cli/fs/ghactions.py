@@ -1,103 +1,229 @@
-from operator import is_not
 import re
-from functools import lru_cache
+import threading
+from collections import namedtuple
+from functools import cached_property, lru_cache
 from pathlib import Path
 
 import requests
+import yaml
 from iguala import as_matcher as m
-from iguala import regex
 from iguala import is_not
 
+from ..network import http_get, http_post
 from ..utils import build_gh_header, extract_if_match
 
 from ..fs import ConfigFile, RepositoryFile
+from .fileindex import FileIndex
 
+# commands of a "run" step that execute the tests
+TEST_COMMAND_REGEX = re.compile(
+    r"tox|python -m tox|python -m pytest|pytest|.*unittest.*|nox|python -m nox"
+)
+# actions of a "uses" step that execute the tests
+TEST_ACTION_REGEX = re.compile(r".*test.*")
+CODECOV_ACTION_REGEX = re.compile(r"^codecov/.*")
+# number of compiled workflows kept in memory, most plugins share templated workflows
+WORKFLOW_CACHE_SIZE = 256
 
-class GhActionWorkflow(ConfigFile):
-    @lru_cache()
-    def _extract_test_infos(self):
-        pattern = m(
-            {
-                "jobs>*": m(
-                    {
-                        "strategy>matrix": m(
-                            {"python": m([..., "@_", ...]) @ "python_versions"}
-                        )
-                        | {"python-version": m([..., "@_", ...]) @ "python_versions"},
-                        "steps>*": m(
-                            {
-                                "run": regex("tox")
-                                | regex("python -m tox")
-                                | regex("python -m pytest")
-                                | regex("pytest")
-                                | regex(".*unittest.*")
-                                | regex("nox")
-                                | regex("python -m nox")
-                            }
-                        )
-                        | {"uses": regex(".*test.*")},
-                    }
-                )
-            }
-        )
+WorkflowStep = namedtuple("WorkflowStep", ["name", "run", "uses"])
+WorkflowJob = namedtuple(
+    "WorkflowJob",
+    [
+        "name",
+        "matrix_python_versions",
+        "steps",
+        "test_commands",
+        "test_actions",
+        "python_versions",
+    ],
+)
+WorkflowModel = namedtuple(
+    "WorkflowModel", ["jobs", "tested_python_versions", "codecov_actions"]
+)
+EMPTY_WORKFLOW = WorkflowModel(jobs=(), tested_python_versions=None, codecov_actions=())
 
-        result = pattern.match(self.data)
-        if result.is_match:
-            py_versions = result.bindings[0].get("python_versions")
-            py_versions = [
-                tuple(int(x) for x in str(version).split(".") if x)
-                for version in py_versions
-            ]
-            return py_versions
 
-        pattern = m(
-            {
-                "jobs>*": {
-                    "steps>*": {
-                        "run": regex("tox")
-                        | regex("python -m tox")
-                        | regex("python -m pytest")
-                        | regex("pytest")
-                        | regex(".*unittest.*")
-                        | regex("nox")
-                        | regex("python -m nox")
-                    },
-                    "steps>*>python-version": m([..., "@_", ...]) @ "python_versions"
-                    | "@python_versions",
-                }
-            }
-        )
+def _flat(value):
+    # lists are flattened and a single value is a list of one value
+    if not isinstance(value, list):
+        return [value]
+    result = []
+    stack = [iter(value)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, list):
+                stack.append(iter(item))
+                break
+            result.append(item)
+        else:
+            stack.pop()
+    return result
+
+
+def _values(node, key):
+    return _flat(node.get(key, [])) if isinstance(node, dict) else []
+
+
+def _descendants(node, seen):
+    if not isinstance(node, dict):
+        return
+    for value in node.values():
+        children = [x for x in _flat(value) if x is not None and id(x) not in seen]
+        seen.update(id(x) for x in children)
+        # the children of a key are listed before their own children
+        yield from children
+        for child in children:
+            yield from _descendants(child, seen)
+
 
-        result = pattern.match(self.data)
-        if result.is_match:
-            for binding in result.bindings:
-                py_versions = binding.get("python_versions")
-                if str(py_versions).startswith("$"):
-                    continue
-                if not isinstance(py_versions, list):
-                    py_versions = [py_versions]
-                py_versions = [
-                    tuple(int(x) for x in str(version).split(".") if x)
-                    for version in py_versions
-                ]
-                return py_versions
+def _nodes(roots):
+    """The roots followed by all the nodes under them.
+    This is the order of the "*" key paths of the former pattern based checks.
+    """
+    nodes = list(roots)
+    for root in roots:
+        nodes.extend(_descendants(root, {id(root)}))
+    return nodes
 
+
+def _strings(values, regex):
+    return [v for v in values if isinstance(v, str) and regex.match(v)]
+
+
+def _parse_version(version):
+    try:
+        return tuple(int(x) for x in str(version).split(".") if x)
+    except ValueError:
+        # e.g: "pypy-3.9" or "3.x"
         return None
 
+
+def _parse_versions(versions):
+    parsed = (_parse_version(version) for version in versions)
+    return [version for version in parsed if version is not None]
+
+
+def _compile_job(name, job):
+    matrix_versions = ()
+    for strategy in _values(job, "strategy"):
+        for matrix in _values(strategy, "matrix"):
+            for key in ("python", "python-version"):
+                versions = _values(matrix, key)
+                if versions and not matrix_versions:
+                    matrix_versions = tuple(versions)
+    steps = _values(job, "steps")
+    # the steps and the blocks under them (e.g: the "with" of an action)
+    nodes = _nodes(steps)
+    return WorkflowJob(
+        name=name,
+        matrix_python_versions=matrix_versions,
+        steps=tuple(
+            WorkflowStep(
+                name=step.get("name"),
+                run=step.get("run"),
+                uses=step.get("uses"),
+            )
+            for step in steps
+            if isinstance(step, dict)
+        ),
+        test_commands=tuple(
+            run
+            for node in nodes
+            for run in _strings(_values(node, "run"), TEST_COMMAND_REGEX)
+        ),
+        test_actions=tuple(
+            uses
+            for node in nodes
+            for uses in _strings(_values(node, "uses"), TEST_ACTION_REGEX)
+        ),
+        python_versions=tuple(
+            version for node in nodes for version in _values(node, "python-version")
+        ),
+    )
+
+
+def _tested_python_versions(jobs):
+    # a job testing a matrix of Python versions
+    for job in jobs:
+        if job.matrix_python_versions and (job.test_commands or job.test_actions):
+            return _parse_versions(job.matrix_python_versions)
+    # a job running the tests with the Python version of a step (e.g: "setup-python")
+    for job in jobs:
+        if not job.test_commands:
+            continue
+        for version in job.python_versions:
+            # versions from expressions (e.g: "${{ matrix.python }}") are unknown
+            if not str(version).startswith("$"):
+                return _parse_versions([version])
+    return None
+
+
+@lru_cache(maxsize=WORKFLOW_CACHE_SIZE)
+def compile_workflow(content):
+    """Compiles a workflow into a model of its jobs, cached by content.
+
+    Parameters
+    ----------
+    content: bytes
+        The content of the workflow file
+
+    Returns
+    -------
+    WorkflowModel
+        the jobs, the Python versions used by the tests (None if no job runs tests)
+        and the codecov actions used by the steps
+    """
+    try:
+        data = yaml.safe_load(content)
+    except (yaml.YAMLError, ValueError):
+        return EMPTY_WORKFLOW
+    jobs = _values(data, "jobs")
+    names = {
+        id(job): name
+        for root in jobs
+        if isinstance(root, dict)
+        for name, job in root.items()
+    }
+    # any block under "jobs" with steps is a job, even "jobs" in broken workflows
+    jobs = tuple(
+        _compile_job(names.get(id(node)), node)
+        for node in _nodes(jobs)
+        if _values(node, "steps")
+    )
+    return WorkflowModel(
+        jobs=jobs,
+        tested_python_versions=_tested_python_versions(jobs),
+        codecov_actions=tuple(
+            uses
+            for job in jobs
+            for step in job.steps
+            for uses in _strings(_flat(step.uses), CODECOV_ACTION_REGEX)
+        ),
+    )
+
+
+class GhActionWorkflow(ConfigFile):
+    @cached_property
+    def model(self):
+        if not self.exists:
+            return EMPTY_WORKFLOW
+        try:
+            content = self.file.read_bytes()
+        except OSError:
+            return EMPTY_WORKFLOW
+        return compile_workflow(content)
+
     @property
     def defines_test(self):
-        res = self._extract_test_infos()
-        return res is not None
+        return self.model.tested_python_versions is not None
 
     @property
     def supported_python_version(self):
-        res = self._extract_test_infos()
-        return res if res else []
+        return self.model.tested_python_versions or []
 
     @property
     def defines_codecov_coverage(self):
-        pattern = m({"jobs>*>steps": {"uses": regex("^codecov/.*")}})
-        return pattern.match(self.data).is_match
+        return self.model.codecov_actions != ()
 
 
 class GhActionWorkflowFolder(RepositoryFile):
@@ -141,21 +267,29 @@ query GetRepoCoverage($name: String!, $repo: String!, $branch: String!) {
     }
 """
 
-    def __init__(self, path, url):
+    CODECOV_ATTRIBUTES = {
+        "reported_codecov_result",
+        "has_codecove_results",
+        "has_codecove_more_80",
+    }
+
+    def __init__(self, path, url, index=None):
         super().__init__(path)
+        self.index = index if index is not None else FileIndex(path)
         self.url = url
         if url and url.endswith(".git"):
             self.url = url[:-4]
-        workflows = []
-        for gh_workflow_file in self.file.glob("**/*.yml"):
-            workflows.append(GhActionWorkflow(gh_workflow_file))
-        self.workflows = workflows
+        self._eoi_lock = threading.Lock()
 
-    @property
+    @cached_property
+    def workflows(self):
+        return [GhActionWorkflow(f) for f in self.index.glob("**/*.yml", self.file)]
+
+    @cached_property
     def gh_test_config(self):
         return next((f for f in self.workflows if f.defines_test), None)
 
-    @property
+    @cached_property
     def gh_codecov_config(self):
         return next((f for f in self.workflows if f.defines_codecov_coverage), None)
 
@@ -167,14 +301,19 @@ query GetRepoCoverage($name: String!, $repo: String!, $branch: String!) {
         )
         return api_url
 
-    @lru_cache()
     def _identify_EOI(self, config):
         """Gets the Entry Of Interest that own information about the workflow execution."""
+        # concurrent calls wait for the running request instead of sending it again
+        with self._eoi_lock:
+            return self._fetch_EOI(config)
+
+    @lru_cache()
+    def _fetch_EOI(self, config):
         api_url = self._compute_call_url()
         if not api_url:
             return None
         try:
-            response = requests.get(
+            response = http_get(
                 f"{api_url}/actions/runs", headers=build_gh_header()
             )
             if response.status_code != requests.codes.ok:
@@ -197,11 +336,30 @@ query GetRepoCoverage($name: String!, $repo: String!, $branch: String!) {
     def _pull_jobs_details(self, eoi):
         if not eoi:
             return {}
-        response = requests.get(eoi["jobs_url"], headers=build_gh_header())
+        return self._fetch_jobs(eoi["jobs_url"])
+
+    @lru_cache()
+    def _fetch_jobs(self, jobs_url):
+        response = http_get(jobs_url, headers=build_gh_header())
         if response.status_code != requests.codes.ok:
             return {}  # pragma: no cover
         return response.json()
 
+    def prefetch(self, attributes):
+        fetches = []
+        # the jobs are pulled after the runs, a single fetch warms both
+        if "details_failing_tests" in attributes:
+            fetches.append(
+                lambda: self._pull_jobs_details(
+                    self._identify_EOI(self.gh_test_config)
+                )
+            )
+        elif "has_successful_tests" in attributes:
+            fetches.append(lambda: self._identify_EOI(self.gh_test_config))
+        if attributes & self.CODECOV_ATTRIBUTES:
+            fetches.append(self.query_codecov_api)
+        return fetches
+
     @property
     def has_successful_tests(self):
         eoi = self._identify_EOI(self.gh_test_config)
@@ -247,7 +405,7 @@ query GetRepoCoverage($name: String!, $repo: String!, $branch: String!) {
             return None
         api_url = self._compute_call_url()
         try:
-            response = requests.get(
+            response = http_get(
                 f"{api_url}/commits/{coi['head_sha']}/status", headers=build_gh_header()
             )
             if response.status_code != requests.codes.ok:
@@ -279,12 +437,12 @@ query GetRepoCoverage($name: String!, $repo: String!, $branch: String!) {
             "query": self.CODECOV_QUERY,
             "variables": {"name": owner, "repo": repo, "branch": "main"},
         }
-        response = requests.post(self.CODECOV_API, json=json_payload)
+        response = http_post(self.CODECOV_API, json=json_payload)
         json_r = response.json()
         try:
             if json_r["data"]["owner"]["repository"]["branch"] is None:
                 json_payload["variables"]["branch"] = "master"
-                response = requests.post(self.CODECOV_API, json=json_payload)
+                response = http_post(self.CODECOV_API, json=json_payload)
                 json_r = response.json()
                 if json_r["data"]["owner"]["repository"]["branch"] is None:
                     return None
@@ -4,6 +4,8 @@ from functools import lru_cache
 import requests
 from requests.exceptions import HTTPError
 
+from ..network import http_get
+from ..reference import reference_data
 from ..utils import build_gh_header
 
 from ..fs import RepositoryFile
@@ -27,27 +29,19 @@ class License(RepositoryFile):
         self.url = url
 
     @classmethod
-    @lru_cache()
     def get_osi_approved_licenses(cls):
         """
-        Retrieves the list of SPDX identifiers for all OSI-approved licenses from https://opensource.org/licenses/.
+        Retrieves the SPDX identifiers for all OSI-approved licenses from https://opensource.org/licenses/.
+        The list is fetched once and shared by all the analyses (see `napari_hub_cli.reference`).
 
         Returns
         -------
-        List
-            The list of SPDX identifiers for all OSI-approved licenses.
+        FrozenSet
+            The set of SPDX identifiers for all OSI-approved licenses.
         """
-        OSI_LICENSES_URL = "https://api.opensource.org/licenses/"
-        response = requests.get(OSI_LICENSES_URL)
-        if response.status_code == 200:
-            all_ids = (
-                [entry["id"]]
-                + [ident["identifier"] for ident in entry.get("identifiers", [])]
-                for entry in response.json()
-            )
-            return [id for ids in all_ids for id in ids]
-        return []
+        return reference_data().osi_licenses
 
+    @lru_cache()
     def get_github_license(self):
         """
         Use the GitHub API to retrieve the SPDX identifier of the repository's license.
@@ -65,7 +59,7 @@ class License(RepositoryFile):
             api_url = url.replace(
                 "https://github.com/", "https://api.github.com/repos/"
             )
-            response = requests.get(f"{api_url}/license", headers=build_gh_header())
+            response = http_get(f"{api_url}/license", headers=build_gh_header())
             if response.status_code == 401:  # token revokation
                 print(
                     f"{response.status_code} Client Error: {response.reason} for url: {response.url}"
@@ -85,6 +79,11 @@ class License(RepositoryFile):
                 if spdx_id != "NOASSERTION":
                     return spdx_id
 
+    def prefetch(self, attributes):
+        if "is_osi_approved" in attributes:
+            return [self.get_github_license, self.get_osi_approved_licenses]
+        return []
+
     @property
     def is_osi_approved(self):
         """
@@ -3,125 +3,271 @@ from .patch_parso import *
 import parso
 from parso.python import tree as ast
 
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from pathlib import Path
 
-from iguala import match, regex as re, is_not
-
-from ..utils import extract_if_match
+from ..cache import PersistentCache, hash_key
 
 from ..fs import RepositoryFile
+from .fileindex import FileIndex
+
+# to increase when the extracted facts change, it invalidates the cached facts
+LINT_FACTS_VERSION = 1
+LINT_CACHE_SIZE = 64 * 1024 * 1024  # in bytes
+LINT_WORKERS_ENV = "NAPARI_HUB_CLI_LINT_WORKERS"
+# under this number of files to parse, starting the processes costs more than it saves
+PARALLEL_PARSE_THRESHOLD = 32
+PARSE_CHUNK_SIZE = 8
+# every lint rule looks for one of these tokens, files without any of them cannot match a rule
+TRIGGER_TOKENS = (b"PyQt", b"PySide", b"napari_plugin_engine")
+TRIGGERS = re.compile(b"|".join(re.escape(token) for token in TRIGGER_TOKENS))
+# files bigger than this are scanned through a memory map
+MMAP_THRESHOLD = 64 * 1024  # in bytes
+
+FactTable = namedtuple("FactTable", ["imports", "functions"])
+
+
+def read_lint_workers():
+    # the number of processes parsing the sources can be changed using var env, 1 parses in process
+    default = os.cpu_count() or 1
+    try:
+        return int(os.environ.get(LINT_WORKERS_ENV, default))
+    except ValueError:
+        return default
+
+
+def lint_cache():
+    return PersistentCache("python-lint", max_size=LINT_CACHE_SIZE)
+
+
+def empty_facts():
+    return {"imports": [], "npe1_hooks": []}
+
+
+def read_if_triggered(path):
+    """Reads a file only if its raw content contains one of the trigger tokens of the lint rules.
+
+    Parameters
+    ----------
+    path: Path | ArchivePath
+        The path of the file
+
+    Returns
+    -------
+    Optional[bytes]
+        the content of the file, None if no rule can match the file
+    """
+    if isinstance(path, Path) and path.stat().st_size >= MMAP_THRESHOLD:
+        with path.open("rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return content[:] if TRIGGERS.search(content) else None
+    # archive members are searched without copy when possible
+    content = path.read_buffer() if hasattr(path, "read_buffer") else path.read_bytes()
+    if not TRIGGERS.search(content):
+        return None
+    return bytes(content)
+
+
+def extract_lint_facts(strpath, source):
+    """Parses a Python source and extracts the facts checked by the linter (run by the parsing processes).
+
+    Parameters
+    ----------
+    strpath: str
+        The path of the file, only used for the error messages of the parser
+    source: bytes
+        The content of the file
+
+    Returns
+    -------
+    Dict[str, List]
+        the facts of the file (see `PythonFile.facts`)
+    """
+    return PythonFile(Path(strpath), source=source).facts
+
+
+def extract_all_lint_facts(sources, workers=None):
+    """Extracts the lint facts of many sources, in a process pool if they are numerous.
+
+    Parameters
+    ----------
+    sources: List[Tuple[str, bytes]]
+        The path and the content of the files
+    workers: Optional[int] = None
+        The maximum number of processes, read from NAPARI_HUB_CLI_LINT_WORKERS if None
+
+    Returns
+    -------
+    List[Dict[str, List]]
+        the facts of the files, in the same order
+    """
+    workers = read_lint_workers() if workers is None else workers
+    # the analyses may already run in a pool of processes, it is not nested
+    in_worker = multiprocessing.parent_process() is not None
+    if workers <= 1 or in_worker or len(sources) < PARALLEL_PARSE_THRESHOLD:
+        return [extract_lint_facts(path, source) for path, source in sources]
+    paths, contents = zip(*sources)
+    with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as pool:
+        return list(
+            pool.map(extract_lint_facts, paths, contents, chunksize=PARSE_CHUNK_SIZE)
+        )
 
 
 class PythonFile(object):
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, source=None):
         self.path = path
         self.strpath = str(path)
-        if self.path.exists():
-            txt = self.path.read_text("utf-8")
-            try:
-                self.ast = parso.parse(txt, path=str(self.path), version="3.11")
-            except UnicodeDecodeError:
-                self.ast = None
-        else:
-            self.ast = None
+        self.source = source  # the content of the file if already read
+
+    @cached_property
+    def ast(self):
+        try:
+            if self.source is not None:
+                txt = self.source.decode("utf-8")
+            elif self.path.exists():
+                txt = self.path.read_text("utf-8")
+            else:
+                return None
+            return parso.parse(txt, path=self.strpath, version="3.11")
+        except UnicodeDecodeError:
+            return None
+
+    @cached_property
+    def facts(self):
+        """The results of the checks without the path of the file, so they can be cached by content.
+        "imports" holds the forbidden imports as [name, line],
+        "npe1_hooks" holds the NPE1 hook implementations as [line, decorator].
+        """
+        imports = self.check_pyside + self.check_pyqt
+        hooks = (
+            self.npe1_import_hook_check
+            + self.npe1_from_import_hook_check
+            + self.npe1_from_import_as_hook_check
+            + self.npe1_from_as_hook_check
+        )
+        return {
+            "imports": [[name, line] for name, _, line in imports],
+            "npe1_hooks": [[line, decorator] for _, line, decorator in hooks],
+        }
+
+    @cached_property
+    def fact_table(self):
+        """The imports and the decorated functions of the file, collected in a single pass over the tree.
+        The pass follows the bodies of the module, of the classes, of the functions and of the decorated definitions
+        (the statements nested in other blocks, e.g: if/try/with, are not visited).
+
+        Returns
+        -------
+        FactTable
+            the imports as (module, imported names, alias, line), the module is None for "import ..." statements,
+            and the functions as (line, decorator names, decorator heads)
+        """
+        imports = []
+        functions = []
+        stack = [self.ast] if self.ast is not None else []
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (ast.ImportName, ast.ImportFrom)):
+                module = node.module if isinstance(node, ast.ImportFrom) else None
+                names = [n.value for n in node.names]
+                imports.append((module, names, node.alias, node.lineno))
+            elif isinstance(node, ast.Function):
+                heads = [
+                    [n.value for n in getattr(d, "body", ()) if hasattr(n, "value")]
+                    for d in node.decorators
+                ]
+                functions.append((node.lineno, node.decorator_names, heads))
+            # the children are visited in order, before the next siblings
+            stack.extend(reversed(getattr(node, "body", None) or ()))
+        return FactTable(imports, functions)
 
     def _check_import(self, import_name):
-        m = match(self.__class__)[
-            "ast>body+" : (
-                match(ast.ImportName)["names>value" : re(import_name)]
-                | match(ast.ImportFrom)["module" : re(import_name)]
-            )
-            @ "ast_node",
-            "path":"@file",
+        pattern = re.compile(import_name)
+        results = []
+        for module, names, _, lineno in self.fact_table.imports:
+            if module is None:
+                matches = sum(1 for n in names if pattern.match(n))
+            else:
+                matches = 1 if pattern.match(module) else 0
+            results.extend((import_name, self.path, lineno) for _ in range(matches))
+        return results
+
+    def _decorated_functions(self, pattern):
+        # the functions with a decorator name matching a pattern, as (line, decorator)
+        pattern = re.compile(pattern)
+        return [
+            (lineno, decorator)
+            for lineno, decorators, _ in self.fact_table.functions
+            for decorator in decorators
+            if pattern.match(decorator)
+        ]
+
+    def _aliased_hooks(self, imports):
+        # the functions decorated with the alias of an import, as (file, line, alias)
+        return [
+            (self.path, lineno, alias)
+            for alias in imports
+            for lineno, _, heads in self.fact_table.functions
+            for head in heads
+            for value in head
+            if value == alias
         ]
-        result = m.match(self)
-        return extract_if_match(
-            result, lambda b: (import_name, b["file"], b["ast_node"].lineno)
-        )
 
     @property
     def npe1_import_hook_check(self):
-        import_ = match(self.__class__)[
-            "path":"@file",
-            "ast>body+" : (match(ast.ImportName)["names>value":"napari_plugin_engine"]),
-            "ast>body+" : (
-                match(ast.Function)[
-                    "decorator_names" : re(
-                        r"napari_plugin_engine\.napari_hook_implementation"
-                    )
-                    @ "decorator_id"
-                ]
-                @ "func"
-            ),
+        imports = [
+            name
+            for module, names, _, _ in self.fact_table.imports
+            if module is None
+            for name in names
+            if name == "napari_plugin_engine"
         ]
-        result = import_.match(self)
-        return extract_if_match(
-            result, lambda b: (b["file"], b["func"].lineno, b["decorator_id"])
+        hooks = self._decorated_functions(
+            r"napari_plugin_engine\.napari_hook_implementation"
         )
+        return [(self.path, lineno, dec) for _ in imports for lineno, dec in hooks]
 
     @property
     def npe1_from_import_hook_check(self):
-        from_import_ = match(self.__class__)[
-            "path":"@file",
-            "ast>body+" : (
-                match(ast.ImportFrom)[
-                    "module":"napari_plugin_engine",
-                    "alias":"napari_hook_implementation",
-                ]
-            ),
-            "ast>body+" : (
-                match(ast.Function)[
-                    "decorator_names" : re("napari_hook_implementation")
-                    @ "decorator_id"
-                ]
-                @ "func"
-            ),
+        imports = [
+            alias
+            for module, _, alias, _ in self.fact_table.imports
+            if module == "napari_plugin_engine"
+            and alias == "napari_hook_implementation"
         ]
-        result = from_import_.match(self)
-        return extract_if_match(
-            result, lambda b: (b["file"], b["func"].lineno, b["decorator_id"])
-        )
+        hooks = self._decorated_functions("napari_hook_implementation")
+        return [(self.path, lineno, dec) for _ in imports for lineno, dec in hooks]
 
     @property
     def npe1_from_import_as_hook_check(self):
-        from_import_as_ = match(self.__class__)[
-            "path":"@file",
-            "ast>body+" : (
-                match(ast.ImportFrom)[
-                    "module":"napari_plugin_engine",
-                    "names>value" : re("napari_hook_implementation"),
-                    "alias":"@decorator_id",
-                    "alias" : is_not("napari_hook_implementation"),
-                ]
-            ),
-            "ast>body+" : (
-                match(ast.Function)["decorators>body>value":"@decorator_id"] @ "func"
-            ),
+        pattern = re.compile("napari_hook_implementation")
+        aliases = [
+            alias
+            for module, names, alias, _ in self.fact_table.imports
+            if module == "napari_plugin_engine"
+            and alias != "napari_hook_implementation"
+            for name in names
+            if pattern.match(name)
         ]
-        result = from_import_as_.match(self)
-        return extract_if_match(
-            result, lambda b: (b["file"], b["func"].lineno, b["decorator_id"])
-        )
+        return self._aliased_hooks(aliases)
 
     @property
     def npe1_from_as_hook_check(self):
-        from_as_ = match(self.__class__)[
-            "path":"@file",
-            "ast>body+" : (
-                match(ast.ImportName)[
-                    "names>value":"napari_plugin_engine",
-                    "alias":"@decorator_id",
-                    "alias" : is_not("napari_plugin_engine"),
-                ]
-            ),
-            "ast>body+" : (
-                match(ast.Function)["decorators>body>value":"@decorator_id"] @ "func"
-            ),
+        aliases = [
+            alias
+            for module, names, alias, _ in self.fact_table.imports
+            if module is None and alias != "napari_plugin_engine"
+            for name in names
+            if name == "napari_plugin_engine"
         ]
-        result = from_as_.match(self)
-        return extract_if_match(
-            result, lambda b: (b["file"], b["func"].lineno, b["decorator_id"])
-        )
+        return self._aliased_hooks(aliases)
 
     @property
     def check_pyside(self):
@@ -133,26 +279,58 @@ class PythonFile(object):
 
 
 class PythonSrcDir(RepositoryFile):
-    def __init__(self, path, engine_version=None, exclude_test_folders=True):
+    def __init__(
+        self, path, engine_version=None, exclude_test_folders=True, index=None
+    ):
         super().__init__(path)
+        self.engine_version = engine_version
+        self.exclude_test_folders = exclude_test_folders
+        self.index = index if index is not None else FileIndex(path)
+
+    @cached_property
+    def files(self):
         files = []
-        for python_file in self.file.glob("**/*.py"):
-            if "site-packages" in str(python_file) or (
-                exclude_test_folders and "tests" in str(python_file)
+        for python_file in self.index.glob("**/*.py", self.file):
+            relative = "/".join(python_file.relative_to(self.file).parts)
+            if "site-packages" in relative or (
+                self.exclude_test_folders and "tests" in relative
             ):
                 # exclude virtualenv files and tests
                 continue
             files.append(PythonFile(python_file))
-        self.files = files
-        self.engine_version = engine_version
-        self.exclude_test_folders = exclude_test_folders
+        return files
+
+    @cached_property
+    def facts(self):
+        """The lint facts of the files, in the order of `files`.
+        Files that cannot match any rule are not parsed (see `TRIGGER_TOKENS`).
+        Facts are cached by content, only the files never seen before are parsed.
+        """
+        cache = lint_cache()
+        facts = [None] * len(self.files)
+        missing = {}  # the files to parse, by content key
+        for i, file in enumerate(self.files):
+            source = read_if_triggered(file.path)
+            if source is None:
+                facts[i] = empty_facts()
+                continue
+            key = hash_key(LINT_FACTS_VERSION, hashlib.sha256(source).hexdigest())
+            facts[i] = cache.get(key)
+            if facts[i] is None:
+                missing.setdefault(key, (file.strpath, source, []))[2].append(i)
+        sources = [(strpath, source) for strpath, source, _ in missing.values()]
+        extracted = extract_all_lint_facts(sources)
+        for (key, (*_, indexes)), result in zip(missing.items(), extracted):
+            cache.set(key, result)
+            for i in indexes:
+                facts[i] = result
+        return facts
 
     @property
     def forbidden_imports_list(self):
         imports = []
-        for file in self.files:
-            imports.extend(file.check_pyside)
-            imports.extend(file.check_pyqt)
+        for file, facts in zip(self.files, self.facts):
+            imports.extend((name, file.path, line) for name, line in facts["imports"])
         return imports
 
     @property
@@ -166,11 +344,8 @@ class PythonSrcDir(RepositoryFile):
     @property
     def npe1_hook_list(self):
         hooks = []
-        for file in self.files:
-            hooks.extend(file.npe1_import_hook_check)
-            hooks.extend(file.npe1_from_import_hook_check)
-            hooks.extend(file.npe1_from_import_as_hook_check)
-            hooks.extend(file.npe1_from_as_hook_check)
+        for file, facts in zip(self.files, self.facts):
+            hooks.extend((file.path, line, dec) for line, dec in facts["npe1_hooks"])
         return hooks
 
     @property
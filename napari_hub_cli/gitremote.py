@@ -0,0 +1,135 @@
+"""Lightweight probes of remote git repositories.
+
+The HEAD of a repository is read from the reference advertisement of the smart HTTP protocol
+(the `info/refs` endpoint used by `git ls-remote`).
+The HEAD is advertised first, so only the beginning of the advertisement is downloaded.
+Repositories that are not served over HTTP(S) are probed with `git ls-remote`.
+"""
+from contextlib import closing
+
+import requests
+from git import GitCommandError
+from git.cmd import Git
+
+from .network import http_client, http_get
+
+ADVERTISEMENT_CHUNK_SIZE = 4096
+
+
+def iter_pkt_lines(chunks):
+    """Parses a stream of pkt-lines (see the git protocol documentation), flush packets are skipped.
+
+    Parameters
+    ----------
+    chunks: Iterable[bytes]
+        The raw stream
+
+    Returns
+    -------
+    Iterator[bytes]
+        the payloads of the pkt-lines
+
+    Raises
+    ------
+    ValueError
+        if the stream is not made of pkt-lines
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= 4:
+            length = int(buffer[:4], 16)
+            if length == 0:
+                buffer = buffer[4:]
+                continue
+            if length < 4:
+                raise ValueError(f"Invalid pkt-line length: {buffer[:4]!r}")
+            if len(buffer) < length:
+                break
+            yield buffer[4:length]
+            buffer = buffer[length:]
+
+
+def advertised_head(chunks):
+    """Returns the SHA of the HEAD from a smart HTTP reference advertisement, None if there is no HEAD"""
+    for payload in iter_pkt_lines(chunks):
+        if payload.startswith(b"# service="):
+            continue
+        ref = payload.split(b"\0", 1)[0].strip()
+        sha, _, name = ref.partition(b" ")
+        return sha.decode("ascii") if name == b"HEAD" else None
+    return None
+
+
+def _is_http(url):
+    return url.startswith(("http://", "https://"))
+
+
+def _smart_http_head(url):
+    refs_url = f"{url.rstrip('/')}/info/refs?service=git-upload-pack"
+    try:
+        response = http_get(refs_url, stream=True)
+    except requests.RequestException:
+        return None
+    with closing(response):
+        if response.status_code != 200:
+            return None
+        try:
+            return advertised_head(response.iter_content(ADVERTISEMENT_CHUNK_SIZE))
+        except (ValueError, requests.RequestException):
+            # not a git server (e.g: an HTML page)
+            return None
+
+
+def remote_head_sha(url):
+    """Returns the SHA of the HEAD (the default branch) of a remote git repository.
+
+    Parameters
+    ----------
+    url: str
+        The url of the repository
+
+    Returns
+    -------
+    str
+        the SHA of the HEAD, None if the repository cannot be read
+    """
+    if _is_http(url):
+        return _smart_http_head(url)
+    try:
+        output = Git().ls_remote(url, "HEAD")
+    except GitCommandError:
+        return None
+    return output.split()[0] if output else None
+
+
+def is_accessible(url):
+    """Checks if the page of a repository can be reached, without downloading it.
+
+    Parameters
+    ----------
+    url: str
+        The url of the repository
+
+    Returns
+    -------
+    bool
+        True if the page answers, or if the url is not an HTTP(S) url
+    """
+    if not _is_http(url):
+        return True
+    client = http_client()
+    try:
+        response = client.request("HEAD", url, allow_redirects=True)
+        if _is_success(response) or response.status_code == 404:
+            return _is_success(response)
+        # some hosts do not answer HEAD requests (e.g: 405, 403 or 501),
+        # the page is requested without reading its body
+        with client.request("GET", url, allow_redirects=True, stream=True) as response:
+            return _is_success(response)
+    except requests.RequestException:
+        return False
+
+
+def _is_success(response):
+    return 200 <= response.status_code < 300
@@ -0,0 +1,193 @@
+"""Shared HTTP layer used by all the remote probes of the analyses.
+
+All the requests go through a single pooled session per process (connections are kept alive and reused),
+with default timeouts, retries with exponential backoff on transient errors
+and a limit of concurrent requests per host.
+GET responses with an ETag or a Last-Modified header are kept in an on-disk cache and revalidated
+with conditional requests (a 304 answer from GitHub does not count against the rate limit).
+"""
+import base64
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from .cache import PersistentCache, hash_key
+
+DEFAULT_TIMEOUT = (10, 30)  # (connect, read) in seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_PER_HOST = 8
+RETRY_STATUS = (429, 500, 502, 503, 504)
+HTTP_CACHE_SIZE_ENV = "NAPARI_HUB_CLI_HTTP_CACHE_SIZE"
+DEFAULT_HTTP_CACHE_SIZE = 256 * 1024 * 1024  # in bytes
+# request headers that change the content of a response
+VARYING_HEADERS = ("Authorization", "Accept")
+# response headers describing the transfer, not the stored (decoded) body
+TRANSPORT_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def read_http_cache_size():
+    # the size of the cache can be changed using var env, 0 disables the cache
+    try:
+        return int(os.environ.get(HTTP_CACHE_SIZE_ENV, DEFAULT_HTTP_CACHE_SIZE))
+    except ValueError:
+        return DEFAULT_HTTP_CACHE_SIZE
+
+
+def default_http_cache():
+    """Returns the on-disk HTTP cache configured for the process, None if the cache is disabled"""
+    max_size = read_http_cache_size()
+    if max_size <= 0:
+        return None
+    return PersistentCache("http", max_size=max_size)
+
+
+class HttpClient(object):
+    """A thread-safe pooled HTTP client.
+
+    Parameters
+    ----------
+    timeout: Tuple[float, float] | float = DEFAULT_TIMEOUT
+        The default timeout of the requests, used if no timeout is given for a request.
+    retries: int = DEFAULT_RETRIES
+        The number of retries on connection errors and transient status codes.
+    backoff_factor: float = DEFAULT_BACKOFF
+        The backoff factor between two retries (0.5 gives 0.5s, 1s, 2s, ...).
+    max_per_host: int = DEFAULT_MAX_PER_HOST
+        The maximum number of concurrent requests for a same host, this is also the size of the connection pools.
+    cache: Optional[PersistentCache] = None
+        The cache used for conditional GET requests, no cache is used if None.
+    """
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF,
+        max_per_host=DEFAULT_MAX_PER_HOST,
+        cache=None,
+    ):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS,
+            # the POST requests of the analyses are read-only queries (e.g: GraphQL)
+            allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_per_host,
+            pool_maxsize=max_per_host,
+            max_retries=retry,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @contextmanager
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = self._host_slots[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+        with slots:
+            yield
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._host_slot(url):
+            return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        if self.cache is None or kwargs.get("stream") or kwargs.get("params"):
+            return self.request("GET", url, **kwargs)
+        headers = dict(kwargs.pop("headers", None) or {})
+        key = hash_key(url, [headers.get(h) for h in VARYING_HEADERS])
+        entry = self.cache.get(key)
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.request("GET", url, headers=headers, **kwargs)
+        if entry and response.status_code == 304:
+            return self._cached_response(entry, response)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self.cache.set(
+                key,
+                {
+                    "url": response.url,
+                    "headers": {
+                        k: v
+                        for k, v in response.headers.items()
+                        if k.lower() not in TRANSPORT_HEADERS
+                    },
+                    "encoding": response.encoding,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "body": base64.b64encode(response.content).decode("ascii"),
+                },
+            )
+        return response
+
+    @staticmethod
+    def _cached_response(entry, not_modified):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = entry["encoding"]
+        response._content = base64.b64decode(entry["body"])
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.from_cache = True
+        return response
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def http_client():
+    """Returns the HTTP client of the current process.
+
+    Returns
+    -------
+    HttpClient
+        the shared client, a new one is created after a fork as connections cannot be shared between processes
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = HttpClient(cache=default_http_cache())
+            _client_pid = os.getpid()
+        return _client
+
+
+def http_get(url, **kwargs):
+    return http_client().get(url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    return http_client().post(url, **kwargs)
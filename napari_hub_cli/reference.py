@@ -0,0 +1,283 @@
+"""Reference datasets shared by all the plugin analyses of a run.
+
+The npe2 parsing errors, the OSI approved licenses and the napari hub plugin index do not depend on the analysed plugin.
+They are fetched once per process (or loaded from a dated snapshot file) and indexed for O(1) lookups.
+The snapshot file can be given using the NAPARI_HUB_CLI_REFERENCE_SNAPSHOT environment variable,
+it is created with the "snapshot-reference" command.
+A warning is displayed if the snapshot is older than NAPARI_HUB_CLI_REFERENCE_SNAPSHOT_MAX_AGE days (7 by default).
+"""
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+
+import requests
+from rich import print
+
+from .constants import NAPARI_HUB_API_URL, NPE2_ERRORS_URL, OSI_LICENSES_URL
+from .network import http_get
+
+SNAPSHOT_ENV = "NAPARI_HUB_CLI_REFERENCE_SNAPSHOT"
+SNAPSHOT_MAX_AGE_ENV = "NAPARI_HUB_CLI_REFERENCE_SNAPSHOT_MAX_AGE"
+DEFAULT_SNAPSHOT_MAX_AGE = 7  # in days
+
+
+def read_snapshot_max_age():
+    # the age after which a snapshot is reported as stale can be changed using var env
+    try:
+        return int(os.environ.get(SNAPSHOT_MAX_AGE_ENV, DEFAULT_SNAPSHOT_MAX_AGE))
+    except ValueError:
+        return DEFAULT_SNAPSHOT_MAX_AGE
+
+
+def _fetch_json(url):
+    try:
+        response = http_get(url)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+
+def _fetch_npe2_errors():
+    return _fetch_json(NPE2_ERRORS_URL)
+
+
+def _fetch_osi_licenses():
+    licenses = _fetch_json(OSI_LICENSES_URL)
+    if licenses is None:
+        return None
+    all_ids = (
+        [entry["id"]] + [ident["identifier"] for ident in entry.get("identifiers", [])]
+        for entry in licenses
+    )
+    return [id for ids in all_ids for id in ids]
+
+
+def _fetch_hub_index(api_url):
+    return _fetch_json(f"{api_url}/index/all")
+
+
+class HubIndexUnavailableError(Exception):
+    def __init__(self, api_url, *args, **kwargs):
+        self.api_url = api_url
+        self.message = (
+            f"The napari hub plugin index cannot be fetched from '{api_url}/index/all'"
+        )
+        super().__init__(
+            self.message,
+            *args,
+            **kwargs,
+        )
+
+
+class ReferenceData(object):
+    """Store of the reference datasets.
+    Each dataset is fetched at most once, even if it is requested concurrently.
+    Failed fetches are not kept, the next access fetches the dataset again.
+
+    Parameters
+    ----------
+    snapshot: Optional[Dict[str, Any]] = None
+        Datasets that are already known (see `snapshot()`), they are never fetched
+    """
+
+    def __init__(self, snapshot=None):
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._raw = {}
+        self._indexed = {}
+        if snapshot:
+            self.load(snapshot)
+
+    def load(self, snapshot):
+        for key in ("npe2_errors", "osi_licenses"):
+            if snapshot.get(key) is not None:
+                self._set(key, snapshot[key])
+        for api_url, index in snapshot.get("hub_index", {}).items():
+            self._set(("hub_index", api_url), index)
+
+    def _set(self, key, raw):
+        kind = key[0] if isinstance(key, tuple) else key
+        if kind == "npe2_errors":
+            indexed = raw
+        elif kind == "osi_licenses":
+            indexed = frozenset(raw)
+        else:
+            indexed = {plugin["name"]: plugin for plugin in raw}
+        self._raw[key] = raw
+        self._indexed[key] = indexed
+
+    def _get(self, key, fetch, default):
+        indexed = self._indexed.get(key)
+        if indexed is not None:
+            return indexed
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._indexed:
+                raw = fetch()
+                if raw is None:
+                    return default
+                self._set(key, raw)
+        return self._indexed[key]
+
+    @property
+    def npe2_errors(self):
+        """Dict[str, Dict]: the npe2 parsing errors by plugin name"""
+        return self._get("npe2_errors", _fetch_npe2_errors, {})
+
+    @property
+    def osi_licenses(self):
+        """FrozenSet[str]: the SPDX identifiers of the OSI approved licenses"""
+        return self._get("osi_licenses", _fetch_osi_licenses, frozenset())
+
+    def hub_index(self, api_url=NAPARI_HUB_API_URL):
+        """Returns the plugins registered in the napari hub.
+        Unlike the other datasets, the index has no usable default: an analysis of all the plugins
+        relies on it, so a failed fetch is reported instead of being seen as an empty hub.
+
+        Parameters
+        ----------
+        api_url: Optional[str] = NAPARI_HUB_API_URL
+            The Napari HUB api url
+
+        Returns
+        -------
+        Dict[str, Dict]
+            the information of the plugins indexed by name
+
+        Raises
+        ------
+        HubIndexUnavailableError
+            if the index cannot be fetched
+        """
+        key = ("hub_index", api_url)
+        index = self._get(key, lambda: _fetch_hub_index(api_url), None)
+        if index is None:
+            raise HubIndexUnavailableError(api_url)
+        return index
+
+    def snapshot(self, api_urls=(NAPARI_HUB_API_URL,)):
+        """Returns all the datasets, fetching the ones that are not known yet.
+
+        Returns
+        -------
+        Dict[str, Any]
+            the datasets, the snapshot can be given to `ReferenceData` or saved with `save_snapshot`
+
+        Raises
+        ------
+        HubIndexUnavailableError
+            if the plugin index of one of the api urls cannot be fetched
+        """
+        self.npe2_errors
+        self.osi_licenses
+        for api_url in api_urls:
+            self.hub_index(api_url)
+        return {
+            "date": date.today().isoformat(),
+            "npe2_errors": self._raw.get("npe2_errors"),
+            "osi_licenses": self._raw.get("osi_licenses"),
+            "hub_index": {
+                key[1]: raw
+                for key, raw in self._raw.items()
+                if isinstance(key, tuple) and key[0] == "hub_index"
+            },
+        }
+
+
+_reference = None
+_reference_lock = threading.Lock()
+
+
+def reference_data():
+    """Returns the reference data store of the process.
+
+    Returns
+    -------
+    ReferenceData
+        the store, initialized with the snapshot file from $NAPARI_HUB_CLI_REFERENCE_SNAPSHOT if set
+    """
+    global _reference
+    with _reference_lock:
+        if _reference is None:
+            location = os.environ.get(SNAPSHOT_ENV)
+            snapshot = load_snapshot(location) if location else None
+            if snapshot is not None:
+                _warn_if_stale(location, snapshot)
+            _reference = ReferenceData(snapshot)
+        return _reference
+
+
+def use_reference_snapshot(snapshot):
+    """Replaces the reference data store of the process by one built from a snapshot"""
+    global _reference
+    with _reference_lock:
+        _reference = ReferenceData(snapshot)
+
+
+def reset_reference_data():
+    """Drops the reference data store of the process, the datasets are fetched again on next access"""
+    global _reference
+    with _reference_lock:
+        _reference = None
+
+
+def save_snapshot(path, api_urls=(NAPARI_HUB_API_URL,)):
+    """Saves a dated snapshot of the reference datasets.
+
+    Parameters
+    ----------
+    path: Path | str
+        The file where the snapshot is saved
+
+    Returns
+    -------
+    Path
+        the path of the snapshot file
+    """
+    path = Path(path)
+    snapshot = reference_data().snapshot(api_urls)
+    path.write_text(json.dumps(snapshot), encoding="utf-8")
+    return path
+
+
+def load_snapshot(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def snapshot_age(snapshot, today=None):
+    """Returns the age of a snapshot.
+
+    Parameters
+    ----------
+    snapshot: Dict[str, Any]
+        The snapshot (see `ReferenceData.snapshot()`)
+    today: Optional[date] = None
+        The current date, `date.today()` if None
+
+    Returns
+    -------
+    Optional[int]
+        the age of the snapshot in days, None if the snapshot is not dated
+    """
+    try:
+        created = date.fromisoformat(snapshot["date"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return ((today or date.today()) - created).days
+
+
+def _warn_if_stale(location, snapshot):
+    age = snapshot_age(snapshot)
+    if age is None:
+        print(
+            f"[yellow]WARNING! The reference snapshot {location} is not dated, its datasets can be outdated[/yellow]"
+        )
+    elif age > read_snapshot_max_age():
+        print(
+            f"[yellow]WARNING! The reference snapshot {location} is {age} days old, its datasets can be outdated[/yellow]"
+        )
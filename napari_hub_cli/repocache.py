@@ -0,0 +1,337 @@
+"""Persistent cache of the cloned plugin repositories.
+
+Each repository is cloned once in the napari-hub-cli cache directory.
+When it is analysed again, the existing checkout is updated by fetching the new commits and hard reset,
+instead of being downloaded again.
+Repositories are evicted in least recently used order when the total size of the cache exceeds its maximum size.
+The cache can be used by concurrent threads and processes, each repository is protected by a lock file.
+The maximum size can be changed using the NAPARI_HUB_CLI_REPOSITORY_CACHE_SIZE environment variable,
+0 disables the cache.
+"""
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+from git.repo import Repo
+
+from .cache import cache_dir, hash_key
+from .utils import delete_file_tree
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+REPOSITORY_CACHE_SIZE_ENV = "NAPARI_HUB_CLI_REPOSITORY_CACHE_SIZE"
+DEFAULT_REPOSITORY_CACHE_SIZE = 5 * 1024 * 1024 * 1024  # in bytes
+# LFS objects are never read by the analysis
+GIT_ENV = {"GIT_LFS_SKIP_SMUDGE": "1"}
+
+
+def read_repository_cache_size():
+    # the size of the cache can be changed using var env, 0 disables the cache
+    try:
+        return int(
+            os.environ.get(REPOSITORY_CACHE_SIZE_ENV, DEFAULT_REPOSITORY_CACHE_SIZE)
+        )
+    except ValueError:
+        return DEFAULT_REPOSITORY_CACHE_SIZE
+
+
+def clone_repository(url, destination, patterns=None, progress=None):
+    """Shallow clones a repository.
+
+    Parameters
+    ----------
+    url: str
+        The url of the repository
+    destination: Path
+        The directory where the repository is cloned
+    patterns: Optional[Iterable[str]] = None
+        If given, only the blobs of the files matching the patterns are fetched and checked out,
+        the whole tip tree is checked out otherwise
+    progress: Optional[Callable] = None
+        The progress callback of the clone
+
+    Returns
+    -------
+    Repo
+        the cloned repository
+    """
+    if patterns is None:
+        return Repo.clone_from(url, destination, depth=1, progress=progress)
+    repo = Repo.clone_from(
+        url,
+        destination,
+        depth=1,
+        progress=progress,
+        env=GIT_ENV,
+        multi_options=["--filter=blob:none", "--no-checkout"],
+    )
+    repo.git.sparse_checkout("set", "--no-cone", "--", *patterns, env=GIT_ENV)
+    # the missing blobs are fetched in a single batch by the checkout
+    repo.git.checkout(env=GIT_ENV)
+    return repo
+
+
+def extend_sparse_checkout(path, patterns):
+    """Adds patterns to the sparse checkout of a clone, the missing blobs are fetched.
+
+    Parameters
+    ----------
+    path: Path
+        The path of the clone
+    patterns: Iterable[str]
+        The gitignore-like patterns of the files to check out
+    """
+    Repo(path).git.sparse_checkout("add", "--", *patterns, env=GIT_ENV)
+
+
+def update_repository(path):
+    """Updates a shallow clone to the tip of the remote default branch and drops any local modification.
+    The partial clone filter and the sparse-checkout patterns of the clone are kept.
+
+    Parameters
+    ----------
+    path: Path
+        The path of the clone
+
+    Returns
+    -------
+    Repo
+        the updated repository
+    """
+    repo = Repo(path)
+    repo.git.fetch("--depth=1", "origin", "HEAD", env=GIT_ENV)
+    repo.git.reset("--hard", "FETCH_HEAD", env=GIT_ENV)
+    repo.git.clean("-ffdxq")
+    return repo
+
+
+def local_head_sha(path):
+    """Returns the SHA of the commit checked out in a clone, None if it cannot be read"""
+    try:
+        return Repo(path).head.commit.hexsha
+    except (
+        GitCommandError,
+        InvalidGitRepositoryError,
+        NoSuchPathError,
+        ValueError,
+        OSError,
+    ):
+        return None
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                ...
+    return total
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Exclusive lock between processes (and threads) based on a lock file.
+    Each call opens the lock file, so two threads of a same process also exclude each other.
+
+    Yields
+    ------
+    bool
+        True if the lock is held, False if it could not be acquired without blocking
+    """
+    with open(path, "a+b") as f:
+        try:
+            if fcntl:
+                operation = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(f, operation)
+            else:  # pragma: no cover
+                f.seek(0)
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                msvcrt.locking(f.fileno(), mode, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RepositoryCache(object):
+    """Cache of shallow clones with LRU eviction under a total size budget.
+
+    Parameters
+    ----------
+    max_size: int = DEFAULT_REPOSITORY_CACHE_SIZE
+        The maximum size in bytes of all the cached repositories
+    location: Optional[Path] = None
+        The directory where the repositories are stored, `cache_dir() / "repositories"` if None
+    """
+
+    def __init__(self, max_size=DEFAULT_REPOSITORY_CACHE_SIZE, location=None):
+        self.max_size = max_size
+        self.location = location
+
+    @property
+    def root(self):
+        return Path(self.location) if self.location else cache_dir() / "repositories"
+
+    def _entry_lock(self, key, blocking=True):
+        return file_lock(self.root / f"{key}.lock", blocking)
+
+    @contextmanager
+    def checkout(
+        self, url, patterns=None, progress=None, name="repository", head_sha=None
+    ):
+        """Gives an up-to-date checkout of a repository, it is locked until the context is left.
+        If the lock cannot be taken, a private temporary clone is given instead of the cached one.
+
+        Parameters
+        ----------
+        url: str
+            The url of the repository
+        patterns: Optional[Iterable[str]] = None
+            The sparse-checkout patterns of the clone, the whole tree is checked out if None
+        progress: Optional[Callable] = None
+            The progress callback used if the repository needs to be cloned
+        name: str = "repository"
+            The name of the checkout directory
+        head_sha: Optional[str] = None
+            The SHA of the remote HEAD if known, an existing clone at this commit is used without fetching
+
+        Yields
+        ------
+        Path
+            the path of the checkout, None if the repository cannot be cloned
+        """
+        patterns = tuple(patterns) if patterns is not None else None
+        key = hash_key(url, patterns)
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / key / name
+        with self._entry_lock(key) as locked:
+            if not locked:
+                # the entry cannot be locked, it is never modified without the lock
+                with self._private_checkout(url, patterns, progress, name) as path:
+                    yield path
+                return
+            known_head = (self._read_info(key) or {}).get("head")
+            up_to_date = head_sha and known_head == head_sha and path.exists()
+            try:
+                if not up_to_date:
+                    self._update_or_clone(url, path, patterns, progress)
+            except GitCommandError:
+                yield None
+                return
+            try:
+                yield path
+            finally:
+                self._write_info(key, url, local_head_sha(path))
+        self.evict()
+
+    @contextmanager
+    def _private_checkout(self, url, patterns, progress, name):
+        directory = Path(tempfile.mkdtemp(prefix="napari-hub-cli-"))
+        try:
+            path = directory / name
+            try:
+                clone_repository(url, path, patterns, progress=progress)
+            except GitCommandError:
+                yield None
+                return
+            yield path
+        finally:
+            delete_file_tree(directory)
+
+    def _update_or_clone(self, url, path, patterns, progress):
+        if (path / ".git").exists():
+            try:
+                update_repository(path)
+                return
+            except GitCommandError:
+                # the clone is broken or the history has been rewritten, it is cloned again
+                ...
+        self._remove(path.parent.name)
+        try:
+            clone_repository(url, path, patterns, progress=progress)
+        except GitCommandError:
+            self._remove(path.parent.name)
+            raise
+
+    def _remove(self, key):
+        if (self.root / key).exists():
+            delete_file_tree(self.root / key)
+        (self.root / f"{key}.json").unlink(missing_ok=True)
+
+    def _write_info(self, key, url, head):
+        path = self.root / key
+        info = {
+            "url": url,
+            "head": head,
+            "size": directory_size(path) if path.exists() else 0,
+            "accessed": time.time(),
+        }
+        (self.root / f"{key}.json").write_text(json.dumps(info), encoding="utf-8")
+
+    def entries(self):
+        """Returns the cached repositories
+
+        Returns
+        -------
+        Dict[str, Dict]
+            the information about the repositories (url, HEAD SHA, size and last access) by key
+        """
+        entries = {}
+        for info_file in self.root.glob("*.json"):
+            info = self._read_info(info_file.stem)
+            if info is not None:
+                entries[info_file.stem] = info
+        return entries
+
+    def _read_info(self, key):
+        try:
+            return json.loads((self.root / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def evict(self):
+        """Removes the least recently used repositories until the cache fits in its maximum size.
+        Repositories that are currently in use are never removed.
+        """
+        entries = self.entries()
+        total = sum(info["size"] for info in entries.values())
+        lru = sorted(entries.items(), key=lambda entry: entry[1]["accessed"])
+        for key, info in lru:
+            if total <= self.max_size:
+                break
+            with self._entry_lock(key, blocking=False) as locked:
+                if not locked:
+                    continue
+                self._remove(key)
+            total -= info["size"]
+
+    def clear(self):
+        for key in self.entries():
+            with self._entry_lock(key) as locked:
+                if locked:
+                    self._remove(key)
+
+
+def repository_cache():
+    """Returns the repository cache configured for the process, None if the cache is disabled"""
+    max_size = read_repository_cache_size()
+    if max_size <= 0:
+        return None
+    return RepositoryCache(max_size=max_size)
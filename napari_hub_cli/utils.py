@@ -8,12 +8,13 @@ import warnings
 import weakref
 from re import sub
 
-import requests
 import setuptools
-from git import GitError, InvalidGitRepositoryError
+from git import GitError, InvalidGitRepositoryError, NoSuchPathError
 from git.repo import Repo
 
 from .constants import NAPARI_HUB_API_URL
+from .network import http_get
+from .reference import reference_data
 
 # def get_github_license(meta):
 #     """Use Source Code field to get license from GitHub repo
@@ -66,8 +67,8 @@ class NonExistingNapariPluginError(Exception):
 
 def get_all_napari_plugin_names(api_url=NAPARI_HUB_API_URL):
     return [
-        plugin["name"]
-        for plugin in requests.get(f"{api_url}/index/all").json()
+        name
+        for name, plugin in reference_data().hub_index(api_url).items()
         if plugin["visibility"] == "public"
     ]
 
@@ -119,7 +120,7 @@ def get_repository_url(plugin_name, api_url=NAPARI_HUB_API_URL):
         If the plugin does not exist in the Naparai HUB api
     """
     napari_hub_plugin_url = f"{api_url}/{plugin_name}"
-    plugin_info_req = requests.get(napari_hub_plugin_url)
+    plugin_info_req = http_get(napari_hub_plugin_url)
 
     if plugin_info_req.status_code != 200:
         # This line is never called, api.napari-hub.org never gives a status code != 200 even if the plugin doesn't exist
@@ -137,9 +138,12 @@ def get_repository_url(plugin_name, api_url=NAPARI_HUB_API_URL):
 
 
 def scrap_git_infos(local_repo):
+    if not isinstance(local_repo, (str, os.PathLike)):
+        # e.g: the root of a distribution archive
+        return {}
     try:
         repo = Repo(local_repo.absolute())
-    except InvalidGitRepositoryError:
+    except (InvalidGitRepositoryError, NoSuchPathError):
         return {}
 
     try:
@@ -171,27 +175,32 @@ def build_gh_header():
 # over the parameters that are passed to "setup(...)", this function
 # or any library relying on monkey patching of "setup(...)" will give bad results.
 def parse_setup(filename):
-    result = []
     setup_path = os.path.abspath(filename)
     wd = os.getcwd()  # save current directory
     os.chdir(os.path.dirname(setup_path))  # we change there
+    try:
+        with open(setup_path, "r") as f:
+            return exec_setup(f.read(), setup_path)
+    finally:
+        os.chdir(wd)  # we go back to our working directory
+
+
+def exec_setup(source, setup_path):
+    """Runs the source of a setup.py and returns the arguments given to `setup()`"""
+    result = []
     old_setup = setuptools.setup
     setuptools.setup = lambda **kwargs: result.append(kwargs)
-    with open(setup_path, "r") as f:
-        try:
-            exec(
-                f.read(),
-                {
-                    "__name__": "__main__",
-                    "__builtins__": __builtins__,
-                    "__file__": setup_path,
-                },
-            )
-        finally:
-            setuptools.setup = (
-                old_setup  # we reset setuptools function to the original one
-            )
-            os.chdir(wd)  # we go back to our working directory
+    try:
+        exec(
+            source,
+            {
+                "__name__": "__main__",
+                "__builtins__": __builtins__,
+                "__file__": setup_path,
+            },
+        )
+    finally:
+        setuptools.setup = old_setup  # we reset setuptools function to the original one
     if result:
         return result[0]
     raise ValueError("setup wasn't called from setup.py")  # pragma: no cover
@@ -1,12 +1,20 @@
+import os
+import shutil
+import tempfile
 from pathlib import Path
 
 import pytest
 import requests_mock
 
+from napari_hub_cli.cache import CACHE_DIR_ENV
+from napari_hub_cli.fs.descriptions import doi_cache
+from napari_hub_cli.reference import reset_reference_data
+
 from .config_enum import CONFIG, DEMO_GITHUB_REPO
 
 RESOURCES = Path(__file__).parent / "resources"
 MOCK_REQUESTS = None
+CACHE_DIR = None
 
 
 def pytest_addoption(parser):
@@ -23,6 +31,10 @@ def pytest_configure(config):
         "markers",
         "online: mark test as being run online (making actual HTTP requests)",
     )
+    # the persistent caches of the tests never use the user's cache
+    global CACHE_DIR
+    CACHE_DIR = tempfile.mkdtemp(prefix="napari-hub-cli-cache")
+    os.environ[CACHE_DIR_ENV] = CACHE_DIR
     if config.getoption("--online"):
         return
     global MOCK_REQUESTS
@@ -51,6 +63,23 @@ def pytest_collection_modifyitems(config, items):
 def pytest_unconfigure(config):
     if MOCK_REQUESTS is not None:
         MOCK_REQUESTS.stop()
+    if CACHE_DIR is not None:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_reference_data():
+    # the reference datasets are mocked differently by each test
+    reset_reference_data()
+    yield
+    reset_reference_data()
+
+
+@pytest.fixture(autouse=True)
+def fresh_doi_cache():
+    # the DOIs are mocked differently by each test
+    doi_cache.clear()
+    yield
 
 
 @pytest.fixture
@@ -0,0 +1,111 @@
+import io
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from napari_hub_cli.archive import (
+    ARCHIVE_URL,
+    download_archive,
+    github_repository,
+    matches_patterns,
+)
+from napari_hub_cli.checklist.analysis import (
+    FetchMode,
+    analyse_remote_plugin_url,
+    sparse_patterns,
+)
+from napari_hub_cli.checklist.metadata import AnalysisStatus, analyse_local_plugin
+from napari_hub_cli.checklist.projectmetadata import project_metadata_suite
+
+RESOURCE = Path(__file__).parent.absolute() / "resources" / "CZI-29-test"
+URL = "https://github.com/user/CZI-29-test"
+
+
+@pytest.fixture
+def archive(requests_mock):
+    content = io.BytesIO()
+    with tarfile.open(fileobj=content, mode="w:gz") as tar:
+        for path in sorted(RESOURCE.rglob("*")):
+            if "__pycache__" in path.parts:
+                continue
+            arcname = f"CZI-29-test-HEAD/{path.relative_to(RESOURCE)}"
+            tar.add(path, arcname=arcname, recursive=False)
+        data = b"0" * 1024
+        info = tarfile.TarInfo("CZI-29-test-HEAD/data/sample.tif")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    archive_url = ARCHIVE_URL.format(owner="user", name="CZI-29-test", ref="HEAD")
+    requests_mock.get(archive_url, content=content.getvalue())
+    return archive_url
+
+
+def test_github_repository():
+    assert github_repository("https://github.com/user/repo") == ("user", "repo")
+    assert github_repository("https://github.com/user/repo.git") == ("user", "repo")
+    assert github_repository("https://github.com/user/repo/") == ("user", "repo")
+    assert github_repository("https://github.com/user/repo/tree/main") is None
+    assert github_repository("https://gitlab.com/user/repo") is None
+    assert github_repository(None) is None
+
+
+def test_matches_patterns():
+    patterns = ("/setup.cfg", "/README*", "/.github/workflows/", "*.yaml")
+    assert matches_patterns("setup.cfg", patterns)
+    assert not matches_patterns("src/setup.cfg", patterns)
+    assert matches_patterns("README.md", patterns)
+    assert matches_patterns(".github/workflows/test.yml", patterns)
+    assert not matches_patterns(".github/dependabot.yml", patterns)
+    assert matches_patterns("src/plugin/napari.yaml", patterns)
+    assert not matches_patterns("data/sample.tif", patterns)
+
+
+def test_download_archive(archive, tmp_path):
+    patterns = sparse_patterns(project_metadata_suite)
+    assert download_archive(URL, tmp_path, patterns) is True
+
+    assert (tmp_path / "setup.cfg").exists()
+    assert (tmp_path / ".napari-hub" / "DESCRIPTION.md").exists()
+    assert (tmp_path / "plugin_napari" / "napari.yaml").exists()
+    assert not (tmp_path / "data").exists()
+    assert not (tmp_path / "drawing.png").exists()
+
+    assert download_archive("https://gitlab.com/user/repo", tmp_path, patterns) is False
+
+
+def test_download_archive_referenced(archive, requests_mock, tmp_path):
+    def referenced(destination):
+        # the files read by the configuration are known once it is extracted
+        assert (destination / "setup.cfg").exists()
+        return ["/data/sample.tif"]
+
+    assert download_archive(URL, tmp_path, ["/setup.cfg"], referenced=referenced)
+    assert (tmp_path / "setup.cfg").exists()
+    assert (tmp_path / "data" / "sample.tif").read_bytes() == b"0" * 1024
+    assert not (tmp_path / "drawing.png").exists()
+    assert requests_mock.call_count == 1
+
+
+def test_download_archive_unavailable(requests_mock, tmp_path):
+    archive_url = ARCHIVE_URL.format(owner="user", name="CZI-29-test", ref="HEAD")
+    requests_mock.get(archive_url, status_code=404)
+    assert download_archive(URL, tmp_path, ["*"]) is False
+
+    requests_mock.get(archive_url, content=b"not an archive")
+    assert download_archive(URL, tmp_path, ["*"]) is False
+
+
+def test_analyse_remote_plugin_url_archive(archive, mocker):
+    clone = mocker.patch("napari_hub_cli.checklist.analysis.clone_repository")
+
+    result = analyse_remote_plugin_url(
+        "CZI-29-test", URL, fetch_mode=FetchMode.ARCHIVE, head_sha=None
+    )
+
+    clone.assert_not_called()
+    assert result.status is AnalysisStatus.SUCCESS
+    assert result.url == URL
+    expected = analyse_local_plugin(RESOURCE, project_metadata_suite)
+    assert [(f.meta.attribute, f.result) for f in result.detached().features] == [
+        (f.meta.attribute, f.result) for f in expected.detached().features
+    ]
@@ -0,0 +1,238 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from napari_hub_cli.checklist.analysis import (
+    analyse_pypi_distribution,
+    analyse_remote_plugin,
+)
+from napari_hub_cli.checklist.metadata import AnalysisStatus, analyse_local_plugin
+from napari_hub_cli.checklist.projectmetadata import project_metadata_suite
+from napari_hub_cli.constants import NAPARI_HUB_API_URL, PYPI_API_URL
+from napari_hub_cli.fs import NapariPlugin
+from napari_hub_cli.fs.archivefs import (
+    ZERO_COPY_THRESHOLD,
+    ArchiveFileSystem,
+    ArchivePath,
+)
+from napari_hub_cli.fs.configfiles import PkgInfo
+
+RESOURCE = Path(__file__).parent.absolute() / "resources" / "CZI-29-test"
+PKG_INFO = """\
+Metadata-Version: 2.1
+Name: napari-foo
+Version: 0.1.0
+Summary: A foo plugin
+Author: Jane Doe
+Project-URL: Source Code, https://github.com/user/napari-foo
+Project-URL: Bug Tracker, https://github.com/user/napari-foo/issues
+Classifier: Framework :: napari
+Requires-Dist: numpy
+Requires-Dist: pytest ; extra == "testing"
+Description-Content-Type: text/markdown
+
+# napari-foo
+
+A long description
+"""
+
+
+def resource_files():
+    for path in sorted(RESOURCE.rglob("*")):
+        if path.is_file() and "__pycache__" not in path.parts:
+            yield path, path.relative_to(RESOURCE).as_posix()
+
+
+@pytest.fixture
+def sdist(tmp_path):
+    archive = tmp_path / "CZI-29-test-0.1.0.tar.gz"
+    with tarfile.open(archive, mode="w:gz") as tar:
+        for path, name in resource_files():
+            tar.add(path, arcname=f"CZI-29-test-0.1.0/{name}")
+        info = tarfile.TarInfo("CZI-29-test-0.1.0/PKG-INFO")
+        info.size = len(PKG_INFO.encode())
+        tar.addfile(info, io.BytesIO(PKG_INFO.encode()))
+    return archive
+
+
+@pytest.fixture
+def wheel(tmp_path):
+    archive = tmp_path / "napari_foo-0.1.0-py3-none-any.whl"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as whl:
+        whl.writestr("napari_foo/__init__.py", "")
+        whl.writestr("napari_foo/napari.yaml", "name: napari-foo\n")
+        whl.writestr("napari_foo-0.1.0.dist-info/METADATA", PKG_INFO)
+        whl.writestr(
+            "napari_foo-0.1.0.dist-info/entry_points.txt",
+            "[napari.manifest]\nnapari-foo = napari_foo:napari.yaml\n",
+        )
+        whl.writestr(
+            "napari_foo/data.bin",
+            b"\x01" * ZERO_COPY_THRESHOLD,
+            compress_type=zipfile.ZIP_STORED,
+        )
+    return archive
+
+
+def test_archive_path_sdist(sdist):
+    with ArchiveFileSystem(sdist) as fs:
+        root = fs.root
+        assert isinstance(root, ArchivePath)
+        assert root.is_dir()
+        assert (root / "setup.cfg").is_file()
+        assert (root / ".napari-hub").is_dir()
+        assert not (root / "missing.txt").exists()
+        assert (root / "setup.cfg").read_text() == (RESOURCE / "setup.cfg").read_text()
+        with (root / "setup.cfg").open() as f:
+            assert f.readline() == (RESOURCE / "setup.cfg").open().readline()
+
+        names = {p.name for p in root.iterdir()}
+        assert {"setup.cfg", ".napari-hub", "PKG-INFO"} <= names
+        assert [p.path for p in root.glob("plugin_napari/*.yaml")] == [
+            "plugin_napari/napari.yaml"
+        ]
+        assert "plugin_napari/napari.yaml" in {p.path for p in root.rglob("*.yaml")}
+        assert (root / "plugin_napari" / "napari.yaml").parent == root / "plugin_napari"
+
+        with pytest.raises(FileNotFoundError):
+            (root / "missing.txt").read_bytes()
+        with pytest.raises(io.UnsupportedOperation):
+            (root / "setup.cfg").open("w")
+
+
+def test_archive_path_wheel_zero_copy(wheel):
+    with ArchiveFileSystem(wheel) as fs:
+        data = fs.root / "napari_foo" / "data.bin"
+        buffer = data.read_buffer()
+        assert isinstance(buffer, memoryview)
+        assert buffer.nbytes == ZERO_COPY_THRESHOLD
+        assert bytes(buffer[:4]) == b"\x01" * 4
+        buffer.release()
+
+        # small or compressed members are copied
+        metadata = fs.root / "napari_foo-0.1.0.dist-info" / "METADATA"
+        assert isinstance(metadata.read_buffer(), bytes)
+
+
+def test_pkg_info(wheel):
+    with ArchiveFileSystem(wheel) as fs:
+        pkg_info = PkgInfo(PkgInfo.find(fs.root))
+        assert pkg_info.exists
+        assert pkg_info.name == "napari-foo"
+        assert pkg_info.summary == "A foo plugin"
+        assert pkg_info.author == "Jane Doe"
+        assert pkg_info.sourcecode == "https://github.com/user/napari-foo"
+        assert pkg_info.bugtracker == "https://github.com/user/napari-foo/issues"
+        assert pkg_info.requirements == ["numpy"]
+        assert "A long description" in pkg_info.long_description().raw_content
+
+        npe2_file = pkg_info.find_npe2()
+        assert npe2_file is not None
+        assert npe2_file.path == "napari_foo/napari.yaml"
+
+    assert PkgInfo(PkgInfo.find(RESOURCE)).exists is False
+
+
+def test_analyse_archive_like_local(sdist):
+    with ArchiveFileSystem(sdist) as fs:
+        plugin = NapariPlugin(fs.root)
+        assert plugin.pkg_info.exists
+        archive_result = analyse_local_plugin(fs.root, project_metadata_suite)
+    local_result = analyse_local_plugin(RESOURCE, project_metadata_suite)
+
+    def summary(result):
+        return [(f.meta.name, f.found) for f in result.features]
+
+    # the core metadata of the sdist fills the urls missing from the repository
+    from_pkg_info = {"Source Code", "Issue Submission Link"}
+    for (name, archive_found), (_, local_found) in zip(
+        summary(archive_result), summary(local_result)
+    ):
+        assert archive_found == (local_found or name in from_pkg_info), name
+
+
+def test_analyse_wheel_metadata(tmp_path):
+    readme = (
+        "# napari-foo\n\n"
+        "A plugin doing foo.\n\n"
+        "## Installation\n\n"
+        "    pip install napari-foo\n\n"
+        "## Usage\n\n"
+        "Open the foo widget.\n"
+    )
+    archive = tmp_path / "napari_foo-0.1.0-py3-none-any.whl"
+    with zipfile.ZipFile(archive, "w") as whl:
+        whl.writestr("napari_foo/__init__.py", "")
+        whl.writestr("napari_foo/napari.yaml", "display_name: Foo\n")
+        whl.writestr(
+            "napari_foo-0.1.0.dist-info/METADATA",
+            PKG_INFO.split("\n\n")[0] + "\n\n" + readme,
+        )
+        whl.writestr(
+            "napari_foo-0.1.0.dist-info/entry_points.txt",
+            "[napari.manifest]\nnapari-foo = napari_foo:napari.yaml\n",
+        )
+
+    with ArchiveFileSystem(archive) as fs:
+        plugin = NapariPlugin(fs.root)
+        assert plugin.pkg_info.create_npe2_entry() is None
+        result = analyse_local_plugin(fs.root, project_metadata_suite)
+
+    found = {f.meta.name: f.found for f in result.features}
+    for name in (
+        "Display Name",
+        "Summary Sentence",
+        "Author Name",
+        "Source Code",
+        "Issue Submission Link",
+        "Intro Paragraph",
+        "Usage Overview",
+        "Installation",
+    ):
+        assert found[name], name
+    assert not found["Support Channel Link"]
+
+
+def test_analyse_pypi_distribution(requests_mock, sdist, wheel):
+    requests_mock.get(
+        f"{PYPI_API_URL}/napari-foo/json",
+        json={
+            "urls": [
+                {
+                    "filename": wheel.name,
+                    "packagetype": "bdist_wheel",
+                    "url": "https://files/napari-foo.whl",
+                },
+                {
+                    "filename": sdist.name,
+                    "packagetype": "sdist",
+                    "url": "https://files/napari-foo.tar.gz",
+                },
+            ]
+        },
+    )
+    requests_mock.get("https://files/napari-foo.tar.gz", content=sdist.read_bytes())
+    requests_mock.get(f"{NAPARI_HUB_API_URL}/napari-foo", json={"code_repository": ""})
+
+    result = analyse_pypi_distribution("napari-foo", project_metadata_suite)
+    assert result.status is AnalysisStatus.FROM_DISTRIBUTION
+    assert result.url == "https://files/napari-foo.tar.gz"
+    assert result.features
+
+    result = analyse_remote_plugin("napari-foo", pypi_fallback=False)
+    assert result.status is AnalysisStatus.MISSING_URL
+
+    result = analyse_remote_plugin("napari-foo", pypi_fallback=True)
+    assert result.status is AnalysisStatus.FROM_DISTRIBUTION
+
+
+def test_analyse_pypi_distribution_unavailable(requests_mock):
+    requests_mock.get(f"{PYPI_API_URL}/napari-foo/json", status_code=404)
+    requests_mock.get(f"{NAPARI_HUB_API_URL}/napari-foo", json={"code_repository": ""})
+
+    assert analyse_pypi_distribution("napari-foo") is None
+    result = analyse_remote_plugin("napari-foo", pypi_fallback=True)
+    assert result.status is AnalysisStatus.MISSING_URL
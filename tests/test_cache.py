@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from napari_hub_cli.cache import CACHE_DIR_ENV, PersistentCache, cache_dir, hash_key
+
+
+@pytest.fixture
+def location(tmp_path):
+    return tmp_path / "cache"
+
+
+def test_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv(CACHE_DIR_ENV, f"{tmp_path}")
+
+    assert cache_dir() == tmp_path
+
+    monkeypatch.delenv(CACHE_DIR_ENV)
+
+    assert cache_dir().name == "napari-hub-cli"
+
+
+def test_hash_key():
+    assert hash_key(["a", "b"], (3, 9)) == hash_key(["a", "b"], [3, 9])
+    assert hash_key(["a", "b"], (3, 9)) != hash_key(["b", "a"], (3, 9))
+
+
+def test_get_set(location):
+    cache = PersistentCache("test", location=location)
+
+    assert cache.get("foo") is None
+    assert cache.get("foo", 42) == 42
+    assert "foo" not in cache
+
+    cache.set("foo", {"bar": [1, 2]})
+
+    assert "foo" in cache
+    assert cache.get("foo") == {"bar": [1, 2]}
+    assert len(cache) == 1
+    assert (location / "test.sqlite").exists()
+
+    # the data is persisted
+    cache = PersistentCache("test", location=location)
+
+    assert cache.get("foo") == {"bar": [1, 2]}
+
+    cache.clear()
+
+    assert len(cache) == 0
+
+
+def test_ttl(location, monkeypatch):
+    cache = PersistentCache("test", ttl=10, location=location)
+    cache.set("foo", 1)
+
+    assert cache.get("foo") == 1
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert cache.get("foo") is None
+    assert len(cache) == 0
+
+
+def test_max_entries(location):
+    cache = PersistentCache("test", max_entries=2, location=location)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" becomes the least recently used
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_max_size(location):
+    cache = PersistentCache("test", max_size=25, location=location)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+
+    assert len(cache) == 2
+
+    cache.set("c", "z" * 10)
+
+    assert len(cache) == 2
+    assert "a" not in cache
+
+
+def test_storage_error(tmp_path):
+    blocking_file = tmp_path / "file"
+    blocking_file.write_text("")
+    cache = PersistentCache("test", location=blocking_file / "cache")
+
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -1,7 +1,14 @@
+import threading
+import time
 from pathlib import Path
 
 import pytest
 
+from napari_hub_cli.checklist.metadata import (
+    Requirement,
+    RequirementSuite,
+    prefetch_requirements,
+)
 from napari_hub_cli.checklist.projectquality import (
     INSTALLABLE_LINUX,
     NUMBER_DEPENDENCIES,
@@ -44,3 +51,56 @@ def test_project_quality_nodeps(test_repo):
     assert requirement.main_files == []
     assert additional
     assert additional.main_files == []
+
+
+class FakeRemoteFile(object):
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.requested = set()
+        self.fetched = []
+
+    def prefetch(self, attributes):
+        self.requested |= attributes
+        return [self.fetch, self.fail]
+
+    def fetch(self):
+        time.sleep(self.delay)
+        self.fetched.append(threading.get_ident())
+
+    def fail(self):
+        raise ValueError("ignored during the prefetch")
+
+
+def test_prefetch_requirements():
+    remote1, remote2, fallback = FakeRemoteFile(), FakeRemoteFile(), FakeRemoteFile()
+    suite = RequirementSuite(
+        title="test",
+        requirements=[
+            Requirement(
+                features=[INSTALLABLE_LINUX],
+                main_files=[remote1],
+                fallbacks=[fallback],
+            ),
+            Requirement(features=[INSTALLABLE_LINUX], main_files=[], fallbacks=[]),
+        ],
+        additionals=[
+            Requirement(
+                features=[NUMBER_DEPENDENCIES],
+                main_files=[remote1, remote2, object()],
+                fallbacks=[],
+            )
+        ],
+    )
+
+    start = time.perf_counter()
+    prefetch_requirements(suite)
+    elapsed = time.perf_counter() - start
+
+    assert remote1.requested == {"installable_linux", "number_of_dependencies"}
+    assert remote2.requested == {"number_of_dependencies"}
+    assert len(remote1.fetched) == len(remote2.fetched) == 1
+    # the fallbacks are only read if the main files miss the feature
+    assert fallback.requested == set()
+    assert fallback.fetched == []
+    # the fetches ran concurrently
+    assert elapsed < 3 * remote1.delay
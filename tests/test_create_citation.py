@@ -12,7 +12,7 @@ from git.util import Actor
 from napari_hub_cli.citation import create_cff_citation, scrap_git_infos, scrap_users
 from napari_hub_cli.fs import NapariPlugin
 from napari_hub_cli.fs.configfiles import CitationFile
-from napari_hub_cli.fs.descriptions import MarkdownDescription
+from napari_hub_cli.fs.descriptions import MarkdownDescription, resolve_dois
 
 
 @pytest.fixture(scope="module")
@@ -562,6 +562,43 @@ def test_git_info_scrapping_newrepo(tmp_git_repo1):
     assert authors["authors"][0]["family-names"] == "Commiter"
 
 
+@pytest.mark.skipif(
+    sys.platform.startswith("win"),
+    reason="GitPython Actors feature doesn't work on Windows",
+)
+def test_git_info_scrapping_aliases(tmp_path, mocker):
+    from napari_hub_cli import citation
+
+    repo = Repo.init(tmp_path)
+    commits = [
+        ("Jane Doe", "jane@a.com"),
+        ("Jane Doe", "jane@b.com"),
+        ("jdoe", "jane@b.com"),
+        ("jdoe", "jane@c.com"),
+        ("John Smith", "john@a.com"),
+        ("John Smith", "john@a.com"),
+        ("dependabot[bot]", "bot@github.com"),
+        ("Ana", "ana@a.com"),
+    ]
+    for i, (name, email) in enumerate(commits):
+        (tmp_path / "file.txt").write_text(f"{i}")
+        repo.index.add([tmp_path / "file.txt"])
+        repo.index.commit(f"commit {i}", author=Actor(name, email))
+
+    log = mocker.spy(citation, "iter_commit_authors")
+    authors = scrap_users(tmp_path)["authors"]
+
+    # the 3 emails of Jane are merged through the aliases
+    assert authors[0] == {"given-names": "Jane", "family-names": "Doe"}
+    assert authors[1] == {"given-names": "John", "family-names": "Smith"}
+    assert authors[2]["given-names"].startswith("Ana  #")
+    assert len(authors) == 3
+
+    # the contributors of a same HEAD are read from the cache
+    assert scrap_users(tmp_path)["authors"] == authors
+    assert log.call_count == 1
+
+
 def test_doi_detection(citations_dir):
     mdfile = MarkdownDescription.from_file(citations_dir / "example_doi_only.md")
 
@@ -619,6 +656,34 @@ def test_doi_detection_extraction(citations_dir, requests_mock):
     assert results[3].title == "JKL"
 
 
+def test_doi_resolution_cache(requests_mock):
+    url = "https://citation.crosscite.org/format?doi={}&style=bibtex&lang=en-US"
+    abc = requests_mock.get(url.format("10.1/abc"), text="@article{abc, title={ABC}}")
+    missing = requests_mock.get(
+        url.format("10.1/def"), status_code=404, text="Not found"
+    )
+    ghi = requests_mock.get(url.format("10.1/ghi"), text="@article{ghi, title={GHI}}")
+
+    dois = ["10.1/abc", "10.1/def", "10.1/ghi", "10.1/abc"]
+    assert resolve_dois(dois) == [
+        "@article{abc, title={ABC}}",
+        "",
+        "@article{ghi, title={GHI}}",
+    ]
+    assert abc.call_count == 1
+    assert ghi.call_count == 1
+
+    # resolved DOIs are read from the cache, failures are resolved again
+    assert resolve_dois(["10.1/ABC", "10.1/def", "10.1/ghi"])[0].startswith("@article")
+    assert abc.call_count == 1
+    assert ghi.call_count == 1
+    assert missing.call_count == 2
+
+    mdfile = MarkdownDescription("https://doi.org/10.1/abc\n", None)
+    assert [c.title for c in mdfile.extract_citations()] == ["ABC"]
+    assert abc.call_count == 1
+
+
 @pytest.mark.online
 def test_doi_detection_extraction__online(citations_dir):
     mdfile = MarkdownDescription.from_file(citations_dir / "example_doi_only.md")
@@ -686,6 +686,48 @@ def test_markdown_title_extraction_notitle(resources):
     assert title is None
 
 
+def test_markdown_index(mocker):
+    from napari_hub_cli.fs import descriptions
+
+    descriptions.index_markdown.cache_clear()
+    document = mocker.spy(descriptions, "Document")
+    content = """\
+# my-plugin
+
+A plugin doing things.
+
+## Installation
+
+    pip install my-plugin
+
+## Usage
+
+![screenshot](docs/screenshot.png)
+
+https://example.com/demo.mp4
+
+Doe, J. (2020). A title. Journal, 1, 2.
+
+https://doi.org/10.1000/xyz123
+"""
+    readme = MarkdownDescription(content, None)
+
+    assert readme.title == "my-plugin"
+    assert readme.has_intro is True
+    assert readme.has_installation is True
+    assert readme.has_usage is True
+    assert readme.has_screenshots is True
+    assert readme.has_videos is True
+    assert [c.year for c in readme.extract_apa_citations()] == ["2020"]
+    assert readme.detect_doi_citations() == ["10.1000/xyz123"]
+    assert document.call_count == 1
+
+    # a same document read from another file is not parsed again
+    long_description = MarkdownDescription(f"<!-- badge -->{content}", None)
+    assert long_description.title == "my-plugin"
+    assert document.call_count == 1
+
+
 def test_python_version(resources):
     plugin = NapariPlugin(resources / "CZI-29-test")
 
@@ -819,3 +861,86 @@ def test_hatch_backend_support_nosrc(resources):
 
     assert npe2file
     assert npe2file.name == 'my-napari-plugin'
+
+
+def test_lazy_components(resources, mocker):
+    from napari_hub_cli.checklist.metadata import analyse_requirements
+    from napari_hub_cli.checklist.projectmetadata import project_metadata_suite
+
+    parse = mocker.spy(SetupPy, "parse")
+    plugin = NapariPlugin(resources / "CZI-29-test")
+    assert parse.call_count == 0
+    assert set(plugin.__dict__) == {"path", "url", "forced_gen"}
+
+    _, suite = project_metadata_suite
+    analyse_requirements(plugin, suite(plugin))
+
+    # the metadata checks never need pip, the linter or the workflows
+    for component in ("requirements", "linter", "gh_workflow_folder", "license"):
+        assert component not in plugin.__dict__
+    assert parse.call_count == 1
+    assert plugin.setup_py.is_valid is True
+    assert parse.call_count == 1
+
+
+def test_lazy_config_data(resources):
+    file = SetupCfg(resources / "setup.cfg")
+    assert "data" not in file.__dict__
+    assert file.is_valid is True
+    assert file.data != {}
+
+    file.data = {"metadata": {"name": "foo"}}
+    assert file.name == "foo"
+
+
+def test_preprocess_markdown(mocker):
+    from napari_hub_cli.fs import descriptions
+    from napari_hub_cli.fs.descriptions import preprocess_markdown
+
+    assert preprocess_markdown("a<!-- x -->b<!--\ny\n-->c") == ("abc", False)
+    # an unclosed comment is kept as it is
+    assert preprocess_markdown("a<!-- x -->b<!-- c") == ("ab<!-- c", False)
+
+    # a lot of unclosed comments is handled in linear time
+    text, truncated = preprocess_markdown("<!--\n" * 200_000)
+    assert len(text) == 1_000_000
+    assert truncated is False
+
+    payload = "A" * 1024
+    text, _ = preprocess_markdown(f"![logo](data:image/png;base64,{payload}=)")
+    assert text == "![logo](data:image/png;base64,)"
+
+    mocker.patch.object(descriptions, "MAX_LINE_LENGTH", 10)
+    mocker.patch.object(descriptions, "MAX_MARKDOWN_SIZE", 30)
+    assert preprocess_markdown("# title\n" + "x" * 20) == ("# title\n" + "x" * 10, True)
+    assert preprocess_markdown("# title\nabc\n" + "x\n" * 20) == (
+        "# title\nabc\n" + "x\n" * 8 + "x",
+        True,
+    )
+
+    readme = MarkdownDescription("# title\n" + "x" * 20, None)
+    assert readme.truncated is True
+    assert readme.title == "title"
+
+
+def test_truncated_description_reported_once(tmp_path, mocker, capsys):
+    import shutil
+
+    from napari_hub_cli.checklist.metadata import analyse_local_plugin, display_checklist
+    from napari_hub_cli.checklist.projectmetadata import project_metadata_suite
+    from napari_hub_cli.fs import descriptions
+
+    plugin = tmp_path / "plugin"
+    shutil.copytree(Path(__file__).parent / "resources" / "CZI-29-test", plugin)
+    mocker.patch.object(descriptions, "MAX_MARKDOWN_SIZE", 30)
+
+    result = analyse_local_plugin(plugin, project_metadata_suite)
+    # nothing is printed while the descriptions are read
+    assert "truncated" not in capsys.readouterr().out
+    # the README is read by several features and wrapped by several files
+    assert result.truncated_files == ["README.md"]
+    assert result.detached().truncated_files == result.truncated_files
+
+    display_checklist(result)
+    out = capsys.readouterr().out
+    assert out.count("is too big, it is truncated") == 1
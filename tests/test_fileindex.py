@@ -0,0 +1,121 @@
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from napari_hub_cli.fs import NapariPlugin, fileindex
+from napari_hub_cli.fs.archivefs import ArchiveFileSystem
+from napari_hub_cli.fs.fileindex import FileIndex, GitIgnore
+
+RESOURCE = Path(__file__).parent.absolute() / "resources" / "CZI-29-test"
+
+
+@pytest.fixture
+def repository(tmp_path):
+    files = [
+        "setup.cfg",
+        "src/plugin/__init__.py",
+        "src/plugin/widget.py",
+        "src/plugin/napari.yaml",
+        "src/plugin/generated.py",
+        "src/plugin/keep.log",
+        "src/plugin/debug.log",
+        ".github/workflows/test.yml",
+        ".github/workflows/nested/deploy.yml",
+        ".git/config",
+        "node_modules/pkg/index.py",
+        "build/lib/plugin/widget.py",
+        "docs/conf.py",
+        "env/pyvenv.cfg",
+        "env/lib/python3.11/os.py",
+        "notes/draft.py",
+    ]
+    for name in files:
+        path = tmp_path.joinpath(*name.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    (tmp_path / ".gitignore").write_text("# generated\n*.log\n!keep.log\n/notes/\n")
+    (tmp_path / "src" / "plugin" / ".gitignore").write_text("generated.py\n")
+    return tmp_path
+
+
+def test_gitignore():
+    gitignore = GitIgnore(["*.log", "!keep.log", "/build/", "doc/*.md", ""])
+
+    assert gitignore.ignores("debug.log", is_dir=False)
+    assert gitignore.ignores("src/debug.log", is_dir=False)
+    assert not gitignore.ignores("src/keep.log", is_dir=False)
+    assert gitignore.ignores("build", is_dir=True)
+    assert not gitignore.ignores("build", is_dir=False)
+    assert not gitignore.ignores("src/build", is_dir=True)
+    assert gitignore.ignores("doc/index.md", is_dir=False)
+
+    nested = GitIgnore(["*.py"], base="src")
+    assert nested.ignores("src/a.py", is_dir=False)
+    assert not nested.ignores("a.py", is_dir=False)
+
+
+def test_file_index(repository):
+    index = FileIndex(repository)
+
+    assert sorted(index.files) == [
+        ".github/workflows/nested/deploy.yml",
+        ".github/workflows/test.yml",
+        ".gitignore",
+        "setup.cfg",
+        "src/plugin/.gitignore",
+        "src/plugin/__init__.py",
+        "src/plugin/keep.log",
+        "src/plugin/napari.yaml",
+        "src/plugin/widget.py",
+    ]
+    assert index.is_dir(repository / "src" / "plugin")
+    assert not index.is_dir(repository / "node_modules")
+    assert not index.is_dir(repository / "setup.cfg")
+
+    python_files = [p.relative_to(repository) for p in index.glob("**/*.py")]
+    assert python_files == [
+        Path("src/plugin/__init__.py"),
+        Path("src/plugin/widget.py"),
+    ]
+    workflows = repository / ".github" / "workflows"
+    assert sorted(p.name for p in index.glob("**/*.yml", workflows)) == [
+        "deploy.yml",
+        "test.yml",
+    ]
+    assert [p.name for p in index.glob("*.yml", workflows)] == ["test.yml"]
+
+
+def test_file_index_walks_once(repository, mocker):
+    index = FileIndex(repository)
+    scandir = mocker.spy(fileindex.os, "scandir")
+
+    list(index.glob("**/*.py"))
+    list(index.glob("**/*.yml"))
+    index.is_dir(repository / "src")
+
+    # one scandir per walked directory (the virtualenv is listed, not walked)
+    assert scandir.call_count == 7
+
+
+def test_file_index_archive(tmp_path):
+    archive = tmp_path / "plugin-0.1.0.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(RESOURCE / "setup.cfg", arcname="plugin-0.1.0/setup.cfg")
+        tar.add(RESOURCE / "setup.py", arcname="plugin-0.1.0/docs/conf.py")
+        tar.add(RESOURCE / "setup.py", arcname="plugin-0.1.0/plugin/main.py")
+
+    with ArchiveFileSystem(archive) as fs:
+        index = FileIndex(fs.root)
+        assert sorted(index.files) == ["plugin/main.py", "setup.cfg"]
+        assert [p.path for p in index.glob("**/*.py")] == ["plugin/main.py"]
+        assert index.is_dir(fs.root / "plugin")
+
+
+def test_plugin_shares_index(repository):
+    plugin = NapariPlugin(repository)
+
+    assert plugin.linter.index is plugin.file_index
+    assert plugin.gh_workflow_folder.index is plugin.file_index
+    assert plugin.linter.number_py_files == 2
+    assert len(plugin.gh_workflow_folder.workflows) == 2
@@ -1,11 +1,18 @@
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 import requests
 import requests_mock as req
 
-from napari_hub_cli.fs.ghactions import GhActionWorkflow, GhActionWorkflowFolder
+from napari_hub_cli.fs import ghactions
+from napari_hub_cli.fs.ghactions import (
+    GhActionWorkflow,
+    GhActionWorkflowFolder,
+    compile_workflow,
+)
 
 
 @pytest.fixture(scope="module")
@@ -329,6 +336,45 @@ def test_infos_GHTests4(resources):
     assert ghw.defines_codecov_coverage is False
 
 
+def test_workflow_model(resources, tmp_path, mocker):
+    workflow = resources / "CZI-29-small" / ".github" / "workflows" / "test_main.yml"
+    model = GhActionWorkflow(workflow).model
+
+    assert [job.name for job in model.jobs] == ["download_data", "test_napari"]
+    test_job = model.jobs[1]
+    assert test_job.matrix_python_versions == ("3.7", "3.8", "3.9", "3.10")
+    assert test_job.steps[1].uses == "actions/setup-python@v4"
+    # the command of an action is found in its inputs
+    assert test_job.test_commands == ("tox",)
+    assert test_job.python_versions == ("${{ matrix.python }}",)
+    assert model.tested_python_versions == [(3, 7), (3, 8), (3, 9), (3, 10)]
+    assert model.codecov_actions == ("codecov/codecov-action@v1",)
+
+    # a same workflow in another repository is compiled once
+    copy = tmp_path / "test.yml"
+    copy.write_bytes(workflow.read_bytes())
+    compile_workflow.cache_clear()
+    safe_load = mocker.spy(ghactions.yaml, "safe_load")
+    assert GhActionWorkflow(copy).model == model
+    assert GhActionWorkflow(workflow).defines_test is True
+    assert safe_load.call_count == 1
+
+
+def test_workflow_model_broken(tmp_path):
+    workflow = tmp_path / "test.yml"
+    workflow.write_text("jobs: [unclosed")
+    assert GhActionWorkflow(workflow).model == ghactions.EMPTY_WORKFLOW
+    assert GhActionWorkflow(tmp_path / "missing.yml").defines_test is False
+
+    workflow.write_text(
+        "jobs:\n  test:\n    steps:\n      - run: pytest\n"
+        "        with:\n          python-version: pypy-3.9\n"
+    )
+    ghw = GhActionWorkflow(workflow)
+    assert ghw.defines_test is True
+    assert ghw.supported_python_version == []
+
+
 @pytest.mark.skipif(
     sys.platform.startswith("win"),
     reason="Issue with request mocks on POST for Windows",
@@ -449,6 +495,42 @@ def test_infos_GHWorkflowFolder_testresult(resources, fake_github_api):
     assert ghwd.has_successful_tests is True
 
 
+def test_prefetch_runs_once(resources, fake_github_api, requests_mock):
+    def slow_runs(request, context):
+        time.sleep(0.1)
+        return {
+            "workflow_runs": [
+                {
+                    "head_branch": "main",
+                    "path": ".github/workflows/test_main.yml",
+                    "status": "completed",
+                    "conclusion": "failed",
+                    "jobs_url": f"{BRAINREG2}/joburl",
+                }
+            ]
+        }
+
+    runs = requests_mock.get(f"{BRAINREG2}/actions/runs", json=slow_runs)
+    ghwd = GhActionWorkflowFolder(
+        resources / "CZI-29-small" / ".github" / "workflows",
+        url="https://github.com/brainglobe/brainreg-napari2",
+    )
+
+    fetches = ghwd.prefetch({"has_successful_tests", "details_failing_tests"})
+    assert len(fetches) == 1
+    # concurrent reads of the runs share a single request
+    config = ghwd.gh_test_config
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(fetches[0])]
+        futures += [executor.submit(ghwd._identify_EOI, config) for _ in range(3)]
+        for future in futures:
+            future.result()
+    assert runs.call_count == 1
+    assert ghwd.has_successful_tests is False
+    assert "ubuntu" in ghwd.details_failing_tests
+    assert runs.call_count == 1
+
+
 @pytest.mark.online
 @pytest.mark.skipif(
     sys.platform.startswith("win"),
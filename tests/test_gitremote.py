@@ -0,0 +1,91 @@
+import subprocess
+
+import pytest
+
+from napari_hub_cli.gitremote import (
+    advertised_head,
+    is_accessible,
+    iter_pkt_lines,
+    remote_head_sha,
+)
+
+SHA = "a" * 40
+OTHER_SHA = "b" * 40
+
+
+def pkt_line(payload):
+    return f"{len(payload) + 4:04x}".encode() + payload
+
+
+ADVERTISEMENT = (
+    pkt_line(b"# service=git-upload-pack\n")
+    + b"0000"
+    + pkt_line(f"{SHA} HEAD\0multi_ack symref=HEAD:refs/heads/main\n".encode())
+    + pkt_line(f"{SHA} refs/heads/main\n".encode())
+    + pkt_line(f"{OTHER_SHA} refs/tags/v1\n".encode())
+    + b"0000"
+)
+
+
+def test_iter_pkt_lines():
+    # the stream can be split anywhere
+    chunks = [ADVERTISEMENT[i : i + 7] for i in range(0, len(ADVERTISEMENT), 7)]
+    payloads = list(iter_pkt_lines(chunks))
+    assert len(payloads) == 4
+    assert payloads[0] == b"# service=git-upload-pack\n"
+
+    with pytest.raises(ValueError):
+        list(iter_pkt_lines([b"<!DOCTYPE html>"]))
+
+
+def test_advertised_head():
+    assert advertised_head([ADVERTISEMENT]) == SHA
+    # empty repository
+    empty = pkt_line(b"# service=git-upload-pack\n") + b"0000" + b"0000"
+    assert advertised_head([empty]) is None
+
+
+def test_remote_head_sha_smart_http(requests_mock):
+    url = "https://github.com/user/plugin"
+    requests_mock.get(f"{url}/info/refs?service=git-upload-pack", content=ADVERTISEMENT)
+    assert remote_head_sha(url) == SHA
+    assert remote_head_sha(f"{url}/") == SHA
+
+    requests_mock.get(f"{url}/info/refs", text="<!DOCTYPE html>")
+    assert remote_head_sha(url) is None
+
+    requests_mock.get(f"{url}/info/refs", status_code=404)
+    assert remote_head_sha(url) is None
+
+
+def test_remote_head_sha_local(tmp_path):
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@test.com"]
+    subprocess.run(git + ["init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(
+        git + ["commit", "-q", "--allow-empty", "-m", "init"], cwd=tmp_path, check=True
+    )
+    sha = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=tmp_path, capture_output=True, text=True
+    ).stdout.strip()
+
+    assert remote_head_sha(tmp_path.as_uri()) == sha
+    assert remote_head_sha((tmp_path / "unknown").as_uri()) is None
+
+
+def test_is_accessible(requests_mock):
+    requests_mock.head("https://github.com/user/plugin", status_code=200)
+    requests_mock.head("https://github.com/user/unknown", status_code=404)
+    assert is_accessible("https://github.com/user/plugin") is True
+    assert is_accessible("https://github.com/user/unknown") is False
+    assert is_accessible("git@github.com:user/plugin.git") is True
+
+    # the page is requested if the host does not answer HEAD requests
+    for status_code in (405, 403, 501):
+        requests_mock.head("https://gitlab.com/user/plugin", status_code=status_code)
+        requests_mock.get("https://gitlab.com/user/plugin", status_code=200)
+        assert is_accessible("https://gitlab.com/user/plugin") is True
+        requests_mock.get("https://gitlab.com/user/plugin", status_code=403)
+        assert is_accessible("https://gitlab.com/user/plugin") is False
+    assert not any(
+        r.method == "GET" and "unknown" in r.url for r in requests_mock.request_history
+    )
@@ -19,14 +19,6 @@ def test_real_repo():
     return NapariPlugin(current_path / "resources" / "licenses" / "repo_example1", url)
 
 
-@pytest.fixture(autouse=True)
-def clear_cache(test_real_repo):
-    license = test_real_repo.license
-    license.get_osi_approved_licenses.cache_clear()  # type: ignore
-    yield
-    license.get_osi_approved_licenses.cache_clear()  # type: ignore
-
-
 @pytest.mark.online
 def test_get_real_osi_licenses(test_real_repo):
     license = test_real_repo.license
@@ -181,7 +173,7 @@ def test_license(test_repo):
     assert license is not None
 
 
-@mock.patch("napari_hub_cli.fs.license.requests.get")
+@mock.patch("napari_hub_cli.reference.http_get")
 def test_get_osi_approved_licenses(mock_get, test_repo):
     mock_get.return_value.status_code = 200
     mock_get.return_value.json.return_value = [
@@ -189,11 +181,11 @@ def test_get_osi_approved_licenses(mock_get, test_repo):
         {"name": "GNU General Public License v3.0", "id": "GPL-3.0"},
     ]
     license = test_repo.license
-    assert license.get_osi_approved_licenses() == ["MIT", "GPL-3.0"]
+    assert license.get_osi_approved_licenses() == {"MIT", "GPL-3.0"}
     mock_get.assert_called_once_with("https://api.opensource.org/licenses/")
 
 
-@mock.patch("napari_hub_cli.fs.license.requests.get")
+@mock.patch("napari_hub_cli.fs.license.http_get")
 def test_get_github_license(mock_get, test_repo):
     license = test_repo.license
     mock_get.return_value.status_code = 200
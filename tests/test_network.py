@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from napari_hub_cli import network
+from napari_hub_cli.cache import PersistentCache
+from napari_hub_cli.network import (
+    DEFAULT_TIMEOUT,
+    HTTP_CACHE_SIZE_ENV,
+    HttpClient,
+    default_http_cache,
+    http_client,
+    http_get,
+)
+
+
+def test_default_timeout(requests_mock):
+    requests_mock.get("https://foo.org/bar", json={"a": 1})
+    response = http_get("https://foo.org/bar")
+    assert response.json() == {"a": 1}
+    assert requests_mock.last_request.timeout == DEFAULT_TIMEOUT
+
+    http_get("https://foo.org/bar", timeout=2)
+    assert requests_mock.last_request.timeout == 2
+
+
+def test_retries_configuration():
+    client = HttpClient(retries=5, max_per_host=4)
+    adapter = client.session.get_adapter("https://foo.org")
+    assert adapter.max_retries.total == 5
+    assert "POST" in adapter.max_retries.allowed_methods
+    assert 503 in adapter.max_retries.status_forcelist
+    assert adapter._pool_maxsize == 4
+
+
+def test_per_host_concurrency(requests_mock):
+    lock = threading.Lock()
+    running = {"current": 0, "max": 0}
+
+    def slow(request, context):
+        with lock:
+            running["current"] += 1
+            running["max"] = max(running["max"], running["current"])
+        time.sleep(0.05)
+        with lock:
+            running["current"] -= 1
+        return "ok"
+
+    requests_mock.get("https://slow.org/page", text=slow)
+    requests_mock.get("https://other.org/page", text="ok")
+    client = HttpClient(max_per_host=2)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(
+            executor.map(lambda _: client.get("https://slow.org/page").text, range(6))
+        )
+    assert results == ["ok"] * 6
+    assert running["max"] <= 2
+    assert client.get("https://other.org/page").text == "ok"
+
+
+def test_client_per_process(mocker):
+    client = http_client()
+    assert http_client() is client
+
+    mocker.patch.object(network.os, "getpid", return_value=os.getpid() + 1)
+    assert http_client() is not client
+
+
+def test_conditional_requests_cache(requests_mock, tmp_path):
+    url = "https://api.github.com/repos/foo/bar/license"
+    requests_mock.get(
+        url,
+        [
+            {"status_code": 200, "json": {"license": "MIT"}, "headers": {"ETag": '"v1"'}},
+            {"status_code": 304},
+            {
+                "status_code": 200,
+                "json": {"license": "BSD"},
+                "headers": {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+            },
+            {"status_code": 304},
+        ],
+    )
+    client = HttpClient(cache=PersistentCache("http", location=tmp_path))
+
+    assert client.get(url).json() == {"license": "MIT"}
+    assert "If-None-Match" not in requests_mock.last_request.headers
+
+    response = client.get(url)
+    assert requests_mock.last_request.headers["If-None-Match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.from_cache is True
+    assert response.json() == {"license": "MIT"}
+
+    # new content, the cache is updated
+    assert client.get(url).json() == {"license": "BSD"}
+    response = client.get(url)
+    assert (
+        requests_mock.last_request.headers["If-Modified-Since"]
+        == "Wed, 21 Oct 2015 07:28:00 GMT"
+    )
+    assert response.json() == {"license": "BSD"}
+
+    # responses are cached per credentials
+    requests_mock.get(url, json={"license": "GPL"})
+    response = client.get(url, headers={"Authorization": "token foo"})
+    assert "If-Modified-Since" not in requests_mock.last_request.headers
+    assert response.json() == {"license": "GPL"}
+
+
+def test_http_cache_configuration(monkeypatch):
+    monkeypatch.setenv(HTTP_CACHE_SIZE_ENV, "1024")
+    assert default_http_cache().max_size == 1024
+    monkeypatch.setenv(HTTP_CACHE_SIZE_ENV, "0")
+    assert default_http_cache() is None
@@ -3,7 +3,14 @@ from pathlib import Path
 
 import pytest
 
-from napari_hub_cli.fs.pythonlint import PythonFile, PythonSrcDir
+from napari_hub_cli.cache import CACHE_DIR_ENV
+from napari_hub_cli.fs import pythonlint
+from napari_hub_cli.fs.pythonlint import (
+    PythonFile,
+    PythonSrcDir,
+    extract_all_lint_facts,
+    extract_lint_facts,
+)
 
 
 @pytest.fixture(scope="module")
@@ -157,3 +164,116 @@ def test_pythonsrcdir_npe1_hook_list(resources):
         (srcdir.files[1].path, 30, "napari_hook_implementation(firstresult=True)"),
         (srcdir.files[2].path, 14, "npe"),
     ]
+
+
+@pytest.fixture
+def lint_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, f"{tmp_path / 'cache'}")
+    return tmp_path / "cache"
+
+
+def test_pythonfile_facts(resources):
+    srcfile = PythonFile(resources / "f2.py")
+
+    assert srcfile.facts == {
+        "imports": [["PyQt5", 3], ["PyQt5", 18], ["PyQt5", 19]],
+        "npe1_hooks": [[23, "nhi"]],
+    }
+    source = (resources / "f2.py").read_bytes()
+    assert extract_lint_facts("f2.py", source) == srcfile.facts
+    assert extract_lint_facts("f.py", b"\xff\xfe") == {"imports": [], "npe1_hooks": []}
+
+
+def test_pythonsrcdir_facts_cache(resources, lint_cache_dir, mocker):
+    parse = mocker.spy(pythonlint, "extract_all_lint_facts")
+
+    srcdir = PythonSrcDir(resources, exclude_test_folders=False)
+    expected = srcdir.npe1_hook_list
+    assert len(parse.call_args.args[0]) == 3
+
+    # the facts are read from the cache, nothing is parsed again
+    srcdir = PythonSrcDir(resources, exclude_test_folders=False)
+    assert srcdir.npe1_hook_list == expected
+    assert len(srcdir.forbidden_imports_list) == 6
+    assert parse.call_args.args[0] == []
+    assert srcdir.facts[0]["imports"]
+
+
+def test_pythonsrcdir_facts_same_content(tmp_path, lint_cache_dir, mocker):
+    parse = mocker.spy(pythonlint, "extract_all_lint_facts")
+    for i in range(3):
+        (tmp_path / f"f{i}.py").write_text("import PyQt5\n")
+
+    srcdir = PythonSrcDir(tmp_path)
+
+    assert len(srcdir.forbidden_imports_list) == 3
+    # files with a same content are parsed once
+    assert len(parse.call_args.args[0]) == 1
+
+
+def test_extract_all_lint_facts_process_pool(resources, monkeypatch):
+    monkeypatch.setattr(pythonlint, "PARALLEL_PARSE_THRESHOLD", 2)
+    sources = [
+        (f"{path}", path.read_bytes())
+        for path in (resources / "f1.py", resources / "f2.py")
+    ]
+
+    facts = extract_all_lint_facts(sources, workers=2)
+
+    assert facts == [extract_lint_facts(*source) for source in sources]
+
+
+def test_pythonfile_fact_table():
+    source = b"""\
+import napari_plugin_engine as npe
+from PyQt5 import QtCore
+
+
+class Widget:
+    @npe.napari_hook_implementation(tryfirst=True)
+    def hook(self):
+        import PySide2
+"""
+    srcfile = PythonFile(Path("plugin.py"), source=source)
+
+    table = srcfile.fact_table
+    assert table.imports == [
+        (None, ["napari_plugin_engine"], "npe", 1),
+        ("PyQt5", ["PyQt5", "QtCore"], "QtCore", 2),
+        (None, ["PySide2"], "PySide2", 8),
+    ]
+    assert table.functions == [
+        (7, ["npe.napari_hook_implementation(tryfirst=True)"], [["npe"]])
+    ]
+    assert srcfile.check_pyqt == [("PyQt5", srcfile.path, 2)]
+    assert srcfile.check_pyside == [("PySide2", srcfile.path, 8)]
+    assert srcfile.npe1_from_as_hook_check == [(srcfile.path, 7, "npe")]
+
+
+def test_read_if_triggered(tmp_path, monkeypatch):
+    small = tmp_path / "small.py"
+    small.write_bytes(b"import numpy\n")
+    assert pythonlint.read_if_triggered(small) is None
+    small.write_bytes(b"from PySide6 import QtCore\n")
+    assert pythonlint.read_if_triggered(small) == b"from PySide6 import QtCore\n"
+
+    big = tmp_path / "big.py"
+    big.write_bytes(b"x = 1\n" * pythonlint.MMAP_THRESHOLD)
+    assert pythonlint.read_if_triggered(big) is None
+    big.write_bytes(big.read_bytes() + b"import napari_plugin_engine\n")
+    assert pythonlint.read_if_triggered(big).endswith(b"napari_plugin_engine\n")
+
+
+def test_pythonsrcdir_prefilter(tmp_path, lint_cache_dir, mocker):
+    parse = mocker.spy(pythonlint, "extract_all_lint_facts")
+    (tmp_path / "widget.py").write_text("from PyQt5 import QtCore\n")
+    for i in range(5):
+        (tmp_path / f"f{i}.py").write_text(f"x = {i}\n")
+
+    srcdir = PythonSrcDir(tmp_path)
+
+    assert srcdir.forbidden_imports_list == [("PyQt5", tmp_path / "widget.py", 1)]
+    assert srcdir.npe1_hook_list == []
+    assert srcdir.number_py_files == 6
+    # only the file mentioning a trigger token is parsed
+    assert len(parse.call_args.args[0]) == 1
@@ -0,0 +1,122 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+
+from napari_hub_cli.constants import NAPARI_HUB_API_URL, NPE2_ERRORS_URL, OSI_LICENSES_URL
+from napari_hub_cli.reference import (
+    SNAPSHOT_ENV,
+    SNAPSHOT_MAX_AGE_ENV,
+    HubIndexUnavailableError,
+    ReferenceData,
+    reference_data,
+    reset_reference_data,
+    save_snapshot,
+    snapshot_age,
+)
+from napari_hub_cli.utils import get_all_napari_plugin_names
+
+
+def mock_reference_urls(requests_mock):
+    requests_mock.get(NPE2_ERRORS_URL, json={"foo": {"error": "bad manifest"}})
+    requests_mock.get(
+        OSI_LICENSES_URL,
+        json=[{"id": "MIT"}, {"id": "BSD-3", "identifiers": [{"identifier": "BSD"}]}],
+    )
+    requests_mock.get(
+        f"{NAPARI_HUB_API_URL}/index/all",
+        json=[
+            {"name": "bar", "visibility": "public"},
+            {"name": "baz", "visibility": "hidden"},
+        ],
+    )
+
+
+def test_fetch_once(requests_mock):
+    mock_reference_urls(requests_mock)
+    reference = ReferenceData()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: reference.osi_licenses, range(16)))
+    assert all(r == {"MIT", "BSD-3", "BSD"} for r in results)
+    assert "foo" in reference.npe2_errors
+    assert "foo" in reference.npe2_errors
+    assert set(reference.hub_index()) == {"bar", "baz"}
+    assert requests_mock.call_count == 3
+
+
+def test_failed_fetch_not_kept(requests_mock):
+    requests_mock.get(NPE2_ERRORS_URL, status_code=500)
+    reference = ReferenceData()
+    assert reference.npe2_errors == {}
+
+    requests_mock.get(NPE2_ERRORS_URL, json={"foo": {}})
+    assert "foo" in reference.npe2_errors
+
+
+def test_failed_hub_index_raises(requests_mock):
+    requests_mock.get(NPE2_ERRORS_URL, status_code=500)
+    requests_mock.get(OSI_LICENSES_URL, status_code=500)
+    requests_mock.get(f"{NAPARI_HUB_API_URL}/index/all", status_code=500)
+    reference = ReferenceData()
+    assert reference.npe2_errors == {}
+    assert reference.osi_licenses == frozenset()
+    with pytest.raises(HubIndexUnavailableError):
+        reference.hub_index()
+    with pytest.raises(HubIndexUnavailableError):
+        get_all_napari_plugin_names()
+
+
+def test_snapshot(requests_mock, tmp_path, monkeypatch):
+    mock_reference_urls(requests_mock)
+    path = save_snapshot(tmp_path / "reference.json")
+    snapshot = json.loads(path.read_text())
+    assert "date" in snapshot
+    assert snapshot["osi_licenses"] == ["MIT", "BSD-3", "BSD"]
+
+    # the snapshot replaces the remote datasets
+    requests_mock.reset_mock()
+    monkeypatch.setenv(SNAPSHOT_ENV, f"{path}")
+    reset_reference_data()
+    assert reference_data().npe2_errors == {"foo": {"error": "bad manifest"}}
+    assert get_all_napari_plugin_names() == ["bar"]
+    assert requests_mock.call_count == 0
+
+
+def test_stale_snapshot(tmp_path, monkeypatch, capsys):
+    assert snapshot_age({"date": "2024-01-01"}, today=date(2024, 1, 11)) == 10
+    assert snapshot_age({}) is None
+
+    path = tmp_path / "reference.json"
+    monkeypatch.setenv(SNAPSHOT_ENV, f"{path}")
+    fresh = (date.today() - timedelta(days=2)).isoformat()
+    path.write_text(json.dumps({"date": fresh, "npe2_errors": {}}))
+    reference_data()
+    assert "WARNING" not in capsys.readouterr().out
+
+    stale = (date.today() - timedelta(days=30)).isoformat()
+    path.write_text(json.dumps({"date": stale, "npe2_errors": {}}))
+    reset_reference_data()
+    reference_data()
+    assert "30 days old" in " ".join(capsys.readouterr().out.split())
+
+    monkeypatch.setenv(SNAPSHOT_MAX_AGE_ENV, "60")
+    reset_reference_data()
+    reference_data()
+    assert "WARNING" not in capsys.readouterr().out
+
+
+def test_snapshot_reference_command(requests_mock, tmp_path):
+    from napari_hub_cli.cli import parse_args
+
+    mock_reference_urls(requests_mock)
+    args = parse_args(["snapshot-reference", f"{tmp_path / 'reference.json'}"])
+    assert args.func(output=args.output) == 0
+    snapshot = json.loads((tmp_path / "reference.json").read_text())
+    assert snapshot_age(snapshot) == 0
+
+    requests_mock.get(f"{NAPARI_HUB_API_URL}/index/all", status_code=500)
+    reset_reference_data()
+    assert args.func(output=f"{tmp_path / 'other.json'}") == 5
+    assert not (tmp_path / "other.json").exists()
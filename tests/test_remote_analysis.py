@@ -1,14 +1,26 @@
+import io
+import pickle
+import shutil
+import subprocess
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
+import requests
 import requests_mock
 
 from napari_hub_cli.checklist.analysis import (
     DEFAULT_SUITE,
+    FetchMode,
     analyse_remote_plugin,
+    analyse_remote_plugin_url,
     analyze_remote_plugins,
     build_csv_dict,
+    clone_repository,
     display_remote_analysis,
+    probe_remote_plugins,
+    sparse_patterns,
     write_csv,
 )
 from napari_hub_cli.checklist.metadata import (
@@ -16,7 +28,11 @@ from napari_hub_cli.checklist.metadata import (
     PluginAnalysisResult,
     analyse_local_plugin,
 )
-from napari_hub_cli.constants import NAPARI_HUB_API_URL
+from napari_hub_cli.checklist.projectmetadata import project_metadata_suite
+from napari_hub_cli.checklist.projectquality import project_quality_suite
+from napari_hub_cli.constants import NAPARI_HUB_API_URL, NPE2_ERRORS_URL, OSI_LICENSES_URL
+from napari_hub_cli.fs import NapariPlugin
+from napari_hub_cli.reference import HubIndexUnavailableError
 from napari_hub_cli.utils import (
     NonExistingNapariPluginError,
     closest_plugin_name,
@@ -26,6 +42,12 @@ from napari_hub_cli.utils import (
 _, DEFAULT_SUITE = DEFAULT_SUITE
 
 
+def mock_repository(mock, url="http://my_repo_url", status_code=200):
+    # the repository page is answering but it is not a git repository
+    mock.get(f"{url}/info/refs", status_code=404)
+    mock.head(url, status_code=status_code)
+
+
 @pytest.fixture
 def napari_hub(requests_mock):
     requests_mock.get(
@@ -111,10 +133,7 @@ def test_analyse_remote_plugin_bad_url(napari_hub):
         f"{NAPARI_HUB_API_URL}/avidaq",
         json={"code_repository": "http://my_repo_url"},
     )
-    napari_hub.get(
-        "http://my_repo_url",
-        json={},
-    )
+    mock_repository(napari_hub)
     results = analyse_remote_plugin("avidaq", display_info=False)
 
     assert results.status is AnalysisStatus.BAD_URL
@@ -125,7 +144,7 @@ def test_analyse_remote_plugin_unaccessible(napari_hub):
         f"{NAPARI_HUB_API_URL}/avidaq",
         json={"code_repository": "http://my_repo_url"},
     )
-    napari_hub.get("http://my_repo_url", json={}, status_code=404)
+    mock_repository(napari_hub, status_code=404)
     results = analyse_remote_plugin("avidaq", display_info=False)
 
     assert results.status is AnalysisStatus.UNACCESSIBLE_REPOSITORY
@@ -137,7 +156,7 @@ def test_display_remote_analysis(napari_hub):
         f"{NAPARI_HUB_API_URL}/avidaq",
         json={"code_repository": "http://my_repo_url"},
     )
-    napari_hub.get("http://my_repo_url", json={}, status_code=404)
+    mock_repository(napari_hub, status_code=404)
     results = display_remote_analysis("avidaq")
 
     assert results is False
@@ -157,10 +176,7 @@ def test_analyze_all_remote_plugins(napari_hub):
         f"{NAPARI_HUB_API_URL}/napari-curtain",
         json={"code_repository": "http://my_repo_url"},
     )
-    napari_hub.get(
-        "http://my_repo_url",
-        json={},
-    )
+    mock_repository(napari_hub)
     results = analyze_remote_plugins(all_plugins=True)
 
     assert list(results.keys()) == ["avidaq", "mikro-napari", "napari-curtain"]
@@ -178,6 +194,97 @@ def test_analyze_all_remote_plugins(napari_hub):
     assert list(results.keys()) == []
 
 
+def test_analyze_all_remote_plugins_unavailable_index(requests_mock):
+    requests_mock.get(f"{NAPARI_HUB_API_URL}/index/all", status_code=503)
+
+    with pytest.raises(HubIndexUnavailableError):
+        analyze_remote_plugins(all_plugins=True)
+    with pytest.raises(HubIndexUnavailableError):
+        analyze_remote_plugins(all_plugins=True, jobs=2)
+
+
+# integration test
+def test_analyze_remote_plugins_jobs(napari_hub, mocker):
+    # workers are threads here so the requests mock is shared
+    mocker.patch(
+        "napari_hub_cli.checklist.analysis.ProcessPoolExecutor", ThreadPoolExecutor
+    )
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/avidaq",
+        json={"code_repository": "http://my_repo_url"},
+    )
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/mikro-napari",
+        json={"code_repository": ""},
+    )
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/napari-curtain",
+        json={"code_repository": "http://my_repo_url"},
+    )
+    mock_repository(napari_hub, status_code=404)
+    # reference datasets snapshotted before the workers are started
+    napari_hub.get(NPE2_ERRORS_URL, json={})
+    napari_hub.get(OSI_LICENSES_URL, json=[])
+
+    results = analyze_remote_plugins(all_plugins=True, jobs=2, display_info=True)
+
+    assert list(results.keys()) == ["avidaq", "mikro-napari", "napari-curtain"]
+    assert results["avidaq"].status is AnalysisStatus.UNACCESSIBLE_REPOSITORY
+    assert results["mikro-napari"].status is AnalysisStatus.MISSING_URL
+    assert results["napari-curtain"].status is AnalysisStatus.UNACCESSIBLE_REPOSITORY
+
+
+def test_analyze_remote_plugins_jobs_failure(napari_hub, mocker):
+    mocker.patch(
+        "napari_hub_cli.checklist.analysis.ProcessPoolExecutor", ThreadPoolExecutor
+    )
+    napari_hub.get(NPE2_ERRORS_URL, json={})
+    napari_hub.get(OSI_LICENSES_URL, json=[])
+    mocker.patch(
+        "napari_hub_cli.checklist.analysis.probe_remote_plugins",
+        return_value={"avidaq": ("http://my_repo_url", None)},
+    )
+
+    def analyse(plugin_name, requirements_suite, **kwargs):
+        if plugin_name == "avidaq":
+            raise SyntaxError("bad setup.py")
+        return PluginAnalysisResult.with_status(
+            AnalysisStatus.MISSING_URL, title=requirements_suite[0]
+        )
+
+    mocker.patch(
+        "napari_hub_cli.checklist.analysis.analyse_remote_plugin", side_effect=analyse
+    )
+
+    # the failure of a plugin does not stop the analysis of the others
+    results = analyze_remote_plugins(all_plugins=True, jobs=2, display_info=True)
+
+    assert list(results.keys()) == ["avidaq", "mikro-napari", "napari-curtain"]
+    assert results["avidaq"].status is AnalysisStatus.ANALYSIS_FAILED
+    assert results["avidaq"].url == "http://my_repo_url"
+    assert "bad setup.py" in results["avidaq"].error
+    assert results["mikro-napari"].status is AnalysisStatus.MISSING_URL
+    assert build_csv_dict(results)[0]["Analysis Status"] == "ANALYSIS_FAILED"
+
+
+def test_detached_result():
+    current_path = Path(__file__).parent.absolute()
+    checklist = analyse_local_plugin(
+        current_path / "resources/CZI-29-test", DEFAULT_SUITE
+    )
+    detached = pickle.loads(pickle.dumps(checklist.detached()))
+
+    assert detached.repository is None
+    assert detached.status is checklist.status
+    assert [f.found for f in detached.features] == [
+        f.found for f in checklist.features
+    ]
+    assert all(f.found_in is None for f in detached.features)
+    assert build_csv_dict({"CZI-29-test": detached}) == build_csv_dict(
+        {"CZI-29-test": checklist}
+    )
+
+
 def test_build_csv_empty():
     assert build_csv_dict({}) == []
     assert build_csv_dict(None) == []
@@ -219,10 +326,7 @@ def test_analysis_local_directory(napari_hub, tmp_path):
         f"{NAPARI_HUB_API_URL}/avidaq",
         json={"code_repository": "http://my_repo_url"},
     )
-    napari_hub.get(
-        "http://my_repo_url",
-        json={},
-    )
+    mock_repository(napari_hub)
 
     p = tmp_path / "inside"
     p.mkdir()
@@ -270,3 +374,197 @@ def test_analyse_remote_plugin__online(name, status):
     results = analyse_remote_plugin(name, display_info=False)
 
     assert results.status is status
+
+
+@pytest.fixture
+def plugin_git_repo(tmp_path):
+    current_path = Path(__file__).parent.absolute()
+    repo = tmp_path / "remote"
+    shutil.copytree(current_path / "resources/CZI-29-test", repo)
+    (repo / "data").mkdir()
+    (repo / "data" / "sample.tif").write_bytes(b"0" * 1024)
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@test.com"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "-A"], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=repo, check=True)
+    return repo.as_uri()
+
+
+def test_sparse_patterns():
+    metadata_patterns = sparse_patterns(project_metadata_suite)
+    quality_patterns = sparse_patterns(project_quality_suite)
+    assert "/setup.cfg" in metadata_patterns
+    # only the modules read by the "attr:" directives are fetched for the metadata
+    assert "*.py" not in metadata_patterns
+    assert "*.py" in quality_patterns
+
+
+def test_clone_repository_sparse(plugin_git_repo, tmp_path):
+    clone_repository(
+        plugin_git_repo, tmp_path / "full", sparse_patterns(project_quality_suite)
+    )
+    files = {
+        f"{f.relative_to(tmp_path / 'full')}"
+        for f in (tmp_path / "full").rglob("*")
+        if ".git" not in f.parts and f.is_file()
+    }
+    assert "setup.cfg" in files
+    assert "README.md" in files
+    assert ".napari-hub/DESCRIPTION.md" in files
+    assert "plugin_napari/napari.yaml" in files
+    assert "data/sample.tif" not in files
+    assert "drawing.png" not in files
+
+
+def test_analyse_remote_plugin_url_fetch_modes(plugin_git_repo, tmp_path):
+    results = [
+        analyse_remote_plugin_url(
+            "CZI-29-test",
+            plugin_git_repo,
+            directory=tmp_path / mode.value,
+            fetch_mode=mode,
+        )
+        for mode in (FetchMode.FULL, FetchMode.SPARSE)
+    ]
+
+    full, sparse = (
+        [(f.meta.attribute, f.result) for f in r.detached().features] for r in results
+    )
+    assert results[0].status is AnalysisStatus.SUCCESS
+    assert results[0].head_sha is not None
+    assert results[0].head_sha == results[1].head_sha
+    assert full == sparse
+
+
+def test_probe_remote_plugins(napari_hub):
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/avidaq",
+        json={"code_repository": "http://my_repo_url"},
+    )
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/mikro-napari",
+        json={"code_repository": ""},
+    )
+    napari_hub.get(
+        "http://my_repo_url/info/refs?service=git-upload-pack",
+        content=b"001e# service=git-upload-pack\n0000"
+        + b"0032" + b"a" * 40 + b" HEAD\n0000",
+    )
+
+    napari_hub.get(
+        f"{NAPARI_HUB_API_URL}/napari-curtain",
+        exc=requests.exceptions.ConnectionError,
+    )
+
+    # a plugin that cannot be probed does not stop the probing of the others
+    remotes = probe_remote_plugins(["avidaq", "mikro-napari", "napari-curtain"])
+
+    assert remotes == {
+        "avidaq": ("http://my_repo_url", "a" * 40),
+        "mikro-napari": ("", None),
+    }
+
+
+ATTR_SETUP_CFG = """\
+[metadata]
+name = napari-foo
+version = attr: napari_foo.__version__
+description = A foo plugin
+long_description = file: docs/description.md
+long_description_content_type = text/markdown
+author = Jane Doe
+license = BSD-3-Clause
+project_urls =
+    Bug Tracker = https://github.com/user/napari-foo/issues
+    Source Code = https://github.com/user/napari-foo
+
+[options]
+packages = find:
+install_requires =
+    numpy
+"""
+
+
+@pytest.fixture
+def attr_plugin(tmp_path):
+    plugin = tmp_path / "napari-foo"
+    (plugin / "napari_foo").mkdir(parents=True)
+    (plugin / "docs").mkdir()
+    (plugin / "setup.cfg").write_text(ATTR_SETUP_CFG)
+    (plugin / "napari_foo" / "__init__.py").write_text('__version__ = "0.1.0"\n')
+    (plugin / "napari_foo" / "widget.py").write_text("not read")
+    (plugin / "docs" / "description.md").write_text("# napari-foo\n\nA plugin\n")
+    (plugin / "docs" / "conf.txt").write_text("not read")
+    return plugin
+
+
+def test_referenced_files(attr_plugin):
+    assert NapariPlugin(attr_plugin).referenced_files == [
+        "docs/description.md",
+        "napari_foo.py",
+        "napari_foo/__init__.py",
+    ]
+
+    (attr_plugin / "setup.cfg").unlink()
+    (attr_plugin / "pyproject.toml").write_text(
+        """\
+[tool.setuptools.package-dir]
+"" = "src"
+
+[tool.setuptools.dynamic]
+version = {attr = "napari_foo._version.__version__"}
+readme = {file = ["README.md", "../outside.md"]}
+"""
+    )
+    assert NapariPlugin(attr_plugin).referenced_files == [
+        "README.md",
+        "src/napari_foo/_version.py",
+        "src/napari_foo/_version/__init__.py",
+        "src/napari_foo/__init__.py",
+    ]
+
+
+def test_fetch_modes_resolve_setup_cfg_directives(attr_plugin, tmp_path, mocker):
+    from napari_hub_cli.archive import ARCHIVE_URL
+
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@test.com"]
+    subprocess.run(git + ["init", "-q"], cwd=attr_plugin, check=True)
+    subprocess.run(git + ["add", "-A"], cwd=attr_plugin, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=attr_plugin, check=True)
+    content = io.BytesIO()
+    with tarfile.open(fileobj=content, mode="w:gz") as tar:
+        for path in sorted(attr_plugin.rglob("*")):
+            if ".git" not in path.parts:
+                arcname = f"napari-foo-HEAD/{path.relative_to(attr_plugin)}"
+                tar.add(path, arcname=arcname, recursive=False)
+    github_url = "https://github.com/user/napari-foo"
+
+    def summary(result):
+        return [(f.meta.attribute, f.result) for f in result.detached().features]
+
+    expected = analyse_local_plugin(attr_plugin, project_metadata_suite)
+    assert NapariPlugin(attr_plugin).setup_cfg.is_valid
+    with requests_mock.Mocker() as mock:
+        archive_url = ARCHIVE_URL.format(owner="user", name="napari-foo", ref="HEAD")
+        mock.get(archive_url, content=content.getvalue())
+        for mode in FetchMode:
+            url = github_url if mode is FetchMode.ARCHIVE else attr_plugin.as_uri()
+            for directory in (tmp_path / mode.value, None):
+                result = analyse_remote_plugin_url(
+                    "napari-foo",
+                    url,
+                    directory=directory,
+                    cleanup=directory is None,
+                    fetch_mode=mode,
+                )
+                assert result.status is AnalysisStatus.SUCCESS
+                assert summary(result) == summary(expected), (mode, directory)
+            checkout = tmp_path / mode.value / "napari-foo"
+            assert (checkout / "napari_foo" / "__init__.py").exists()
+            assert (checkout / "docs" / "description.md").exists()
+            assert (checkout / "docs" / "conf.txt").exists() is (mode is FetchMode.FULL)
+            assert (checkout / "napari_foo" / "widget.py").exists() is (
+                mode is FetchMode.FULL
+            )
+        # the description is extracted from the same download
+        assert mock.call_count == 2
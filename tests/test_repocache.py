@@ -0,0 +1,148 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pytest
+
+from napari_hub_cli.repocache import (
+    REPOSITORY_CACHE_SIZE_ENV,
+    RepositoryCache,
+    file_lock,
+    local_head_sha,
+    repository_cache,
+)
+
+GIT = ["git", "-c", "user.name=test", "-c", "user.email=test@test.com"]
+
+
+def commit(repo, files):
+    for name, content in files.items():
+        (repo / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo / name).write_text(content)
+    subprocess.run(GIT + ["add", "-A"], cwd=repo, check=True)
+    subprocess.run(GIT + ["commit", "-q", "-m", "update"], cwd=repo, check=True)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    repo = tmp_path / "remote"
+    repo.mkdir()
+    subprocess.run(GIT + ["init", "-q"], cwd=repo, check=True)
+    commit(repo, {"setup.cfg": "v1", "data/sample.bin": "0" * 1024})
+    return repo
+
+
+def test_checkout_updates_existing_clone(remote, tmp_path):
+    cache = RepositoryCache(location=tmp_path / "cache")
+
+    with cache.checkout(remote.as_uri(), name="plugin") as path:
+        assert path.name == "plugin"
+        assert (path / "setup.cfg").read_text() == "v1"
+        (path / "setup.cfg").write_text("modified")
+        (path / "untracked.txt").write_text("untracked")
+
+    commit(remote, {"setup.cfg": "v2"})
+    with cache.checkout(remote.as_uri(), name="plugin") as updated_path:
+        assert updated_path == path
+        assert (path / "setup.cfg").read_text() == "v2"
+        assert not (path / "untracked.txt").exists()
+
+    # sparse clones are different entries
+    with cache.checkout(remote.as_uri(), patterns=["/setup.cfg"]) as sparse_path:
+        assert sparse_path != path
+        assert (sparse_path / "setup.cfg").exists()
+        assert not (sparse_path / "data").exists()
+    assert len(cache.entries()) == 2
+
+
+def test_checkout_bad_url(tmp_path):
+    cache = RepositoryCache(location=tmp_path / "cache")
+    with cache.checkout((tmp_path / "unknown").as_uri()) as path:
+        assert path is None
+    assert cache.entries() == {}
+
+
+def test_checkout_eviction(remote, tmp_path):
+    cache = RepositoryCache(location=tmp_path / "cache")
+    other = tmp_path / "other"
+    other.mkdir()
+    subprocess.run(GIT + ["init", "-q"], cwd=other, check=True)
+    commit(other, {"setup.cfg": "other"})
+
+    with cache.checkout(remote.as_uri()):
+        ...
+    with cache.checkout(other.as_uri()) as other_path:
+        ...
+    entries = cache.entries()
+    assert len(entries) == 2
+
+    # only the most recently used repository fits in the cache
+    cache.max_size = max(info["size"] for info in entries.values())
+    cache.evict()
+    assert [info["url"] for info in cache.entries().values()] == [other.as_uri()]
+    assert other_path.exists()
+
+
+def test_checkout_concurrent(remote, tmp_path):
+    cache = RepositoryCache(location=tmp_path / "cache")
+
+    def read_setup(_):
+        with cache.checkout(remote.as_uri()) as path:
+            return (path / "setup.cfg").read_text()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(read_setup, range(8))) == ["v1"] * 8
+    assert len(cache.entries()) == 1
+
+
+def test_checkout_without_lock(remote, tmp_path, mocker):
+    cache = RepositoryCache(location=tmp_path / "cache")
+    with cache.checkout(remote.as_uri()) as path:
+        ...
+    commit(remote, {"setup.cfg": "v2"})
+
+    # the shared entry is left untouched if it cannot be locked
+    mocker.patch.object(
+        RepositoryCache, "_entry_lock", side_effect=lambda *args: nullcontext(False)
+    )
+    with cache.checkout(remote.as_uri()) as private_path:
+        assert private_path != path
+        assert (private_path / "setup.cfg").read_text() == "v2"
+    assert not private_path.exists()
+    assert (path / "setup.cfg").read_text() == "v1"
+
+    with cache.checkout((tmp_path / "unknown").as_uri()) as private_path:
+        assert private_path is None
+
+
+def test_file_lock(tmp_path):
+    with file_lock(tmp_path / "entry.lock") as locked:
+        assert locked
+        with file_lock(tmp_path / "entry.lock", blocking=False) as other:
+            assert not other
+    with file_lock(tmp_path / "entry.lock", blocking=False) as locked:
+        assert locked
+
+
+def test_repository_cache_configuration(monkeypatch):
+    monkeypatch.setenv(REPOSITORY_CACHE_SIZE_ENV, "0")
+    assert repository_cache() is None
+    monkeypatch.setenv(REPOSITORY_CACHE_SIZE_ENV, "1024")
+    assert repository_cache().max_size == 1024
+
+
+def test_checkout_known_head(remote, tmp_path, mocker):
+    cache = RepositoryCache(location=tmp_path / "cache")
+    with cache.checkout(remote.as_uri()) as path:
+        head = local_head_sha(path)
+    assert cache.entries()[path.parent.name]["head"] == head
+
+    # the clone is at the remote HEAD, nothing is fetched
+    update = mocker.patch("napari_hub_cli.repocache.update_repository")
+    with cache.checkout(remote.as_uri(), head_sha=head):
+        ...
+    update.assert_not_called()
+
+    with cache.checkout(remote.as_uri(), head_sha="0" * 40):
+        ...
+    update.assert_called_once()
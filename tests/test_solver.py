@@ -1,3 +1,9 @@
+import gc
+import io
+import tarfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
@@ -5,8 +11,23 @@ import pytest
 from napari_hub_cli.dependencies_solver.checker import (
     NO_DEPENDENCIES,
     InstallationRequirements,
+    normalize_requirement,
+)
+from pip._internal.index.collector import LinkCollector
+from pip._internal.operations.prepare import RequirementPreparer
+
+from napari_hub_cli.dependencies_solver import mirror
+from napari_hub_cli.dependencies_solver.solver import (
+    DependencySolver,
+    SharedResolutionState,
+    read_sdist_metadata,
+)
+from napari_hub_cli.dependencies_solver.utils import (
+    DEFAULT_INDEX_URL,
+    FAST_METADATA_ENV,
+    INDEX_URL_ENV,
+    build_options,
 )
-from napari_hub_cli.dependencies_solver.solver import DependencySolver
 from napari_hub_cli.fs import NapariPlugin
 
 
@@ -293,3 +314,416 @@ def test_solver_messages():
     reqs.solver = FakeRaiseException(Exception)
     reqs.solve_dependencies(FakeOption(tuple(),  ["linux"]))
     assert reqs.installation_issues == "No information"
+
+
+class FakeLink(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.is_wheel = filename.endswith(".whl")
+        self.url = f"https://files/{filename}"
+
+
+class FakeCandidate(object):
+    def __init__(self, version, filename):
+        self.version = version
+        self.source_link = FakeLink(filename)
+
+
+class FakeResult(object):
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+
+class FakeSolver(object):
+    def __init__(self, result):
+        self.calls = 0
+        self.result = result
+        self.lock = threading.Lock()
+
+    def solve_dependencies(self, *args, **kwargs):
+        with self.lock:
+            self.calls += 1
+        return self.result
+
+
+def test_resolution_persistent_cache():
+    solver = FakeSolver(
+        FakeResult(
+            {
+                "numpy": FakeCandidate("1.25.0", "numpy-1.25.0-cp39-cp39-win_amd64.whl"),
+                "foo": FakeCandidate("0.1", "foo-0.1.tar.gz"),
+            }
+        )
+    )
+    reqs = InstallationRequirements(
+        path=None, requirements=["numpy", "foo >= 0.1"], platforms=["win"]
+    )
+    reqs.solver = solver
+    options = reqs.options_list[0]
+
+    installable, all_wheel, c_exts, installed = reqs.analysis_package(options)
+    # the first access analyses all the options of the matrix
+    reqs._analyse_with_all_options()
+    assert solver.calls == len(reqs.options_list)
+    assert installable is True
+    assert all_wheel is False
+    assert c_exts == ["numpy", "foo"]
+    assert installed == [("numpy", "1.25.0"), ("foo", "0.1")]
+
+    # same normalized requirements (PEP 503 names), the resolution comes from the cache
+    reqs = InstallationRequirements(
+        path=None, requirements=["FOO>=0.1", "NumPy"], platforms=["win"]
+    )
+    reqs.solver = FakeRaiseException(Exception("Should not be called"))
+
+    assert reqs.analysis_package(reqs.options_list[0]) == (
+        installable,
+        all_wheel,
+        c_exts,
+        installed,
+    )
+    assert reqs.had_no_unknown_error is True
+
+    # the metadata-only resolutions are different entries
+    reqs = InstallationRequirements(
+        path=None,
+        requirements=["foo>=0.1", "numpy"],
+        platforms=["win"],
+        fast_metadata=True,
+    )
+    reqs.solver = FakeRaiseException(Exception("Not in the cache"))
+    assert reqs.is_installable(reqs.options_list[0]) is False
+    assert reqs.had_no_unknown_error is False
+
+
+def test_normalize_requirement():
+    assert normalize_requirement("Napari_Foo>=1") == "napari-foo>=1"
+    assert normalize_requirement("napari-foo >= 1") == "napari-foo>=1"
+    assert normalize_requirement("foo[B,a] <2, >=1") == normalize_requirement(
+        "foo[a,b]>=1,<2"
+    )
+    assert normalize_requirement("-r other.txt") == "-rother.txt"
+
+
+def test_index_url_options(tmp_path, monkeypatch):
+    monkeypatch.delenv(INDEX_URL_ENV, raising=False)
+    assert build_options(None, "linux").index_url == DEFAULT_INDEX_URL
+
+    monkeypatch.setenv(INDEX_URL_ENV, "https://mirror.org/simple")
+    assert build_options(None, "linux").index_url == "https://mirror.org/simple"
+    assert (
+        build_options(None, "linux", index_url="https://other.org/simple").index_url
+        == "https://other.org/simple"
+    )
+
+    # a snapshot directory is pointed at its "simple" folder
+    (tmp_path / "simple").mkdir()
+    options = build_options(None, "linux", index_url=f"{tmp_path}")
+    assert options.index_url == (tmp_path / "simple").as_uri()
+
+    reqs = InstallationRequirements(
+        path=None, requirements=["numpy"], platforms=["linux"], index_url=f"{tmp_path}"
+    )
+    assert all(o.index_url == (tmp_path / "simple").as_uri() for o in reqs.options_list)
+    other = InstallationRequirements(
+        path=None, requirements=["numpy"], platforms=["linux"]
+    )
+    assert reqs._resolution_key(reqs.options_list[0]) != other._resolution_key(
+        other.options_list[0]
+    )
+
+
+class FakePlugin(object):
+    def __init__(self, requirements):
+        self.name = "fake-plugin"
+        self.requirements = InstallationRequirements(
+            path=None, requirements=requirements
+        )
+        self.supported_python_version = None
+        self.supported_platforms = ["linux"]
+
+
+def test_snapshot_index(tmp_path, requests_mock, monkeypatch):
+    solver = FakeSolver(
+        FakeResult(
+            {
+                "numpy": FakeCandidate("1.25.0", "numpy-1.25.0-py3-none-any.whl"),
+                "foo_bar": FakeCandidate("0.1", "foo_bar-0.1.tar.gz"),
+            }
+        )
+    )
+
+    class SnapshotRequirements(InstallationRequirements):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.solver = solver
+
+    monkeypatch.setattr(mirror, "InstallationRequirements", SnapshotRequirements)
+    requests_mock.get(
+        "https://files/numpy-1.25.0-py3-none-any.whl.metadata",
+        content=b"Metadata-Version: 2.1\nName: numpy\n",
+    )
+    requests_mock.get("https://files/foo_bar-0.1.tar.gz", content=b"sdist")
+
+    simple = mirror.snapshot_index([FakePlugin(["snapshot-test"])], tmp_path)
+
+    assert simple == tmp_path / "simple"
+    assert (tmp_path / "files" / "numpy-1.25.0-py3-none-any.whl.metadata").exists()
+    assert not (tmp_path / "files" / "numpy-1.25.0-py3-none-any.whl").exists()
+    assert (tmp_path / "files" / "foo_bar-0.1.tar.gz").read_bytes() == b"sdist"
+
+    numpy_page = (simple / "numpy" / "index.html").read_text()
+    assert 'href="../../files/numpy-1.25.0-py3-none-any.whl"' in numpy_page
+    assert 'data-core-metadata="sha256=' in numpy_page
+    foo_page = (simple / "foo-bar" / "index.html").read_text()
+    assert "foo_bar-0.1.tar.gz#sha256=" in foo_page
+    assert 'href="foo-bar/"' in (simple / "index.html").read_text()
+
+    # the snapshot is completed by the next runs
+    calls = requests_mock.call_count
+    solver.result = FakeResult(
+        {"numpy": FakeCandidate("1.25.0", "numpy-1.25.0-py3-none-any.whl")}
+    )
+    mirror.snapshot_index([FakePlugin(["snapshot-test2"])], tmp_path)
+    assert requests_mock.call_count == calls
+    assert (simple / "foo-bar" / "index.html").exists()
+
+
+def make_sdist(directory, name, version, headers):
+    pkg_info = f"Metadata-Version: {headers.pop('Metadata-Version', '2.2')}\nName: {name}\nVersion: {version}\n"
+    for field, values in headers.items():
+        pkg_info += "".join(f"{field}: {value}\n" for value in values)
+    content = pkg_info.encode("utf-8")
+    sdist = directory / f"{name}-{version}.tar.gz"
+    with tarfile.open(sdist, "w:gz") as archive:
+        info = tarfile.TarInfo(f"{name}-{version}/PKG-INFO")
+        info.size = len(content)
+        archive.addfile(info, io.BytesIO(content))
+    return sdist
+
+
+def make_local_index(directory, projects):
+    files = directory / "files"
+    files.mkdir(exist_ok=True)
+    for project, headers in projects:
+        make_sdist(files, project, "0.1", headers)
+        page = directory / "simple" / project
+        page.mkdir(parents=True)
+        (page / "index.html").write_text(
+            f'<a href="../../files/{project}-0.1.tar.gz">{project}-0.1.tar.gz</a>'
+        )
+
+
+def test_read_sdist_metadata(tmp_path):
+    sdist = make_sdist(tmp_path, "foo", "0.1", {"Requires-Dist": ["bar>=1.0"]})
+    metadata = read_sdist_metadata(sdist)
+    assert "Requires-Dist: bar>=1.0" in metadata
+
+    sdist = make_sdist(tmp_path, "foo", "0.2", {"Metadata-Version": "2.1"})
+    assert read_sdist_metadata(sdist) is None
+
+    sdist = make_sdist(tmp_path, "foo", "0.3", {"Dynamic": ["Requires-Dist"]})
+    assert read_sdist_metadata(sdist) is None
+
+    sdist = make_sdist(tmp_path, "foo", "0.4", {"Dynamic": ["Description"]})
+    assert read_sdist_metadata(sdist) is not None
+
+    (tmp_path / "broken.tar.gz").write_bytes(b"not an archive")
+    assert read_sdist_metadata(tmp_path / "broken.tar.gz") is None
+
+
+def test_fast_metadata_resolution(tmp_path, monkeypatch):
+    monkeypatch.delenv(FAST_METADATA_ENV, raising=False)
+    assert build_options(None, "linux").fast_metadata is False
+    monkeypatch.setenv(FAST_METADATA_ENV, "1")
+    assert build_options(None, "linux").fast_metadata is True
+    assert build_options(None, "linux", fast_metadata=False).fast_metadata is False
+
+    make_local_index(
+        tmp_path,
+        [
+            ("fastfoo", {"Requires-Dist": ["fastbar"]}),
+            ("fastbar", {"Dynamic": ["Requires-Dist"]}),
+            ("fastbaz", {}),
+        ],
+    )
+
+    reqs = InstallationRequirements(
+        path=None,
+        requirements=["fastbaz"],
+        platforms=["linux"],
+        index_url=f"{tmp_path}",
+        fast_metadata=True,
+    )
+    reqs._analyse_with_all_options()
+    options = reqs._get_platform_options("linux")[0]
+    installable, all_wheels, _, installed = reqs.analysis_package(options)
+    assert installable is True
+    assert all_wheels is False
+    assert installed == [("fastbaz", "0.1")]
+
+    reqs = InstallationRequirements(
+        path=None,
+        requirements=["fastfoo"],
+        platforms=["linux"],
+        index_url=f"{tmp_path}",
+        fast_metadata=True,
+    )
+    reqs._analyse_with_all_options()
+    options = reqs._get_platform_options("linux")[0]
+    installable, _, _, _ = reqs.analysis_package(options)
+    assert installable is False
+    assert "dependency needs build" in reqs.installation_issues_summary
+    assert "fastbar" in reqs.installation_issues
+
+
+def test_shared_resolution_state(tmp_path, mocker):
+    make_local_index(
+        tmp_path,
+        [
+            ("sharedfoo", {"Requires-Dist": ["sharedbar"]}),
+            ("sharedbar", {}),
+        ],
+    )
+    fetch_response = mocker.spy(LinkCollector, "fetch_response")
+    prepare = mocker.spy(RequirementPreparer, "prepare_linked_requirement")
+
+    reqs = InstallationRequirements(
+        path=None,
+        requirements=["sharedfoo"],
+        python_versions=[(3, 9), (3, 10)],
+        index_url=f"{tmp_path}",
+        fast_metadata=True,
+    )
+    assert len(reqs.options_list) == 6
+    reqs._analyse_with_all_options()
+
+    assert reqs.installable_linux is True
+    assert reqs.installable_windows is True
+    assert reqs.installable_macos is True
+    for options in reqs.options_list:
+        assert reqs.analysis_package(options)[3] == [
+            ("sharedfoo", "0.1"),
+            ("sharedbar", "0.1"),
+        ]
+    # each page and each metadata is fetched once for the 6 resolutions
+    assert fetch_response.call_count == 2
+    assert prepare.call_count == 2
+
+
+def test_shared_state_compute_once():
+    state = SharedResolutionState()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: state.compute_once(state.metadata, "key", compute), range(32)
+            )
+        )
+    assert results == [42] * 32
+    assert len(calls) == 1
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        state.compute_once(state.index_pages, "key", fail)
+    # failures are not kept
+    assert state.compute_once(state.index_pages, "key", compute) == 42
+
+
+def test_concurrent_analysis_scheduling():
+    solver = FakeSolver(
+        FakeResult({"numpy": FakeCandidate("1.25.0", "numpy-1.25.0-py3-none-any.whl")})
+    )
+    reqs = InstallationRequirements(
+        path=None, requirements=["scheduling-test"], python_versions=[(3, 9), (3, 10)]
+    )
+    reqs.solver = solver
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda name: getattr(reqs, name),
+                ["installable_linux", "allwheel_macos", "number_of_dependencies"] * 4,
+            )
+        )
+    assert results == [True, True, 1] * 4
+    # each option is resolved only once, even with concurrent accesses
+    assert solver.calls == len(reqs.options_list) == 6
+
+    # options outside of the matrix are analysed on demand
+    options = build_options((3, 11), "linux")
+    assert reqs.analysis_package(options)[0] is True
+    assert solver.calls == 7
+
+
+def test_owned_temp_directories():
+    from pip._internal.utils.temp_dir import TempDirectory
+
+    from napari_hub_cli.dependencies_solver.pip_patch import owned_temp_directories
+
+    outside = TempDirectory(kind="test-outside")
+    with owned_temp_directories() as owned:
+        inside = TempDirectory(kind="test-inside")
+        inside_path = Path(inside.path)
+        assert owned == [inside]
+        assert inside_path.exists()
+    assert not inside_path.exists()
+    assert Path(outside.path).exists()
+    outside.cleanup()
+
+
+def test_owned_temp_directories_not_globally_managed():
+    from pip._internal.utils import temp_dir
+    from pip._internal.utils.temp_dir import TempDirectory
+
+    from napari_hub_cli.dependencies_solver.pip_patch import owned_temp_directories
+
+    # the global manager of pip is not required for the directories owned by a resolution
+    previous, temp_dir._tempdir_manager = temp_dir._tempdir_manager, None
+    try:
+        with owned_temp_directories() as owned:
+            tmp = TempDirectory(kind="test-global", globally_managed=True)
+            tmp_path = Path(tmp.path)
+            assert owned == [tmp]
+        assert not tmp_path.exists()
+    finally:
+        temp_dir._tempdir_manager = previous
+
+
+def test_resolution_without_global_tempdir_manager(tmp_path):
+    from pip._internal.utils import temp_dir
+
+    make_local_index(tmp_path, [("tmpfoo", {})])
+    reqs = InstallationRequirements(
+        path=None,
+        requirements=["tmpfoo"],
+        platforms=["linux"],
+        index_url=f"{tmp_path}",
+        fast_metadata=True,
+    )
+    options = reqs._get_platform_options("linux")[0]
+    assert reqs._get_platform_options("linux") is reqs._get_platform_options("linux")
+
+    # the resolution only relies on the temporary directories it owns
+    previous, temp_dir._tempdir_manager = temp_dir._tempdir_manager, None
+    try:
+        reqs._analyse_with_all_options()
+        installable, _, _, installed = reqs.analysis_package(options)
+        assert temp_dir._tempdir_manager is None
+    finally:
+        temp_dir._tempdir_manager = previous
+    assert installable is True
+    assert installed == [("tmpfoo", "0.1")]
+
+    # the requirements are not kept alive by a cache of the class
+    reference = weakref.ref(reqs)
+    del reqs
+    gc.collect()
+    assert reference() is None